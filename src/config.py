@@ -97,17 +97,127 @@ UART_TX_PIN = 17  # ESP32 TX -> Printer RX
 UART_RX_PIN = 16  # ESP32 RX -> Printer TX  
 UART_BAUDRATE = 9600  # Common baudrate for thermal printers
 UART_TIMEOUT = 1000  # milliseconds
+# Baud rate negotiation: at startup, try the rate saved in UART_BAUD_FILE, then
+# UART_BAUDRATE and UART_BAUD_CANDIDATES, checking each with a status request.
+# With UART_BAUD_SWITCH the printer is then moved to UART_BAUD_TARGET (needs
+# GS ( E user setup support, and costs one NV write). Off by default: status
+# requests sent at a wrong rate can print garbage. If the printer answers at
+# no rate that is saved too; delete UART_BAUD_FILE to probe again.
+UART_BAUD_PROBE = False
+UART_BAUD_CANDIDATES = [9600, 19200, 38400, 57600, 115200]
+UART_BAUD_SWITCH = False
+UART_BAUD_TARGET = 115200
+UART_BAUD_FILE = "printer_baud.txt"
+UART_BAUD_SWITCH_RESET_S = 3  # seconds for the printer to reset after a switch
+UART_RTS_PIN = 15  # ESP32 RTS -> Printer CTS (only used with 'rtscts' flow control)
+UART_CTS_PIN = 18  # ESP32 CTS <- Printer RTS/DTR (only used with 'rtscts' flow control)
 
 # Thermal printer configuration
 THERMAL_PRINTER_ENABLED = True
 THERMAL_PRINTER_WIDTH = 58  # mm (58mm paper width)
 THERMAL_PRINTER_CHARS_PER_LINE = 32  # Approximate characters per line
+THERMAL_PRINTER_WRITE_BUFFER = 512  # bytes collected by printer.batch() before a write
+# Send blank bitmap rows as ESC J paper feeds instead of raster data.
+# Requires ESC J to feed in 1-dot units (true for most 203 dpi printers).
+# Off by default; set to True once a test print shows slips the same length
+# and layout as with it off.
+THERMAL_PRINTER_SKIP_BLANK_ROWS = False
+# Send only the inked byte columns of each bitmap band, positioned with GS L.
+# Needs a printer whose GS L left margin also moves GS v 0 raster images; off
+# by default, set to True after a test print shows slips in the right place.
+THERMAL_PRINTER_TRIM_BANDS = False
+# Printer flow control:
+#   'none'    - no handshake, fixed delays from the 'fixed' pacing profile
+#   'rtscts'  - UART hardware flow control on UART_RTS_PIN / UART_CTS_PIN
+#   'busy'    - printer BUSY/DTR output wired to THERMAL_PRINTER_BUSY_PIN
+#   'xonxoff' - printer sends XON/XOFF on UART_RX_PIN
+THERMAL_PRINTER_FLOW_CONTROL = 'none'
+THERMAL_PRINTER_BUSY_PIN = 5
+THERMAL_PRINTER_BUSY_LEVEL = 1  # pin level while the printer is busy
+THERMAL_PRINTER_READY_TIMEOUT_MS = 5000  # give up if the printer stays busy this long
+
+# Printer status on UART_RX_PIN:
+#   'none' - never read status
+#   'poll' - send a DLE EOT real-time status request between bitmap bands
+#   'asb'  - enable automatic status back (GS a) at init and read what arrives
+# Bitmaps stop early on paper-out/cover-open (send() then resets the GS L margin
+# and ESC ! mode) and chunk delays adapt to the replies. Off by default; 'poll'
+# needs the printer's TX wired to UART_RX_PIN.
+THERMAL_PRINTER_STATUS = 'none'
+
+# Pacing profiles for printer writes. 'fixed' is used without flow control,
+# 'flow' with it; set THERMAL_PRINTER_PACING to force a profile by name.
+THERMAL_PRINTER_PACING = None
+THERMAL_PRINTER_PACING_PROFILES = {
+    'fixed': {
+        'write_delay': 0.01,  # seconds after each command
+        'chunk_size': 64,  # raster bytes per UART write
+        'chunk_delay': 0.03,  # seconds after each raster chunk
+        'band_height': 24,  # rows per GS v 0 command
+        'band_delay': 0.20,  # seconds per full band for the head to print
+    },
+    'flow': {
+        'write_delay': 0,
+        'chunk_size': 256,
+        'chunk_delay': 0,
+        'band_height': 24,
+        'band_delay': 0,
+    },
+}
+
+# Pacing saved by ThermalPrinter.calibrate(); overrides the profile above when present
+THERMAL_PRINTER_PROFILE_FILE = "printer_profile.json"
+
+# Printer NV graphics memory (GS ( L). Only enable if the printer supports it;
+# slips are then uploaded once with fortune_cookie.upload_slips(printer).
+THERMAL_PRINTER_NV_GRAPHICS = False
+THERMAL_PRINTER_NV_CAPACITY = 262144  # bytes of NV graphics memory to use
+THERMAL_PRINTER_NV_RECORD = "nv_slips.json"  # which key holds which slip
 
 # Fortune slip bitmap modules (pre-rendered). Each module must export WIDTH, HEIGHT, BITMAP.
-# Example: ["fortune_slip_bitmap", "fortune_slip_bitmap_002"]
-FORTUNE_SLIP_MODULES = [
-    "fortune_slip_bitmap",
-] + [f"fortune_slip_bitmap_{i:03d}" for i in range(1, 33)]
+# None: read the pool from FORTUNE_SLIP_INDEX at boot (one file read), and only
+# scan the filesystem when the index is missing or lists a slip that is gone.
+# A list pins the pool, e.g. ["fortune_slip_bitmap", "fortune_slip_bitmap_002"]
+FORTUNE_SLIP_MODULES = None
+
+# Slip index written by tools/build_slip_index.py (and generate_fortune_slips.py)
+FORTUNE_SLIP_INDEX = "slip_index.json"
+
+# RAM budget for imported slip modules (bytes of BITMAP). The most recently
+# printed slips stay imported; older ones are dropped from sys.modules.
+SLIP_CACHE_MAX_BYTES = 32768
+
+# Packed slip file (built by tools/build_slip_pack.py or generate_fortune_slips.py --pack).
+# When present it is used instead of the bitmap modules above.
+FORTUNE_SLIP_PACK = "fortune_slips.bin"
+
+# Print plans (built by tools/build_print_plan.py): every slip compiled to its
+# exact ESC/POS bytes and delays. When set and present, "bitmap" mode streams
+# a random plan straight to the UART instead of rasterizing a slip. Plans skip
+# NV slips and the per-band status checks (status is checked once before the
+# plan), so they are opt-in: set to "fortune_plans.bin" to use them. Rebuild
+# after changing pacing, THERMAL_PRINTER_SKIP_BLANK_ROWS or
+# THERMAL_PRINTER_TRIM_BANDS.
+FORTUNE_PRINT_PLAN = None
+
+# Choose and load the next slip while the lid is closed and nothing is
+# printing, so a print starts writing as soon as the lid opens
+FORTUNE_PREFETCH = True
+
+# How print_fortune prints: "bitmap" (pre-rendered slips above), "text"
+# (the printer's own font rotated 90 degrees, a few hundred bytes per slip) or
+# "render" (slips drawn on the device from FORTUNES with FORTUNE_FONT_FILE)
+FORTUNE_PRINT_MODE = "bitmap"
+FORTUNE_TEXT_SLIP_DOTS = 648  # text slip length, same as the bitmap slips
+
+# Bitmap font compiled by tools/build_slip_font.py for the "render" mode
+FORTUNE_FONT_FILE = "slip_font.bin"
+FORTUNE_FONT_SIZE_MIN = 24  # auto-size range, as in generate_fortune_slips.py
+FORTUNE_FONT_SIZE_MAX = 80
+
+# Digit atlas for slips generated with --lucky-overlay: their lucky numbers
+# line is left blank and filled with the fortune's fresh numbers at print time
+FORTUNE_LUCKY_ATLAS = "lucky_digits.bin"
 
 # Development settings
 AUTO_RELOAD = True
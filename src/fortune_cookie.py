@@ -1,9 +1,15 @@
 """Fortune cookie fortune printing for the thermal printer."""
 
+import gc
+import json
 import os
 import random
+import struct
+import sys
 
 import config
+import slip_codec
+import slip_renderer
 from thermal_printer import ThermalPrinter
 
 FORTUNES = [
@@ -121,21 +127,54 @@ def _sample_unique(lo, hi, k):
     return list(picked)
 
 
-def discover_slip_modules(prefix="fortune_slip_bitmap"):
-    modules = []
+def _slip_folder():
+    """Directory holding the slip modules: the slip index's ("" is the current one)"""
+    path = getattr(config, "FORTUNE_SLIP_INDEX", None) or ""
+    return path.rpartition("/")[0]
+
+
+def _slip_files(prefix="fortune_slip_bitmap"):
+    """Module name -> file size of the slip modules, from one directory listing,
+    or None if the directory can't be listed. A .py wins over a .mpy of the
+    same name, as import picks it first."""
+    folder = _slip_folder()
     try:
-        files = os.listdir()
+        if hasattr(os, "ilistdir"):
+            # MicroPython: (name, type, inode, size) without a stat per file
+            entries = [(e[0], e[3] if len(e) > 3 else None) for e in os.ilistdir(folder or ".")]
+        else:
+            entries = [(name, None) for name in os.listdir(folder or ".")]
     except OSError:
-        return modules
+        return None
 
-    for name in files:
-        if not (isinstance(name, str) and name.endswith('.py')):
+    files = {}
+    for name, size in entries:
+        if not isinstance(name, str):
             continue
-        if name == prefix + '.py':
-            modules.append(prefix)
+        # Precompiled slips (tools/build_mpy.py) import the same as .py ones
+        if name.endswith('.py'):
+            module = name[:-3]
+        elif name.endswith('.mpy'):
+            module = name[:-4]
+            if module in files:
+                continue
+        else:
             continue
-        if name.startswith(prefix + '_'):
-            modules.append(name[:-3])
+        if module == prefix or module.startswith(prefix + '_'):
+            if size is None:
+                try:
+                    size = os.stat(folder + "/" + name if folder else name)[6]
+                except OSError:
+                    continue
+            files[module] = size
+    return files
+
+
+def discover_slip_modules(prefix="fortune_slip_bitmap", files=None):
+    """Slip module names in pool order; files is a _slip_files() listing to reuse"""
+    if files is None:
+        files = _slip_files(prefix)
+    modules = list(files or ())
 
     def _sort_key(m):
         if m == prefix:
@@ -153,13 +192,594 @@ def discover_slip_modules(prefix="fortune_slip_bitmap"):
     return modules
 
 
-def configure_slip_modules():
-    modules = discover_slip_modules()
+# Slip index (tools/build_slip_index.py): one row per module, in print-pool order
+SLIP_INDEX_VERSION = 1
+SLIP_INDEX_FIELDS = ["name", "size", "hash", "width", "height"]
+
+_slip_index = {}  # module name -> index row
+
+
+def load_slip_index(path=None):
+    """Rows of the slip index, or None if it is missing, unreadable or another version."""
+    if path is None:
+        path = getattr(config, "FORTUNE_SLIP_INDEX", None)
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            index = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != SLIP_INDEX_VERSION:
+        return None
+    return index.get("slips") or None
+
+
+def write_slip_index(modules, path=None, sizes=None):
+    """Write an index of module names (and file sizes) found by a rescan;
+    hashes and dimensions are left for the host tools to fill in."""
+    if path is None:
+        path = getattr(config, "FORTUNE_SLIP_INDEX", None)
+    if not path:
+        return
+    sizes = sizes or {}
+    rows = [[name, sizes.get(name), None, None, None] for name in modules]
+    try:
+        with open(path, "w") as f:
+            f.write(json.dumps({"version": SLIP_INDEX_VERSION, "fields": SLIP_INDEX_FIELDS, "slips": rows}))
+    except OSError as e:
+        print("fortune_cookie: could not write slip index:", e)
+
+
+def rescan_slip_modules(files=None):
+    """List the filesystem for slip modules and rewrite the index from it."""
+    global _slip_index
+    if files is None:
+        files = _slip_files()
+    modules = discover_slip_modules(files=files)
+    _slip_index = {}
     if modules:
+        write_slip_index(modules, sizes=files)
         config.FORTUNE_SLIP_MODULES = modules
     return modules
 
 
+def _slip_file_size(module):
+    """Size of a slip module's .py (or else .mpy) file, None if neither exists"""
+    folder = _slip_folder()
+    for ext in ('.py', '.mpy'):
+        name = module + ext
+        try:
+            return os.stat(folder + "/" + name if folder else name)[6]
+        except OSError:
+            pass
+    return None
+
+
+def _next_slip_name(name, prefix="fortune_slip_bitmap"):
+    """The module name after name in pool order (fortune_slip_bitmap_007 ->
+    fortune_slip_bitmap_008), or None for names without a number"""
+    if name == prefix:
+        return prefix + "_001"
+    n = name[len(prefix) + 1:]
+    if not name.startswith(prefix + '_') or not n.isdigit():
+        return None
+    following = str(int(n) + 1)
+    return prefix + "_" + "0" * (len(n) - len(following)) + following
+
+
+def _index_stamp_ok(rows):
+    """Cheap staleness check of the slip index: at most two stats, no listing.
+
+    The last indexed slip must still have its indexed size (a re-render
+    changes it) and the slip after it must not exist (slips were added).
+    """
+    name, size = rows[-1][0], rows[-1][1]
+    if size is not None and _slip_file_size(name) != size:
+        return False
+    following = _next_slip_name(name)
+    return following is None or _slip_file_size(following) is None
+
+
+def configure_slip_modules():
+    """Fill config.FORTUNE_SLIP_MODULES from the slip index.
+
+    The index is trusted without listing the slip folder; it is rebuilt from
+    a listing only when it is missing or unreadable, when the stamp check in
+    _index_stamp_ok fails, or when an indexed slip fails to import (see
+    _choose_slip). A list set in config is kept as the pool.
+    """
+    global _slip_index
+    modules = getattr(config, "FORTUNE_SLIP_MODULES", None)
+    if modules:
+        return modules
+    rows = load_slip_index()
+    if rows is None:
+        print("fortune_cookie: no slip index, scanning for slip modules")
+        return rescan_slip_modules()
+    if not _index_stamp_ok(rows):
+        print("fortune_cookie: slip index does not match the slip files, rescanning")
+        return rescan_slip_modules()
+    _slip_index = {}
+    for row in rows:
+        _slip_index[row[0]] = row
+    modules = [row[0] for row in rows]
+    config.FORTUNE_SLIP_MODULES = modules
+    return modules
+
+
+SLIP_PACK_MAGIC = b"FSLP"
+SLIP_PACK_HEADER = "<4sBBHHH"
+SLIP_PACK_HEADER_SIZE = 12
+SLIP_PACK_INDEX_ENTRY = "<II"
+SLIP_PACK_INDEX_ENTRY_SIZE = 8
+# Version 2 index entries also carry a lucky-number region (x, y, w, h)
+SLIP_PACK_INDEX_ENTRY_REGION = "<IIHHHH"
+SLIP_PACK_INDEX_ENTRY_REGION_SIZE = 16
+SLIP_PACK_ENCODING_RAW = 0
+# Template + delta: one shared template bitmap follows the index and each
+# record is a run of spans (skip u16, length u8, length bytes) that replace
+# template bytes; skip counts from the end of the previous span
+SLIP_PACK_ENCODING_DELTA = 1
+SLIP_DELTA_SPAN = "<HB"
+SLIP_DELTA_SPAN_SIZE = 3
+# Row dictionary: a shared table of rows (count u16, then the rows) follows
+# the index; each record is one u16 token per row, a dictionary index or
+# SLIP_ROW_LITERAL, followed by the literal rows in order
+SLIP_PACK_ENCODING_ROWDICT = 2
+SLIP_ROW_LITERAL = 0xFFFF
+SLIP_ROW_TOKEN_BATCH = 32  # tokens read per seek
+
+
+def _readinto_full(f, buf):
+    """Fill buf from f, stopping early only at end of file. Returns bytes read."""
+    mv = memoryview(buf)
+    got = 0
+    n = len(mv)
+    while got < n:
+        r = f.readinto(mv[got:])
+        if not r:
+            break
+        got += r
+    return got
+
+
+class SlipStream:
+    """Sequential reader over one slip record, consumed with readinto()."""
+
+    def __init__(self, f, offset, length):
+        self._f = f
+        self.remaining = length
+        f.seek(offset)
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        if n <= 0:
+            return 0
+        got = _readinto_full(self._f, memoryview(buf)[:n])
+        self.remaining -= got
+        return got
+
+
+class SlipDeltaStream:
+    """Rebuilds a template + delta slip band by band, consumed with readinto().
+
+    Each band is read from the template, then the record's spans that fall
+    in it are read straight over it. Every read seeks, so the pack's file
+    can be shared with other readers between calls.
+    """
+
+    def __init__(self, f, template_offset, length, offset, record_length):
+        self._f = f
+        self._template_offset = template_offset
+        self.remaining = length
+        self._pos = 0
+        self._delta_pos = offset
+        self._delta_left = record_length
+        self._span_start = 0
+        self._span_left = 0
+        self._span_end = 0
+        self._header = bytearray(SLIP_DELTA_SPAN_SIZE)
+
+    def _next_span(self):
+        f = self._f
+        f.seek(self._delta_pos)
+        if _readinto_full(f, self._header) != SLIP_DELTA_SPAN_SIZE:
+            raise ValueError("Slip delta record is truncated")
+        skip, length = struct.unpack(SLIP_DELTA_SPAN, self._header)
+        self._delta_pos += SLIP_DELTA_SPAN_SIZE
+        self._delta_left -= SLIP_DELTA_SPAN_SIZE + length
+        self._span_start = self._span_end + skip
+        self._span_left = length
+        self._span_end = self._span_start + length
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        if n <= 0:
+            return 0
+        f = self._f
+        mv = memoryview(buf)
+        pos = self._pos
+        end = pos + n
+        f.seek(self._template_offset + pos)
+        if _readinto_full(f, mv[:n]) != n:
+            raise ValueError("Slip pack template is truncated")
+
+        while True:
+            if not self._span_left:
+                if self._delta_left <= 0:
+                    break
+                self._next_span()
+            start = self._span_start
+            if start >= end:
+                break
+            count = self._span_left
+            if count > end - start:
+                count = end - start
+            f.seek(self._delta_pos)
+            _readinto_full(f, mv[start - pos:start - pos + count])
+            self._delta_pos += count
+            self._span_start += count
+            self._span_left -= count
+
+        self._pos = end
+        self.remaining -= n
+        return n
+
+
+class SlipRowDictStream:
+    """Expands a row-dictionary slip row by row, consumed with readinto().
+
+    Each row is copied straight from the dictionary or from the record's
+    literal rows; reads need not be row aligned. Tokens are read a small
+    batch at a time, and every read seeks, as with SlipDeltaStream.
+    """
+
+    def __init__(self, f, rows_offset, bytes_per_line, height, offset):
+        self._f = f
+        self._rows_offset = rows_offset
+        self._bpl = bytes_per_line
+        self._height = height
+        self._token_pos = offset
+        self._literal_pos = offset + 2 * height
+        self._tokens = bytearray(2 * SLIP_ROW_TOKEN_BATCH)
+        self._token_count = 0
+        self._token_next = 0
+        self._row = -1
+        self._row_offset = 0
+        self._col = bytes_per_line  # no row started yet
+        self.remaining = bytes_per_line * height
+
+    def _next_row(self):
+        if self._token_next >= self._token_count:
+            count = self._height - self._row - 1
+            if count > SLIP_ROW_TOKEN_BATCH:
+                count = SLIP_ROW_TOKEN_BATCH
+            self._f.seek(self._token_pos)
+            if _readinto_full(self._f, memoryview(self._tokens)[:2 * count]) != 2 * count:
+                raise ValueError("Slip row record is truncated")
+            self._token_pos += 2 * count
+            self._token_count = count
+            self._token_next = 0
+        tokens = self._tokens
+        i = 2 * self._token_next
+        token = tokens[i] | (tokens[i + 1] << 8)
+        self._token_next += 1
+        self._row += 1
+        self._col = 0
+        if token == SLIP_ROW_LITERAL:
+            self._row_offset = self._literal_pos
+            self._literal_pos += self._bpl
+        else:
+            self._row_offset = self._rows_offset + token * self._bpl
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        if n <= 0:
+            return 0
+        f = self._f
+        mv = memoryview(buf)
+        bpl = self._bpl
+        got = 0
+        while got < n:
+            if self._col >= bpl:
+                self._next_row()
+            count = bpl - self._col
+            if count > n - got:
+                count = n - got
+            f.seek(self._row_offset + self._col)
+            if _readinto_full(f, mv[got:got + count]) != count:
+                raise ValueError("Slip pack row data is truncated")
+            self._col += count
+            got += count
+        self.remaining -= n
+        return n
+
+
+class SlipPack:
+    """Indexed pack of 1bpp slips written by tools/build_slip_pack.py.
+
+    Only the header is read up front; index entries and slip data are read
+    on demand so a print never holds more than one band in RAM.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'rb')
+        try:
+            header = self._f.read(SLIP_PACK_HEADER_SIZE)
+            if len(header) != SLIP_PACK_HEADER_SIZE:
+                raise ValueError("Slip pack header is truncated")
+            magic, version, encoding, count, width, height = struct.unpack(SLIP_PACK_HEADER, header)
+            if magic != SLIP_PACK_MAGIC:
+                raise ValueError("Not a slip pack")
+            if version not in (1, 2):
+                raise ValueError("Unsupported slip pack version")
+            if encoding not in (SLIP_PACK_ENCODING_RAW, SLIP_PACK_ENCODING_DELTA, SLIP_PACK_ENCODING_ROWDICT):
+                raise ValueError("Unsupported slip pack encoding")
+        except Exception:
+            self._f.close()
+            raise
+        self.version = version
+        self.encoding = encoding
+        self.count = count
+        self.width = width
+        self.height = height
+
+    def _index_entry(self, index):
+        if index < 0 or index >= self.count:
+            raise IndexError("Slip index out of range")
+        if self.version == 1:
+            fmt, size = SLIP_PACK_INDEX_ENTRY, SLIP_PACK_INDEX_ENTRY_SIZE
+        else:
+            fmt, size = SLIP_PACK_INDEX_ENTRY_REGION, SLIP_PACK_INDEX_ENTRY_REGION_SIZE
+        self._f.seek(SLIP_PACK_HEADER_SIZE + index * size)
+        return struct.unpack(fmt, self._f.read(size))
+
+    def _shared_offset(self):
+        """Start of the template or row dictionary that follows the index"""
+        if self.version == 1:
+            entry_size = SLIP_PACK_INDEX_ENTRY_SIZE
+        else:
+            entry_size = SLIP_PACK_INDEX_ENTRY_REGION_SIZE
+        return SLIP_PACK_HEADER_SIZE + self.count * entry_size
+
+    def open_slip(self, index):
+        """Return a band source (readinto()) for slip `index`."""
+        entry = self._index_entry(index)
+        if self.encoding == SLIP_PACK_ENCODING_DELTA:
+            length = (self.width // 8) * self.height
+            return SlipDeltaStream(self._f, self._shared_offset(), length, entry[0], entry[1])
+        if self.encoding == SLIP_PACK_ENCODING_ROWDICT:
+            # Skip the dictionary's u16 row count
+            rows_offset = self._shared_offset() + 2
+            return SlipRowDictStream(self._f, rows_offset, self.width // 8, self.height, entry[0])
+        return SlipStream(self._f, entry[0], entry[1])
+
+    def lucky_region(self, index):
+        """Reserved lucky-number region (x, y, w, h) of a slip, or None."""
+        if self.version == 1:
+            return None
+        entry = self._index_entry(index)
+        if not entry[4]:
+            return None
+        return entry[2:]
+
+    def slip_name(self, index):
+        """Stable name for a pack slip, e.g. for the printer NV record."""
+        return "%s:%d" % (self.path, index)
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_slip_pack(path=None):
+    """Open the configured slip pack, or return None if there isn't one."""
+    if path is None:
+        path = getattr(config, "FORTUNE_SLIP_PACK", None)
+    if not path:
+        return None
+    try:
+        return SlipPack(path)
+    except OSError:
+        return None
+
+
+def open_slip_font(path=None):
+    """Open the compiled slip font for on-device rendering, or return None."""
+    if path is None:
+        path = getattr(config, "FORTUNE_FONT_FILE", None)
+    if not path:
+        return None
+    try:
+        return slip_renderer.BitmapFont(path)
+    except OSError:
+        return None
+
+
+_plan_counts = {}  # plan path -> slip count, 0 when missing or unusable
+
+
+def configure_print_plan(printer):
+    """Check the configured print plan once and remember its slip count.
+
+    main.py calls this at boot; later prints reuse the answer instead of
+    re-reading the plan index. Returns the count, 0 without a usable plan.
+    """
+    path = getattr(config, "FORTUNE_PRINT_PLAN", None)
+    if not path:
+        return 0
+    count = _plan_counts.get(path)
+    if count is not None:
+        return count
+    try:
+        count = printer.plan_count(path)
+    except OSError:
+        count = 0
+    except (ValueError, struct.error) as e:
+        print("fortune_cookie: print plan", path, "unusable, printing slips instead:", e)
+        count = 0
+    _plan_counts[path] = count
+    return count
+
+
+def _choose_plan(printer):
+    """(path, index) of a random compiled print plan, or None without a usable plan file."""
+    count = configure_print_plan(printer)
+    if not count:
+        return None
+    path = config.FORTUNE_PRINT_PLAN
+    index = random.randint(0, count - 1)
+    print("fortune_cookie: using print plan", path, index)
+    return path, index
+
+
+def _lucky_overlay(bitmap, width, height, region, fortune):
+    """Draw the fortune's lucky numbers into a slip's reserved region.
+
+    Returns a band source that ORs the numbers in as the slip streams out,
+    or bitmap unchanged when the slip has no region.
+    """
+    if not region or not fortune:
+        return bitmap
+    numbers = fortune.partition(slip_renderer.LUCKY_PREFIX)[2]
+    path = getattr(config, "FORTUNE_LUCKY_ATLAS", None)
+    try:
+        atlas = slip_renderer.BitmapFont(path)
+    except (OSError, TypeError):
+        print("fortune_cookie: no lucky number atlas, region left blank")
+        return bitmap
+    try:
+        return slip_renderer.overlay_lucky_numbers(bitmap, width, height, region, atlas, numbers)
+    finally:
+        atlas.close()
+
+
+def _load_slip_module(module_name):
+    """Import a slip module for a one-off read and drop it from sys.modules."""
+    slip = __import__(module_name)
+    sys.modules.pop(module_name, None)
+    return slip
+
+
+class SlipCache:
+    """Recently printed slip modules, kept within config.SLIP_CACHE_MAX_BYTES.
+
+    Slips are charged by len(BITMAP). Evicted modules are dropped from
+    sys.modules and collected before the next print starts, never during
+    one. A budget of 0 imports every slip afresh and drops it again.
+    From the REPL: fortune_cookie.slip_cache.stats()
+    """
+
+    def __init__(self):
+        self._slips = []  # [name, module, size], least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, module_name):
+        """Return the slip module, importing it (and evicting others) on a miss."""
+        slips = self._slips
+        for i in range(len(slips)):
+            if slips[i][0] == module_name:
+                self.hits += 1
+                entry = slips.pop(i)
+                slips.append(entry)
+                return entry[1]
+
+        self.misses += 1
+        max_bytes = getattr(config, "SLIP_CACHE_MAX_BYTES", 32768)
+        # Make room for a slip the size of the last one before importing
+        expected = slips[-1][2] if slips else 0
+        if self._evict(max_bytes - expected):
+            gc.collect()
+        slip = __import__(module_name)
+        size = len(slip.BITMAP)
+        if size > max_bytes:
+            sys.modules.pop(module_name, None)
+            return slip
+        if self._evict(max_bytes - size):
+            gc.collect()
+        slips.append([module_name, slip, size])
+        self.bytes += size
+        return slip
+
+    def _evict(self, limit):
+        """Drop least recently used slips until at most limit bytes are held"""
+        evicted = False
+        while self._slips and self.bytes > limit:
+            name, _, size = self._slips.pop(0)
+            sys.modules.pop(name, None)
+            self.bytes -= size
+            self.evictions += 1
+            evicted = True
+        return evicted
+
+    def clear(self):
+        if self._evict(-1):
+            gc.collect()
+
+    def stats(self):
+        return {
+            'slips': [entry[0] for entry in self._slips],
+            'bytes': self.bytes,
+            'max_bytes': getattr(config, "SLIP_CACHE_MAX_BYTES", 32768),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+slip_cache = SlipCache()
+
+
+def upload_slips(printer):
+    """Store every available slip in the printer's NV graphics memory.
+
+    Run from the REPL after changing the slip set; unchanged slips are skipped.
+    Slips with a lucky-number region are skipped: their numbers are drawn in
+    at print time, so they always print as raster.
+    """
+    pack = open_slip_pack()
+    if pack is not None:
+        with pack:
+            slips = [
+                (pack.slip_name(i), (lambda i=i: pack.open_slip(i)), pack.width, pack.height)
+                for i in range(pack.count)
+                if pack.lucky_region(i) is None
+            ]
+            return printer.upload_nv_slips(slips)
+
+    def _slips():
+        for module_name in configure_slip_modules() or ["fortune_slip_bitmap"]:
+            # The index hash matches the NV record's: skip the import when unchanged
+            row = _slip_index.get(module_name)
+            entry = printer.nv_record.get(module_name)
+            if row and entry and row[2] == entry['hash']:
+                continue
+            slip = _load_slip_module(module_name)
+            if getattr(slip, "LUCKY_REGION", None):
+                continue
+            yield module_name, (lambda slip=slip: slip_codec.slip_bitmap(slip)), slip.WIDTH, slip.HEIGHT
+            del slip
+            gc.collect()
+
+    return printer.upload_nv_slips(_slips())
+
+
 def wrap_text(text, max_chars_per_line=28):
     words = text.split()
     lines = []
@@ -189,35 +809,318 @@ def get_fortune():
     return f"{fortune}\n\nLucky numbers: {', '.join(map(str, lucky_numbers))}"
 
 
+def _choose_slip(fortune=None):
+    """Pick a random slip, or render fortune in "render" print mode.
+
+    Returns (name, open_bitmap, pack): open_bitmap() gives (bitmap, width,
+    height) and is only called when the slip has to be rasterized; pack is
+    the open SlipPack or font to close afterwards, or None.
+    """
+    if fortune is not None and getattr(config, "FORTUNE_PRINT_MODE", "bitmap") == "render":
+        font = open_slip_font()
+        if font is not None:
+            print("fortune_cookie: rendering slip with", font.path)
+            return (
+                None,
+                lambda: slip_renderer.open_slip(
+                    font,
+                    fortune,
+                    getattr(config, "FORTUNE_FONT_SIZE_MIN", 24),
+                    getattr(config, "FORTUNE_FONT_SIZE_MAX", 80),
+                ),
+                font,
+            )
+        print("fortune_cookie: no slip font, using pre-rendered slips")
+
+    pack = open_slip_pack()
+    if pack is not None:
+        index = random.randint(0, pack.count - 1)
+        print("fortune_cookie: using pack slip", pack.path, index, pack.width, pack.height)
+
+        def _open_pack_slip():
+            # Read the region first: it seeks the shared file, open_slip positions it
+            region = pack.lucky_region(index)
+            bitmap = _lucky_overlay(pack.open_slip(index), pack.width, pack.height, region, fortune)
+            return bitmap, pack.width, pack.height
+
+        return pack.slip_name(index), _open_pack_slip, pack
+
+    slip_modules = configure_slip_modules() or ["fortune_slip_bitmap"]
+    module_name = _choice(slip_modules)
+
+    def _open_module():
+        name = module_name
+        try:
+            slip = slip_cache.load(name)
+        except ImportError:
+            if name not in _slip_index:
+                raise
+            # The index lists a slip that is gone: rescan once and pick again
+            print("fortune_cookie: slip index is stale, rescanning")
+            name = _choice(rescan_slip_modules() or ["fortune_slip_bitmap"])
+            slip = slip_cache.load(name)
+        print("fortune_cookie: using bitmap slip", name, slip.WIDTH, slip.HEIGHT)
+        region = getattr(slip, "LUCKY_REGION", None)
+        bitmap = slip_codec.slip_bitmap(slip)
+        return _lucky_overlay(bitmap, slip.WIDTH, slip.HEIGHT, region, fortune), slip.WIDTH, slip.HEIGHT
+
+    return module_name, _open_module, None
+
+
+class _NextSlip:
+    """What the next print sends: a print plan, or a slip and its bitmap"""
+
+    def __init__(self, fortune, plan=None, name=None, open_bitmap=None, pack=None):
+        self.fortune = fortune
+        self.plan = plan
+        self.name = name
+        self.open_bitmap = open_bitmap
+        self.pack = pack
+        self.bitmap = None  # (bitmap, width, height) once opened
+
+    def close(self):
+        if self.pack is not None:
+            self.pack.close()
+            self.pack = None
+
+
+def _prepare_slip(printer, fortune, load=False):
+    """Choose what to print for fortune; with load, also open the bitmap now.
+
+    Slips the printer has in NV memory are not opened.
+    """
+    plan = _choose_plan(printer) if _bitmap_mode() else None
+    if plan is not None:
+        return _NextSlip(fortune, plan)
+    name, open_bitmap, pack = _choose_slip(fortune)
+    slip = _NextSlip(fortune, None, name, open_bitmap, pack)
+    if load:
+        _load_slip(printer, slip)
+    return slip
+
+
+def _load_slip(printer, slip):
+    """Open slip's bitmap now, unless it is a plan or stored in NV memory"""
+    if slip.plan is not None or slip.bitmap is not None or printer.nv_slip_key(slip.name) is not None:
+        return
+    try:
+        slip.bitmap = slip.open_bitmap()
+    except Exception:
+        slip.close()
+        raise
+
+
+_prefetched = None
+
+
+def prefetch_slip(printer):
+    """Choose the next fortune and slip and load it now, while the device is idle.
+
+    The next print_fortune without a fortune argument takes it, so choosing,
+    importing or opening the slip is off the path from lid open to the first
+    byte. printer is the ThermalPrinter (not the async wrapper). Does nothing
+    when a slip is already waiting, in "text" mode or with FORTUNE_PREFETCH off.
+    """
+    for _ in prefetch_slip_steps(printer):
+        pass
+    return _prefetched
+
+
+def prefetch_slip_steps(printer):
+    """prefetch_slip in steps, for an event loop.
+
+    Yields after choosing the fortune and after choosing the slip, so the
+    caller can run other tasks in between or stop iterating (a lid opened);
+    a slip chosen but not loaded is still taken and loaded by the next print.
+    Importing or opening the bitmap is the last step and runs in one go.
+    """
+    global _prefetched
+    if _prefetched is not None or _text_mode() or not getattr(config, "FORTUNE_PREFETCH", True):
+        return
+    fortune = get_fortune()
+    yield
+    slip = _prepare_slip(printer, fortune)
+    _prefetched = slip
+    yield
+    if _prefetched is not slip:
+        return  # taken by a print in the meantime
+    try:
+        _load_slip(printer, slip)
+    except Exception:
+        _prefetched = None
+        raise
+
+
+def _take_slip(fortune):
+    """(prefetched slip or None, fortune to print) for a print of fortune"""
+    global _prefetched
+    slip = None
+    if fortune is None:
+        slip = _prefetched
+        _prefetched = None
+        fortune = slip.fortune if slip is not None else get_fortune()
+    if slip is not None and _text_mode():
+        slip.close()
+        slip = None
+    return slip, fortune
+
+
+TEXT_SLIP_BODY_SIZE = 0x30  # ESC ! double height and width
+TEXT_SLIP_LUCKY_SIZE = 0x20  # ESC ! double width: same row pitch as the body
+TEXT_SLIP_CORNER_ROWS = 3
+
+# The printer font is single-byte: punctuation it lacks is spelled in ASCII,
+# anything else becomes '?' so every character still takes one row
+TEXT_SLIP_ASCII = {
+    "\u2014": "-",  # em dash
+    "\u2013": "-",  # en dash
+    "\u2018": "'",
+    "\u2019": "'",
+    "\u201c": '"',
+    "\u201d": '"',
+    "\u2026": "...",
+    "\u00a0": " ",
+}
+
+
+def printer_text(text):
+    """text with non-ASCII characters replaced for the printer's font"""
+    out = []
+    for ch in text:
+        if ch == "\n" or " " <= ch <= "~":
+            out.append(ch)
+        else:
+            out.append(TEXT_SLIP_ASCII.get(ch, "?"))
+    return "".join(out)
+
+
+def _pad_center(text, width):
+    pad = (width - len(text)) // 2
+    if pad > 0:
+        return " " * pad + text
+    return text
+
+
+def text_slip_commands(printer, fortune):
+    """Command generator for a portrait fortune slip in the printer's font.
+
+    The fortune (and its lucky numbers after a blank line) is mapped to
+    ASCII, wrapped for the rotated line length and framed by small raster
+    corner blocks.
+    """
+    slip_dots = getattr(config, "FORTUNE_TEXT_SLIP_DOTS", 648)
+    corner_dots = TEXT_SLIP_CORNER_ROWS * 8
+    rows = (slip_dots - 2 * corner_dots) // (printer.FONT_A_WIDTH * 2)
+
+    body, _, lucky = printer_text(fortune).partition("\n\n")
+    lines = [(_pad_center(line, rows), TEXT_SLIP_BODY_SIZE) for line in wrap_text(body, rows)]
+    if lucky:
+        lines.append(("", TEXT_SLIP_LUCKY_SIZE))
+        lines += [(_pad_center(line, rows), TEXT_SLIP_LUCKY_SIZE) for line in wrap_text(lucky, rows)]
+
+    yield from printer.corner_blocks_commands(rows=TEXT_SLIP_CORNER_ROWS)
+    yield from printer.rotated_text_commands(lines, rows)
+    yield from printer.corner_blocks_commands(rows=TEXT_SLIP_CORNER_ROWS)
+
+
+def _text_mode():
+    return getattr(config, "FORTUNE_PRINT_MODE", "bitmap") == "text"
+
+
+def _bitmap_mode():
+    return getattr(config, "FORTUNE_PRINT_MODE", "bitmap") == "bitmap"
+
+
+def _raster_options():
+    return {
+        'skip_blank': getattr(config, "THERMAL_PRINTER_SKIP_BLANK_ROWS", False),
+        'trim': getattr(config, "THERMAL_PRINTER_TRIM_BANDS", False),
+    }
+
+
+def _report_stats(stats):
+    if stats:
+        print(
+            "fortune_cookie: sent", stats['bytes'], "bytes",
+            "(full raster", stats['full_raster_bytes'], "bytes,",
+            stats['blank_rows'], "blank rows fed,",
+            stats['trimmed_bytes'], "bytes trimmed)"
+        )
+
+
 def print_fortune(printer=None, fortune=None):
     """Print a single authentic-style fortune slip.
 
-    If printer is not provided, one will be created.
+    If printer is not provided, one will be created. Without a fortune, the
+    slip from prefetch_slip() is printed when there is one.
     """
     created_printer = False
     if printer is None:
         printer = ThermalPrinter()
         created_printer = True
 
-    if fortune is None:
-        fortune = get_fortune()
+    slip, fortune = _take_slip(fortune)
+
+    if _text_mode():
+        start_bytes = printer.bytes_written
+        printer.send(text_slip_commands(printer, fortune))
+        print("fortune_cookie: sent", printer.bytes_written - start_bytes, "bytes (text slip)")
+        printer.feed(6)
+        return fortune
 
-    slip_modules = getattr(config, "FORTUNE_SLIP_MODULES", None)
-    if not slip_modules:
-        slip_modules = ["fortune_slip_bitmap"]
+    if slip is None:
+        slip = _prepare_slip(printer, fortune)
+    if slip.plan is not None:
+        # The plan ends with the slip's trailing feed
+        print("fortune_cookie: sent", printer.stream_plan(*slip.plan), "bytes (print plan)")
+        return fortune
 
-    module_name = _choice(slip_modules)
-    slip = __import__(module_name)
-    print("fortune_cookie: using bitmap slip", module_name, slip.WIDTH, slip.HEIGHT)
-    printer.print_bitmap(
-        slip.BITMAP,
-        slip.WIDTH,
-        slip.HEIGHT,
-        mode='normal'
-    )
+    stats = None
+    try:
+        if slip.bitmap is None and printer.print_nv_slip(slip.name):
+            print("fortune_cookie: printed stored slip", slip.name)
+        else:
+            bitmap, width, height = slip.bitmap or slip.open_bitmap()
+            printer.print_bitmap(bitmap, width, height, 'normal', **_raster_options())
+            stats = printer.last_bitmap_stats
+    finally:
+        slip.close()
+
+    _report_stats(stats)
     printer.feed(6)
 
     if created_printer:
         return fortune
 
     return fortune
+
+
+async def print_fortune_async(printer, fortune=None):
+    """Print a fortune slip through an AsyncThermalPrinter without blocking."""
+    slip, fortune = _take_slip(fortune)
+
+    if _text_mode():
+        await printer.send(text_slip_commands(printer.printer, fortune))
+        await printer.feed(6)
+        return fortune
+
+    if slip is None:
+        slip = _prepare_slip(printer.printer, fortune)
+    if slip.plan is not None:
+        print("fortune_cookie: sent", await printer.stream_plan(*slip.plan), "bytes (print plan)")
+        return fortune
+
+    stats = None
+    try:
+        if slip.bitmap is None and await printer.print_nv_slip(slip.name):
+            print("fortune_cookie: printed stored slip", slip.name)
+        else:
+            bitmap, width, height = slip.bitmap or slip.open_bitmap()
+            await printer.print_bitmap(bitmap, width, height, 'normal', **_raster_options())
+            stats = printer.last_bitmap_stats
+    finally:
+        slip.close()
+
+    _report_stats(stats)
+    await printer.feed(6)
+    return fortune
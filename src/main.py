@@ -9,10 +9,16 @@ import time
 import neopixel
 import machine
 
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
 # Import thermal printer if enabled
 if config.THERMAL_PRINTER_ENABLED:
     try:
         from thermal_printer import ThermalPrinter
+        from thermal_printer_async import AsyncThermalPrinter
         import fortune_cookie
         THERMAL_PRINTER_AVAILABLE = True
     except ImportError as e:
@@ -21,6 +27,127 @@ if config.THERMAL_PRINTER_ENABLED:
 else:
     THERMAL_PRINTER_AVAILABLE = False
 
+
+class LidState:
+    """Lid/print state shared between the main loop tasks"""
+
+    def __init__(self, lid_state):
+        self.lid_state = lid_state
+        self.printing = False
+        self.print_requested = asyncio.Event()
+        self.lid_opened_ms = None
+
+
+async def lid_task(lid_pin, state):
+    """Debounce the lid switch and request a print on each qualifying open"""
+    last_lid_state = state.lid_state
+    last_lid_event_time = 0
+    last_print_time = 0
+    lid_ready_for_open = (last_lid_state == 0)
+    lid_closed_since = None
+
+    while True:
+        current_time = time.ticks_ms()
+
+        lid_state = lid_pin.value()
+        state.lid_state = lid_state
+        if lid_state == 1:  # Lid open
+            lid_closed_since = None
+
+            if (
+                lid_ready_for_open
+                and last_lid_state == 0
+                and time.ticks_diff(current_time, last_lid_event_time) > config.LID_SWITCH_DEBOUNCE_MS
+            ):
+                last_lid_event_time = current_time
+                lid_ready_for_open = False
+
+                if time.ticks_diff(current_time, last_print_time) >= config.LID_MIN_PRINT_INTERVAL_MS:
+                    last_print_time = current_time
+                    if state.printing:
+                        print("Lid opened (print in progress - not printing)")
+                    else:
+                        print("Lid opened")
+                        state.lid_opened_ms = current_time
+                        state.print_requested.set()
+                else:
+                    print("Lid opened (cooldown active - not printing)")
+        else:
+            if not lid_ready_for_open:
+                if lid_closed_since is None:
+                    if last_lid_state == 1 and time.ticks_diff(current_time, last_lid_event_time) > config.LID_SWITCH_DEBOUNCE_MS:
+                        last_lid_event_time = current_time
+                        lid_closed_since = current_time
+                        print("Lid closed")
+                else:
+                    if time.ticks_diff(current_time, lid_closed_since) >= getattr(config, "LID_CLOSED_STABLE_MS", 1000):
+                        lid_ready_for_open = True
+
+        last_lid_state = lid_state
+
+        await asyncio.sleep(config.LOOP_DELAY)
+
+
+async def led_task(np, state):
+    """Show lid state on the NeoPixel: green when open, blue when closed"""
+    last_led_state = None
+    while True:
+        if state.lid_state != last_led_state:
+            last_led_state = state.lid_state
+            np[0] = (0, 26, 0) if last_led_state == 1 else (0, 0, 26)
+            np.write()
+        await asyncio.sleep(0.05)
+
+
+async def prefetch_when_idle(printer, lid_pin, state):
+    """Load the next slip once the lid is closed, unless a print is requested first.
+
+    The work runs in steps with the other tasks run in between; the lid pin
+    is read before each step, so the slip import never starts with the lid
+    open and a print is never held up behind it.
+    """
+    while state.lid_state == 1 and not state.print_requested.is_set():
+        await asyncio.sleep(0.1)
+    try:
+        for _ in fortune_cookie.prefetch_slip_steps(printer.printer):
+            await asyncio.sleep(0)
+            if state.print_requested.is_set() or lid_pin.value() == 1:
+                return
+    except Exception as e:
+        print(f"Fortune slip prefetch failed: {e}")
+
+
+async def print_task(printer, lid_pin, state):
+    """Print a fortune each time the lid task asks for one"""
+    while True:
+        if printer:
+            await prefetch_when_idle(printer, lid_pin, state)
+        await state.print_requested.wait()
+        state.print_requested.clear()
+
+        if printer:
+            print("Printing fortune cookie...")
+            state.printing = True
+            printer.first_write_ms = None
+            try:
+                await fortune_cookie.print_fortune_async(printer)
+                if printer.first_write_ms is not None:
+                    print("Lid to first byte:", time.ticks_diff(printer.first_write_ms, state.lid_opened_ms), "ms")
+            except Exception as e:
+                print(f"Fortune cookie print failed: {e}")
+            finally:
+                state.printing = False
+        else:
+            print("Thermal printer not available")
+
+
+async def run(np, lid_pin, printer):
+    state = LidState(lid_pin.value())
+    asyncio.create_task(led_task(np, state))
+    asyncio.create_task(print_task(printer, lid_pin, state))
+    await lid_task(lid_pin, state)
+
+
 def main():
     """Main application loop"""
     startup_delay_ms = getattr(config, "STARTUP_DELAY_MS", 0)
@@ -39,12 +166,15 @@ def main():
     printer = None
     if THERMAL_PRINTER_AVAILABLE:
         try:
-            printer = ThermalPrinter()
+            printer = AsyncThermalPrinter(ThermalPrinter())
             print("Thermal printer initialized successfully")
             try:
                 modules = fortune_cookie.configure_slip_modules()
                 if modules:
                     print("Fortune slips:", len(modules), "modules")
+                plans = fortune_cookie.configure_print_plan(printer.printer)
+                if plans:
+                    print("Print plan:", plans, "slips")
             except Exception as e:
                 print(f"Fortune slip discovery failed: {e}")
         except Exception as e:
@@ -65,70 +195,14 @@ def main():
     #     except Exception as e:
     #         print(f"Failed to print startup message: {e}")
 
-    last_lid_state = lid_pin.value()
-    last_lid_event_time = 0
-    last_print_time = 0
-    lid_ready_for_open = (last_lid_state == 0)
-    lid_closed_since = None
-    last_led_state = None
-    
+    # Lid debounce, LED state and printing run as concurrent tasks so the
+    # switch and LED stay responsive for the whole print.
     try:
-        while True:
-            current_time = time.ticks_ms()
-
-            lid_state = lid_pin.value()
-            if lid_state == 1:  # Lid open
-                lid_closed_since = None
-                if last_led_state != 1:
-                    np[0] = (0, 26, 0)
-                    np.write()
-                    last_led_state = 1
-
-                if (
-                    lid_ready_for_open
-                    and last_lid_state == 0
-                    and time.ticks_diff(current_time, last_lid_event_time) > config.LID_SWITCH_DEBOUNCE_MS
-                ):
-                    last_lid_event_time = current_time
-                    lid_ready_for_open = False
-
-                    if time.ticks_diff(current_time, last_print_time) >= config.LID_MIN_PRINT_INTERVAL_MS:
-                        last_print_time = current_time
-                        print("Lid opened")
-
-                        if printer:
-                            print("Printing fortune cookie...")
-                            try:
-                                fortune_cookie.print_fortune(printer=printer)
-                            except Exception as e:
-                                print(f"Fortune cookie print failed: {e}")
-                        else:
-                            print("Thermal printer not available")
-                    else:
-                        print("Lid opened (cooldown active - not printing)")
-            else:
-                # Normal cycling when button released
-                if last_led_state != 0:
-                    np[0] = (0, 0, 26)
-                    np.write()
-                    last_led_state = 0
-
-                if not lid_ready_for_open:
-                    if lid_closed_since is None:
-                        if last_lid_state == 1 and time.ticks_diff(current_time, last_lid_event_time) > config.LID_SWITCH_DEBOUNCE_MS:
-                            last_lid_event_time = current_time
-                            lid_closed_since = current_time
-                            print("Lid closed")
-                    else:
-                        if time.ticks_diff(current_time, lid_closed_since) >= getattr(config, "LID_CLOSED_STABLE_MS", 1000):
-                            lid_ready_for_open = True
-
-            last_lid_state = lid_state
-            
-            time.sleep(0.1)  # Small delay to prevent overwhelming
-            
+        asyncio.run(run(np, lid_pin, printer))
     except Exception as e:
         print(f"LED error: {e}")
+    finally:
+        asyncio.new_event_loop()
 
 
 def get_free_memory():
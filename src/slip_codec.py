@@ -0,0 +1,91 @@
+"""
+Slip bitmap codec
+Decodes PackBits-compressed slip modules (tools/render_fortune_slip.py
+--encoding packbits) band by band, so a print holds one band, not the image
+"""
+
+ENCODING_RAW = "raw"
+ENCODING_PACKBITS = "packbits"
+
+# Long zero runs are the common case; fill them by slice instead of per byte
+_ZEROS = memoryview(bytes(128))
+
+
+class PackBitsStream:
+    """readinto() source that expands PackBits data to length bytes.
+
+    Codes: n < 128 copies the next n + 1 bytes, n > 128 repeats the next
+    byte 257 - n times, 128 is a no-op. A run may span several reads.
+    """
+
+    def __init__(self, data, length):
+        self._src = memoryview(data)
+        self._i = 0
+        self._left = 0
+        self._literal = False
+        self._value = 0
+        self.remaining = length
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        src = self._src
+        pos = 0
+        while pos < n:
+            if not self._left:
+                if self._i >= len(src):
+                    raise ValueError("PackBits data ended early")
+                code = src[self._i]
+                self._i += 1
+                if code < 128:
+                    self._literal = True
+                    self._left = code + 1
+                elif code > 128:
+                    self._literal = False
+                    self._left = 257 - code
+                    self._value = src[self._i]
+                    self._i += 1
+                continue
+
+            count = self._left
+            if count > n - pos:
+                count = n - pos
+            if self._literal:
+                buf[pos:pos + count] = src[self._i:self._i + count]
+                self._i += count
+            elif self._value == 0:
+                buf[pos:pos + count] = _ZEROS[:count]
+            else:
+                value = self._value
+                for k in range(pos, pos + count):
+                    buf[k] = value
+            pos += count
+            self._left -= count
+
+        self.remaining -= n
+        return n
+
+
+def slip_bitmap(slip):
+    """Bitmap of a slip module for print_bitmap.
+
+    Returns BITMAP itself when stored raw, or a fresh PackBitsStream when
+    the module is compressed (a stream is read once, so call again per use).
+    """
+    encoding = getattr(slip, "ENCODING", ENCODING_RAW)
+    if encoding == ENCODING_RAW:
+        return slip.BITMAP
+    if encoding == ENCODING_PACKBITS:
+        return PackBitsStream(slip.BITMAP, slip.RAW_SIZE)
+    raise ValueError("Unknown slip encoding: %s" % encoding)
+
+
+def decode(slip):
+    """Whole uncompressed bitmap of a slip module (host tools)"""
+    bitmap = slip_bitmap(slip)
+    if not hasattr(bitmap, "readinto"):
+        return bytes(bitmap)
+    out = bytearray(bitmap.remaining)
+    bitmap.readinto(out)
+    return bytes(out)
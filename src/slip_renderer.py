@@ -0,0 +1,431 @@
+"""
+Fortune slip renderer
+Lays out a fortune with a compiled bitmap font (tools/build_slip_font.py) and
+streams the rotated slip band by band, never holding the full image
+"""
+
+import struct
+
+FONT_MAGIC = b"FFNT"
+FONT_HEADER = "<4sBBBBH"
+FONT_HEADER_SIZE = 10
+FONT_EXTRA_ENTRY = "<H"
+FONT_EXTRA_ENTRY_SIZE = 2
+FONT_SIZE_ENTRY = "<HHI"
+FONT_SIZE_ENTRY_SIZE = 8
+FONT_GLYPH_ENTRY = "<BbbBBI"
+FONT_GLYPH_ENTRY_SIZE = 9
+
+# Same geometry and rules as tools/render_fortune_slip.py with the known-good
+# parameters (--width 650 --height 364 --rotate 90 --margin 0.04 --auto_size)
+SLIP_TEXT_WIDTH = 648  # 650 rounded down to a multiple of 8
+SLIP_TEXT_HEIGHT = 364
+SLIP_WIDTH = 360  # printed width after rotation, cropped to a multiple of 8
+SLIP_MARGIN = 0.04
+LUCKY_SCALE = 0.6
+LUCKY_MIN_SIZE = 12
+LUCKY_PREFIX = "\n\nLucky numbers: "
+CORNER_BLOCK_W = 19
+CORNER_BLOCK_H = 11
+LINE_GAP = 2
+
+
+class FontSize:
+    """Metrics of one size; glyph bitmaps are read from the file on demand"""
+
+    def __init__(self, font, size, line_height, table):
+        self.font = font
+        self.size = size
+        self.line_height = line_height
+        self.table = table
+
+    def glyph(self, ch):
+        """(advance, x0, y0, w, h, data offset) of ch; unknown characters use '?'"""
+        font = self.font
+        i = ord(ch) - font.first_char
+        if i < 0 or i >= font.ascii_count:
+            i = font.extras.get(ord(ch), ord('?') - font.first_char)
+        return struct.unpack_from(FONT_GLYPH_ENTRY, self.table, i * FONT_GLYPH_ENTRY_SIZE)
+
+    def text_width(self, text):
+        """Right edge of text drawn at x=0 (Pillow's textbbox()[2])"""
+        pen = 0
+        right = 0
+        for ch in text:
+            advance, x0, _, w, _, _ = self.glyph(ch)
+            if w:
+                right = pen + x0 + w
+            pen += advance
+        return right
+
+    def bitmap(self, ch):
+        advance, x0, y0, w, h, offset = self.glyph(ch)
+        if not w:
+            return b''
+        f = self.font.f
+        f.seek(offset)
+        return f.read(w * ((h + 7) // 8))
+
+
+class BitmapFont:
+    """Compiled slip font file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'rb')
+        magic, version, count, self.first_char, self.ascii_count, extra_count = struct.unpack(
+            FONT_HEADER, self.f.read(FONT_HEADER_SIZE)
+        )
+        if magic != FONT_MAGIC or version != 1:
+            self.f.close()
+            raise ValueError("Not a slip font: %s" % path)
+        # Non-ASCII glyphs follow the ASCII run in every glyph table
+        extras = self.f.read(FONT_EXTRA_ENTRY_SIZE * extra_count)
+        self.extras = {}
+        for i in range(extra_count):
+            self.extras[struct.unpack_from(FONT_EXTRA_ENTRY, extras, i * FONT_EXTRA_ENTRY_SIZE)[0]] = self.ascii_count + i
+        self.glyph_count = self.ascii_count + extra_count
+        directory = self.f.read(FONT_SIZE_ENTRY_SIZE * count)
+        self.sizes = {}
+        for i in range(count):
+            size, line_height, offset = struct.unpack_from(FONT_SIZE_ENTRY, directory, i * FONT_SIZE_ENTRY_SIZE)
+            self.sizes[size] = (line_height, offset)
+
+    def get(self, size):
+        line_height, offset = self.sizes[size]
+        self.f.seek(offset)
+        table = self.f.read(FONT_GLYPH_ENTRY_SIZE * self.glyph_count)
+        return FontSize(self, size, line_height, table)
+
+    def nearest_size(self, size):
+        """Largest available size <= size, else the smallest one"""
+        best = None
+        for s in self.sizes:
+            if s <= size and (best is None or s > best):
+                best = s
+        if best is None:
+            best = min(self.sizes)
+        return best
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def wrap_words(font_size, text, max_width):
+    """Word-wrap by pixel width, same rules as render_fortune_slip.wrap_text"""
+    lines = []
+    for paragraph in text.split('\n'):
+        if not paragraph.strip():
+            lines.append('')
+            continue
+        cur = ''
+        for word in paragraph.split():
+            test = (cur + ' ' + word).strip()
+            if font_size.text_width(test) <= max_width:
+                cur = test
+            else:
+                if cur:
+                    lines.append(cur)
+                cur = word
+        if cur:
+            lines.append(cur)
+    return lines
+
+
+def choose_size(font, text, size_min, size_max, max_width, max_height=None):
+    """Auto-size like render_fortune_slip.layout_text_for_width.
+
+    Picks the size whose widest wrapped line fills max_width best; ties go to
+    the smaller size. With max_height, sizes whose fortune and lucky number
+    block (see text_blocks) is taller than that are skipped.
+    """
+    best = None
+    best_score = -1
+    for size in sorted(font.sizes):
+        if size < size_min or size > size_max:
+            continue
+        fs = font.get(size)
+        widest = 0
+        for line in wrap_words(fs, text, max_width):
+            w = fs.text_width(line)
+            if w > widest:
+                widest = w
+        if widest > max_width:
+            continue
+        if max_height is not None and text_blocks(font, text, size, max_width)[2] > max_height:
+            continue
+        score = widest / max_width
+        if score > best_score:
+            best, best_score = size, score
+    if best is None:
+        best = font.nearest_size(size_min)
+    return best
+
+
+def text_blocks(font, text, size, max_width):
+    """Wrap text at size: ([(FontSize, lines) for fortune and lucky numbers],
+    spacing between them, total height)"""
+    fortune_text, _, lucky = text.partition(LUCKY_PREFIX)
+    if lucky:
+        lucky = "Lucky numbers: " + lucky
+    main_fs = font.get(size)
+    lucky_fs = font.get(font.nearest_size(max(LUCKY_MIN_SIZE, int(size * LUCKY_SCALE))))
+
+    blocks = []
+    for fs, part in ((main_fs, fortune_text), (lucky_fs, lucky)):
+        if part:
+            blocks.append((fs, wrap_words(fs, part, max_width)))
+        else:
+            blocks.append((fs, []))
+
+    spacing = max(8, int(main_fs.line_height * 0.5))
+    total = spacing
+    for fs, lines in blocks:
+        total += len(lines) * (fs.line_height + LINE_GAP)
+    return blocks, spacing, total
+
+
+def place_line(fs, line, x, y, items, glyphs):
+    """Append the glyph items of line drawn at (x, y) to items.
+
+    glyphs caches bitmaps by (size, char) so repeated letters share one copy.
+    """
+    for ch in line:
+        advance, x0, y0, w, h, _ = fs.glyph(ch)
+        if w:
+            key = (fs.size, ch)
+            if key not in glyphs:
+                glyphs[key] = fs.bitmap(ch)
+            items.append((x + x0, y + y0, w, h, glyphs[key]))
+        x += advance
+
+
+def layout_slip(font, text, size_min=24, size_max=80):
+    """Place text on the unrotated slip.
+
+    Returns a list of (x, y, w, h, column-major bitmap) items in unrotated
+    coordinates (SLIP_TEXT_WIDTH x SLIP_TEXT_HEIGHT), corner blocks included.
+    """
+    width = SLIP_TEXT_WIDTH
+    height = SLIP_TEXT_HEIGHT
+    max_width = width - 2 * int(width * SLIP_MARGIN)
+
+    # The lucky numbers must stay on the slip: sizes that overflow it are skipped
+    size = choose_size(font, text, size_min, size_max, max_width, height)
+    blocks, spacing, total = text_blocks(font, text, size, max_width)
+
+    items = []
+    glyphs = {}
+    y = max(0, (height - total) // 2)
+    for i, (fs, lines) in enumerate(blocks):
+        if i:
+            y += spacing
+        for line in lines:
+            place_line(fs, line, (width - fs.text_width(line)) // 2, y, items, glyphs)
+            y += fs.line_height + LINE_GAP
+
+    # Corner blocks, as drawn by render_fortune_slip
+    bw, bh = CORNER_BLOCK_W, CORNER_BLOCK_H
+    col = _solid_column(bh)
+    for x, y in ((0, 0), (width - bw, 0), (0, height - bh), (width - bw, height - bh)):
+        items.append((x, y, bw, bh, col * bw))
+    return items
+
+
+def layout_in_region(fs, text, region):
+    """Items for text centered in region (x, y, w, h) of the unrotated slip"""
+    x, y, w, h = region
+    items = []
+    place_line(fs, text, x + (w - fs.text_width(text)) // 2, y + (h - fs.line_height) // 2, items, {})
+    return items
+
+
+def _solid_column(h):
+    col = bytearray((h + 7) // 8)
+    for y in range(h):
+        col[y >> 3] |= 0x80 >> (y & 7)
+    return bytes(col)
+
+
+class ItemRows:
+    """ORs items of an unrotated layout into printed rows of the rotated slip.
+
+    Printed row r is column (text_width - 1 - r) of the layout. Rows must be
+    requested in increasing order.
+    """
+
+    def __init__(self, items, text_width=SLIP_TEXT_WIDTH):
+        self.text_width = text_width
+        # Rows walk the text from right to left, so order items by left edge
+        # descending: finished items are then always a prefix of the list
+        self.items = sorted(items, key=lambda item: item[0], reverse=True)
+        self.max_item_w = max([item[2] for item in items] or [0])
+        self.first_row = text_width
+        self.last_row = -1
+        for gx, _, w, _, _ in items:
+            if text_width - gx - w < self.first_row:
+                self.first_row = text_width - gx - w
+            if text_width - 1 - gx > self.last_row:
+                self.last_row = text_width - 1 - gx
+        self._first = 0
+
+    def or_row(self, row, r):
+        """OR the ink of printed row r into row; returns False if there is none"""
+        if r < self.first_row or r > self.last_row:
+            return False
+        row_len = len(row)
+        x = self.text_width - 1 - r
+        items = self.items
+        while self._first < len(items) and items[self._first][0] > x:
+            self._first += 1
+        for i in range(self._first, len(items)):
+            gx, gy, w, h, data = items[i]
+            if gx + self.max_item_w <= x:
+                break  # everything further on lies left of this column
+            if gx + w <= x:
+                continue
+            col_bytes = (h + 7) // 8
+            start = (x - gx) * col_bytes
+            shift = gy & 7
+            dst = gy >> 3
+            for k in range(col_bytes):
+                b = data[start + k]
+                if not b:
+                    continue
+                j = dst + k
+                if j >= row_len:
+                    break  # below the cropped slip width
+                row[j] |= b >> shift
+                if shift and j + 1 < row_len:
+                    row[j + 1] |= (b << (8 - shift)) & 0xFF
+        return True
+
+
+class SlipRenderStream:
+    """Rotated slip rows as a readinto() stream for ThermalPrinter.print_bitmap.
+
+    Each printed row is assembled from glyph columns as it is needed.
+    """
+
+    def __init__(self, items, width=SLIP_WIDTH, height=SLIP_TEXT_WIDTH):
+        self.width = width
+        self.height = height
+        self.bytes_per_line = width // 8
+        self.rows = ItemRows(items, height)
+        self.remaining = self.bytes_per_line * height
+        self._row = bytearray(self.bytes_per_line)
+        self._row_pos = self.bytes_per_line
+        self._next_row = 0
+
+    def _render_row(self, r):
+        row = self._row
+        for i in range(len(row)):
+            row[i] = 0
+        self.rows.or_row(row, r)
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        bpl = self.bytes_per_line
+        row = self._row
+        done = 0
+        while done < n:
+            if self._row_pos == bpl:
+                self._render_row(self._next_row)
+                self._next_row += 1
+                self._row_pos = 0
+            take = bpl - self._row_pos
+            if take > n - done:
+                take = n - done
+            buf[done:done + take] = row[self._row_pos:self._row_pos + take]
+            self._row_pos += take
+            done += take
+        self.remaining -= n
+        return n
+
+
+class OverlayStream:
+    """Band source wrapper that ORs extra items into a slip as it streams.
+
+    base is a readinto() source of row-major rows (width x height); items are
+    in the unrotated layout, so a rotated slip's column x lands on printed row
+    height - 1 - x. Only rows that carry overlay ink are touched.
+    """
+
+    def __init__(self, base, items, width, height):
+        self.base = base
+        self.bytes_per_line = width // 8
+        self.rows = ItemRows(items, height)
+        self.remaining = self.bytes_per_line * height
+        self._pos = 0
+        self._row = bytearray(self.bytes_per_line)
+
+    def readinto(self, buf):
+        n = self.base.readinto(buf)
+        if not n:
+            return n
+        bpl = self.bytes_per_line
+        row = self._row
+        r = self._pos // bpl
+        end = self._pos + n
+        while r * bpl < end:
+            for i in range(bpl):
+                row[i] = 0
+            if self.rows.or_row(row, r):
+                # Byte range of row r that lies in this buffer
+                lo = r * bpl
+                a = lo if lo > self._pos else self._pos
+                b = lo + bpl if lo + bpl < end else end
+                for i in range(a, b):
+                    v = row[i - lo]
+                    if v:
+                        buf[i - self._pos] |= v
+            elif r > self.rows.last_row:
+                break
+            r += 1
+        self._pos = end
+        self.remaining -= n
+        return n
+
+
+class BufferStream:
+    """readinto() view over an in-memory bitmap (e.g. a slip module's BITMAP)"""
+
+    def __init__(self, data):
+        self._mv = memoryview(data)
+        self._pos = 0
+        self.remaining = len(data)
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        buf[:n] = self._mv[self._pos:self._pos + n]
+        self._pos += n
+        self.remaining -= n
+        return n
+
+
+def open_slip(font, text, size_min=24, size_max=80):
+    """Lay out text and return (stream, width, height) for print_bitmap"""
+    stream = SlipRenderStream(layout_slip(font, text, size_min, size_max))
+    return stream, stream.width, stream.height
+
+
+def overlay_lucky_numbers(bitmap, width, height, region, atlas, numbers):
+    """Wrap a slip (bytes or readinto() stream) so numbers print in region.
+
+    atlas is a BitmapFont holding the digits; its first size is used.
+    """
+    if not hasattr(bitmap, 'readinto'):
+        bitmap = BufferStream(bitmap)
+    fs = atlas.get(min(atlas.sizes))
+    return OverlayStream(bitmap, layout_in_region(fs, numbers, region), width, height)
@@ -5,8 +5,51 @@ Supports GOOJPRT QR203 and similar 58mm thermal printers
 
 import config
 from machine import UART, Pin
+import binascii
+import hashlib
+import json
+import struct
 import time
 
+class _WriteBatch:
+    """Context manager returned by ThermalPrinter.batch()"""
+
+    def __init__(self, printer):
+        self.printer = printer
+
+    def __enter__(self):
+        self.printer._batch_depth += 1
+        return self.printer
+
+    def __exit__(self, exc_type, exc, tb):
+        printer = self.printer
+        printer._batch_depth -= 1
+        if printer._batch_depth == 0:
+            printer.flush()
+        return False
+
+
+class _PatternStream:
+    """Calibration test pattern as a readinto() stream: solid and 50% rows"""
+
+    def __init__(self, bytes_per_line, height):
+        self.bytes_per_line = bytes_per_line
+        self.remaining = bytes_per_line * height
+        self.pos = 0
+
+    def readinto(self, buf):
+        n = len(buf)
+        if n > self.remaining:
+            n = self.remaining
+        bpl = self.bytes_per_line
+        for i in range(n):
+            row = (self.pos + i) // bpl
+            buf[i] = 0xFF if (row // 8) % 2 == 0 else 0xAA
+        self.pos += n
+        self.remaining -= n
+        return n
+
+
 class ThermalPrinter:
     """Thermal printer driver class"""
     
@@ -33,14 +76,69 @@ class ThermalPrinter:
     # Line spacing
     LINE_SPACING_DEFAULT = ESC + b'2'
     LINE_SPACING_24 = ESC + b'3' + bytes([24])
+
+    # 90 degree clockwise character rotation
+    ROTATE_90_ON = ESC + b'V' + bytes([1])
+    ROTATE_90_OFF = ESC + b'V' + bytes([0])
+
+    # Font A character cell in dots
+    FONT_A_WIDTH = 12
+    FONT_A_HEIGHT = 24
     
     # Feed and cut commands
     FEED_1_LINE = ESC + b'd' + bytes([1])
     FEED_3_LINES = ESC + b'd' + bytes([3])
     FEED_N_LINES = ESC + b'd'  # + n
+    FEED_N_DOTS = ESC + b'J'  # + n (vertical motion units, 1 dot on 203 dpi printers)
+
+    # Software flow control bytes sent by the printer
+    XON = 0x11
+    XOFF = 0x13
+
+    # Real-time status (DLE EOT n) and automatic status back (GS a n)
+    DLE = b'\x10'
+    STATUS_REQUEST = DLE + b'\x04'  # + n (1 printer, 2 offline, 3 error, 4 paper sensor)
+    AUTO_STATUS_BACK = GS + b'a'  # + n
+    ASB_ENABLE = 0x0E  # online/offline, error and paper sensor changes
+
+    # User setup commands (GS ( E): enter setup, set serial baud rate, exit + reset
+    SETUP_ENTER = GS + b'(E' + bytes([3, 0, 1, 73, 78])
+    SETUP_EXIT = GS + b'(E' + bytes([4, 0, 2, 79, 85, 84])
+
+    # Print plan files (tools/build_print_plan.py): header, an index of
+    # (offset, length) records, then per slip a run of steps, each a u16 byte
+    # count and u32 delay in microseconds followed by those bytes
+    PLAN_MAGIC = b'FPLN'
+    PLAN_VERSION = 1
+    PLAN_HEADER = '<4sBHH'  # magic, version, plan count, largest step
+    PLAN_HEADER_SIZE = 9
+    PLAN_INDEX_ENTRY = '<II'
+    PLAN_INDEX_ENTRY_SIZE = 8
+    PLAN_STEP_SIZE = 6
+
+    # Bounds for the status-driven multiplier on chunk/band delays
+    PACE_SCALE_MIN = 0.5
+    PACE_SCALE_MAX = 4.0
+
+    # Pacing used when config has no THERMAL_PRINTER_PACING_PROFILES
+    FIXED_PACING = {
+        'write_delay': 0.01,
+        'chunk_size': 64,
+        'chunk_delay': 0.03,
+        'band_height': 24,
+        'band_delay': 0.20,
+    }
+
+    # NV graphics (GS ( L function 67 define, 69 print)
+    NV_GRAPHICS = GS + b'(L'
+    NV_GRAPHICS_LARGE = GS + b'8L'
     
-    def __init__(self, uart_id=None, tx_pin=None, rx_pin=None, baudrate=None):
-        """Initialize thermal printer"""
+    def __init__(self, uart_id=None, tx_pin=None, rx_pin=None, baudrate=None, uart=None):
+        """Initialize thermal printer
+
+        uart: an already-open UART (or a fake with write()) to use instead of
+              opening config.UART_ID
+        """
         if not config.THERMAL_PRINTER_ENABLED:
             raise RuntimeError("Thermal printer is disabled in config")
             
@@ -48,64 +146,573 @@ class ThermalPrinter:
         self.tx_pin = tx_pin or config.UART_TX_PIN
         self.rx_pin = rx_pin or config.UART_RX_PIN
         self.baudrate = baudrate or config.UART_BAUDRATE
+        self.bytes_written = 0
+        self.last_bitmap_stats = None
+        self._wbuf = bytearray(getattr(config, "THERMAL_PRINTER_WRITE_BUFFER", 512))
+        self._wlen = 0
+        self._batch_depth = 0
+        self._raster_margin = 0
+        self._plan_buf = None
+        self._plans = {}  # plan path -> (count, largest step, index table), from plan_count
+        # GS v 0 header filled in place for every raster command
+        self._raster_header = bytearray(self.GS + b'v0' + bytes(5))
+
+        self.nv_graphics = getattr(config, "THERMAL_PRINTER_NV_GRAPHICS", False)
+        self.nv_record_path = getattr(config, "THERMAL_PRINTER_NV_RECORD", "nv_slips.json")
+        self.nv_record = self._load_nv_record() if self.nv_graphics else {}
         
+        self.flow_control = getattr(config, "THERMAL_PRINTER_FLOW_CONTROL", "none")
+        self.busy_pin = None
+        self.busy_level = getattr(config, "THERMAL_PRINTER_BUSY_LEVEL", 1)
+        self.ready_timeout_ms = getattr(config, "THERMAL_PRINTER_READY_TIMEOUT_MS", 5000)
+        self._xoff = False
+        self.pacing = self._pacing_profile()
+
+        self.status_mode = getattr(config, "THERMAL_PRINTER_STATUS", "none")
+        self.status = {
+            'offline': False,
+            'cover_open': False,
+            'paper_near_end': False,
+            'paper_out': False,
+            'head_overheat': False,
+            'error': False,
+        }
+        self.pace_scale = 1.0
+        self._status_fresh = False
+        self._status_queries = []
+        self._next_status_query = 1
+        self._status_query_steps = [(self.STATUS_REQUEST + bytes([n]), 0) for n in (1, 2, 3, 4)]
+        self._asb_frame = None
+
         try:
-            self.uart = UART(
-                self.uart_id,
-                baudrate=self.baudrate,
-                tx=self.tx_pin,
-                rx=self.rx_pin,
-                timeout=config.UART_TIMEOUT
-            )
+            if uart is None:
+                uart_kwargs = {}
+                if self.flow_control == 'rtscts':
+                    uart_kwargs['flow'] = UART.RTS | UART.CTS
+                    uart_kwargs['rts'] = config.UART_RTS_PIN
+                    uart_kwargs['cts'] = config.UART_CTS_PIN
+                uart = UART(
+                    self.uart_id,
+                    baudrate=self.baudrate,
+                    tx=self.tx_pin,
+                    rx=self.rx_pin,
+                    timeout=config.UART_TIMEOUT,
+                    **uart_kwargs
+                )
+            self.uart = uart
+            if self.flow_control == 'busy':
+                self.busy_pin = Pin(config.THERMAL_PRINTER_BUSY_PIN, Pin.IN)
+            if getattr(config, "UART_BAUD_PROBE", False):
+                self.negotiate_baudrate()
             self.init_printer()
+            if self.status_mode == 'asb':
+                self.write(self.AUTO_STATUS_BACK + bytes([self.ASB_ENABLE]))
             print(f"Thermal printer initialized on UART{self.uart_id}")
         except Exception as e:
             print(f"Failed to initialize thermal printer: {e}")
             raise
     
+    def _pacing_profile(self):
+        """Pick the pacing profile: streaming when flow control is on, else fixed delays"""
+        profiles = getattr(config, "THERMAL_PRINTER_PACING_PROFILES", {})
+        name = getattr(config, "THERMAL_PRINTER_PACING", None)
+        if name is None:
+            name = 'fixed' if self.flow_control == 'none' else 'flow'
+        pacing = dict(self.FIXED_PACING)
+        pacing.update(profiles.get(name, {}))
+
+        # A profile saved by calibrate() overrides the configured one
+        try:
+            with open(getattr(config, "THERMAL_PRINTER_PROFILE_FILE", "printer_profile.json")) as f:
+                saved = json.load(f)
+            for key in self.FIXED_PACING:
+                if key in saved:
+                    pacing[key] = saved[key]
+        except (OSError, ValueError):
+            pass
+        return pacing
+
+    def calibrate(self, band_heights=(24, 48), chunk_sizes=(64, 256), chunk_delays=(0.03, 0.01, 0),
+                  width=360, rows=48, save=True):
+        """
+        Find the fastest pacing that prints cleanly. Run from the REPL:
+            >>> ThermalPrinter().calibrate()
+        Prints a labelled test pattern for every combination of band height,
+        chunk size and inter-chunk delay, checks printer status after each to
+        catch buffer overruns, and records throughput. The fastest clean
+        setting is saved to THERMAL_PRINTER_PROFILE_FILE, which _pacing_profile
+        loads at init. Check the printout too: cheap printers may garble an
+        overrun without reporting it. Returns the list of results.
+        """
+        if self.get_status() is None:
+            print("Calibration needs printer status replies on UART_RX_PIN")
+            return None
+
+        original = self.pacing
+        results = []
+        try:
+            for band_height in band_heights:
+                for chunk_size in chunk_sizes:
+                    for chunk_delay in chunk_delays:
+                        trial = dict(original)
+                        trial['band_height'] = band_height
+                        trial['chunk_size'] = chunk_size
+                        trial['chunk_delay'] = chunk_delay
+
+                        self.pacing = original
+                        self.print_text(f"bh={band_height} cs={chunk_size} cd={int(chunk_delay * 1000)}ms")
+                        self.pacing = trial
+
+                        start = time.ticks_ms()
+                        self.print_bitmap(_PatternStream(width // 8, rows), width, rows)
+                        elapsed_ms = time.ticks_diff(time.ticks_ms(), start)
+
+                        status = self.get_status()
+                        clean = (
+                            status is not None
+                            and not status['offline']
+                            and not status['error']
+                            and not self._xoff
+                        )
+                        result = dict(trial)
+                        result['bytes_per_s'] = self.last_bitmap_stats['bytes'] * 1000 // max(elapsed_ms, 1)
+                        result['clean'] = clean
+                        results.append(result)
+                        print("calibrate:", band_height, chunk_size, chunk_delay,
+                              result['bytes_per_s'], "B/s", "ok" if clean else "OVERRUN")
+
+                        # Let the printer drain before the next setting
+                        self.pacing = original
+                        time.sleep(1)
+                        self.feed(1)
+        finally:
+            self.pacing = original
+
+        best = None
+        for result in results:
+            if result['clean'] and (best is None or result['bytes_per_s'] > best['bytes_per_s']):
+                best = result
+
+        if best is None:
+            print("calibrate: no setting printed cleanly - keeping current pacing")
+        elif save:
+            profile = {}
+            for key in self.FIXED_PACING:
+                profile[key] = best[key]
+            profile['bytes_per_s'] = best['bytes_per_s']
+            with open(getattr(config, "THERMAL_PRINTER_PROFILE_FILE", "printer_profile.json"), 'w') as f:
+                json.dump(profile, f)
+            for key in self.FIXED_PACING:
+                self.pacing[key] = best[key]
+            print("calibrate: saved", profile)
+
+        return results
+
     def init_printer(self):
         """Initialize printer with default settings"""
-        self.write(self.LINE_SPACING_DEFAULT)
-        self.write(self.JUSTIFY_LEFT)
-        self.write(self.FONT_SIZE_NORMAL)
-        self.write(self.BOLD_OFF)
-        self.write(self.UNDERLINE_OFF)
+        with self.batch():
+            self.write(self.LINE_SPACING_DEFAULT)
+            self.write(self.JUSTIFY_LEFT)
+            self.write(self.FONT_SIZE_NORMAL)
+            self.write(self.BOLD_OFF)
+            self.write(self.UNDERLINE_OFF)
         time.sleep(0.1)
-    
+
+    def batch(self):
+        """Coalesce writes: inside `with printer.batch():` commands and text are
+        collected in a preallocated buffer and sent as one UART write on exit
+        (or whenever the buffer fills). Batches nest.
+        """
+        return _WriteBatch(self)
+
+    def flush(self):
+        """Send anything collected in the write buffer"""
+        n = self._wlen
+        if not n:
+            return
+        self._wlen = 0
+        self.wait_ready()
+        self.uart.write(memoryview(self._wbuf)[:n])
+        self.bytes_written += n
+        delay = self.pacing['write_delay']
+        if delay:
+            time.sleep(delay)
+
     def write(self, data):
         """Write data to printer"""
         if isinstance(data, str):
             data = data.encode('ascii')
+        if self._batch_depth:
+            n = len(data)
+            if self._wlen + n > len(self._wbuf):
+                self.flush()
+            if n <= len(self._wbuf):
+                memoryview(self._wbuf)[self._wlen:self._wlen + n] = data
+                self._wlen += n
+                return
+        self.wait_ready()
         self.uart.write(data)
-        time.sleep(0.01)  # Small delay for printer processing
+        self.bytes_written += len(data)
+        delay = self.pacing['write_delay']
+        if delay:
+            time.sleep(delay)  # Small delay for printer processing
+
+    def send(self, commands):
+        """Send (data, delay_s) pairs from a command generator.
+
+        Command generators hold the wire format and pacing in one place so the
+        blocking and the async driver (thermal_printer_async) stay identical.
+        """
+        self.flush()
+        try:
+            for data, delay in commands:
+                self.wait_ready()
+                self.uart.write(data)
+                self.bytes_written += len(data)
+                if delay:
+                    time.sleep(delay)
+        except Exception:
+            self.recover()
+            raise
+
+    def recover_commands(self):
+        """Undo what an interrupted command generator may have left set:
+        the GS L raster margin and the ESC ! print mode"""
+        if self._raster_margin:
+            yield from self._left_margin_commands(0)
+        yield self.FONT_SIZE_NORMAL, self.pacing['write_delay']
+
+    def recover(self):
+        """Reset margin and print mode after a failed send (e.g. paper out
+        mid-bitmap) so the next print isn't shifted. Skips flow control."""
+        try:
+            for data, _ in self.recover_commands():
+                self.uart.write(data)
+                self.bytes_written += len(data)
+        except Exception as e:
+            print(f"Could not reset printer after error: {e}")
+
+    def ready(self):
+        """True when the printer can accept more data.
+
+        Only the BUSY pin and XON/XOFF modes are checked here; RTS/CTS is
+        handled by the UART hardware and 'none' relies on the fixed delays.
+        """
+        if self.busy_pin is not None:
+            return self.busy_pin.value() != self.busy_level
+        if self.flow_control == 'xonxoff':
+            self.poll_rx()
+            return not self._xoff
+        return True
+
+    def poll_rx(self):
+        """Consume pending printer replies: XON/XOFF, DLE EOT status and ASB frames"""
+        n = self.uart.any()
+        if not n:
+            return
+        for b in self.uart.read(n) or b'':
+            if self._asb_frame is not None:
+                self._asb_frame.append(b)
+                if len(self._asb_frame) == 4:
+                    self._apply_asb(self._asb_frame)
+                    self._asb_frame = None
+            elif b == self.XOFF:
+                self._xoff = True
+            elif b == self.XON:
+                self._xoff = False
+            elif b & 0x93 == 0x10:
+                # First byte of a 4-byte automatic status back frame
+                self._asb_frame = [b]
+            elif b & 0x93 == 0x12:
+                # Reply to the oldest outstanding DLE EOT n
+                if self._status_queries:
+                    self._apply_status(self._status_queries.pop(0), b)
+
+    def _apply_status(self, n, b):
+        status = self.status
+        if n == 1:
+            status['offline'] = bool(b & 0x08)
+        elif n == 2:
+            status['cover_open'] = bool(b & 0x04)
+            status['paper_out'] = bool(b & 0x20)
+            status['error'] = bool(b & 0x40)
+        elif n == 3:
+            status['head_overheat'] = bool(b & 0x40)
+            status['error'] = bool(b & 0x2C)
+        elif n == 4:
+            status['paper_near_end'] = bool(b & 0x0C)
+            status['paper_out'] = bool(b & 0x60)
+        self._status_fresh = True
+
+    def _apply_asb(self, frame):
+        status = self.status
+        status['offline'] = bool(frame[0] & 0x08)
+        status['cover_open'] = bool(frame[0] & 0x20)
+        status['head_overheat'] = bool(frame[1] & 0x40)
+        status['error'] = bool(frame[1] & 0x2C)
+        status['paper_near_end'] = bool(frame[2] & 0x03)
+        status['paper_out'] = bool(frame[2] & 0x0C)
+        self._status_fresh = True
+
+    def buffer_near_full(self):
+        """Best available signal that the printer wants us to slow down"""
+        if self.busy_pin is not None and self.busy_pin.value() == self.busy_level:
+            return True
+        return self._xoff or self.status['offline']
+
+    def get_status(self, timeout_ms=200, queries=(1, 2, 3, 4)):
+        """Query DLE EOT n and return the status dict, or None if the printer never replied"""
+        self.flush()
+        self._status_queries = []
+        self._status_fresh = False
+        replied = False
+        for n in queries:
+            self._status_queries.append(n)
+            self.uart.write(self.STATUS_REQUEST + bytes([n]))
+            self.bytes_written += 3
+            for _ in range(timeout_ms):
+                self.poll_rx()
+                if not self._status_queries:
+                    replied = True
+                    break
+                time.sleep(0.001)
+            self._status_queries = []
+        if not replied:
+            return None
+        return dict(self.status)
+
+    def _load_saved_baudrate(self):
+        try:
+            with open(getattr(config, "UART_BAUD_FILE", "printer_baud.txt")) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _save_baudrate(self, baudrate):
+        try:
+            with open(getattr(config, "UART_BAUD_FILE", "printer_baud.txt"), 'w') as f:
+                f.write(str(baudrate))
+        except OSError as e:
+            print(f"Could not save printer baud rate: {e}")
+
+    def _try_baudrate(self, baudrate):
+        """Reopen the UART at baudrate and check the printer answers a status request"""
+        self.uart.init(baudrate=baudrate)
+        self.baudrate = baudrate
+        self.uart.read()  # drop anything received at the old rate
+        return self.get_status(timeout_ms=100, queries=(1,)) is not None
+
+    def set_printer_baudrate(self, baudrate):
+        """Switch the printer's serial rate (GS ( E fn 11) and follow it on our UART.
+
+        The printer stores the rate and resets, so this costs an NV write;
+        negotiate_baudrate() only does it when the saved rate is unusable.
+        """
+        digits = str(baudrate).encode()
+        n = 2 + len(digits)
+        self.write(self.SETUP_ENTER)
+        self.write(self.GS + b'(E' + bytes([n & 0xFF, (n >> 8) & 0xFF, 11, 1]) + digits)
+        self.write(self.SETUP_EXIT)
+        time.sleep(getattr(config, "UART_BAUD_SWITCH_RESET_S", 3))
+        return self._try_baudrate(baudrate)
+
+    def negotiate_baudrate(self):
+        """Find a rate the printer answers at, optionally move it to UART_BAUD_TARGET,
+        and remember the result in UART_BAUD_FILE so later boots skip the probing.
+        Returns the working rate, or None (UART left at the configured rate).
+        A printer that answered at no rate is recorded as 0, so later boots
+        don't probe again until UART_BAUD_FILE is deleted.
+        """
+        configured = self.baudrate
+        saved = self._load_saved_baudrate()
+        if saved == 0:
+            print("Printer did not answer on an earlier boot - skipping the baud probe")
+            return None
+        if saved and self._try_baudrate(saved):
+            print(f"Printer answered at saved {saved} baud")
+            return saved
+
+        candidates = [configured]
+        for rate in getattr(config, "UART_BAUD_CANDIDATES", ()):
+            if rate not in candidates:
+                candidates.append(rate)
+
+        working = None
+        for rate in candidates:
+            if self._try_baudrate(rate):
+                working = rate
+                break
+
+        if working is None:
+            print("Printer did not answer a status request at any baud rate")
+            self._try_baudrate(configured)
+            self._save_baudrate(0)
+            return None
+
+        target = getattr(config, "UART_BAUD_TARGET", None)
+        if target and target != working and getattr(config, "UART_BAUD_SWITCH", False):
+            print(f"Switching printer from {working} to {target} baud")
+            if self.set_printer_baudrate(target):
+                working = target
+            else:
+                print("Printer did not answer at the new rate - staying at", working)
+                self._try_baudrate(working)
+
+        print(f"Printer answered at {working} baud")
+        self._save_baudrate(working)
+        return working
+
+    def _status_gate_commands(self):
+        """Between bands: apply status replies, adapt pacing and request the next reply.
+
+        Queries are sent in-stream and their replies are picked up at the next
+        band, so neither driver ever blocks waiting for the printer to answer.
+        """
+        if self.status_mode == 'none':
+            return
+        self.poll_rx()
+        if self.status['paper_out']:
+            raise RuntimeError("Printer out of paper")
+        if self.status['cover_open']:
+            raise RuntimeError("Printer cover open")
+
+        # Only a reply we actually received may speed us up
+        if self._status_fresh:
+            self._status_fresh = False
+            if self.buffer_near_full() or self.status['head_overheat']:
+                scale = self.pace_scale * 2
+                self.pace_scale = scale if scale < self.PACE_SCALE_MAX else self.PACE_SCALE_MAX
+            else:
+                scale = self.pace_scale * 0.8
+                self.pace_scale = scale if scale > self.PACE_SCALE_MIN else self.PACE_SCALE_MIN
+
+        # Stop asking a printer that doesn't answer
+        if self.status_mode == 'poll' and len(self._status_queries) < 4:
+            n = self._next_status_query
+            self._next_status_query = n % 4 + 1
+            self._status_queries.append(n)
+            yield self._status_query_steps[n - 1]
+
+    def wait_ready(self):
+        """Block until ready() or raise after THERMAL_PRINTER_READY_TIMEOUT_MS"""
+        if self.ready():
+            return
+        for _ in range(self.ready_timeout_ms):
+            time.sleep(0.001)
+            if self.ready():
+                return
+        raise RuntimeError("Printer not ready (flow control timeout)")
 
     def set_absolute_position(self, dots):
+        self.write(self._position_command(dots))
+
+    def _position_command(self, dots):
         if dots < 0:
             dots = 0
         nL = dots & 0xFF
         nH = (dots >> 8) & 0xFF
-        self.write(self.ESC + b'$' + bytes([nL, nH]))
+        return self.ESC + b'$' + bytes([nL, nH])
+
+    def set_line_spacing(self, dots=None):
+        """Set line spacing in dots (ESC 3 n); None restores the default (ESC 2)"""
+        self.write(self._line_spacing_command(dots))
+
+    def _line_spacing_command(self, dots=None):
+        if dots is None:
+            return self.LINE_SPACING_DEFAULT
+        return self.ESC + b'3' + bytes([dots & 0xFF])
+
+    def set_left_margin(self, dots):
+        """Set the left margin in dots (GS L); also moves raster images"""
+        self.send(self._left_margin_commands(dots))
+
+    def _left_margin_commands(self, dots):
+        if dots < 0:
+            dots = 0
+        nL = dots & 0xFF
+        nH = (dots >> 8) & 0xFF
+        self._raster_margin = dots
+        yield self.GS + b'L' + bytes([nL, nH]), self.pacing['write_delay']
 
     def bit_image_row(self, row_bytes, mode=0):
+        self.write(self._bit_image_command(row_bytes, mode))
+
+    def _bit_image_command(self, row_bytes, mode=0):
         if isinstance(row_bytes, list):
             row_bytes = bytes(row_bytes)
         n = len(row_bytes)
         nL = n & 0xFF
         nH = (n >> 8) & 0xFF
-        self.write(self.ESC + b'*' + bytes([mode, nL, nH]) + row_bytes)
+        return self.ESC + b'*' + bytes([mode, nL, nH]) + row_bytes
 
     def print_corner_blocks(self, block_width_px=16, rows=3, left_margin_dots=0, right_margin_dots=0):
-        bytes_per_row = (block_width_px + 7) // 8
-        row_bytes = bytes([0xFF] * bytes_per_row)
+        self.send(self.corner_blocks_commands(block_width_px, rows, left_margin_dots, right_margin_dots))
+
+    def corner_blocks_commands(self, block_width_px=16, rows=3, left_margin_dots=0, right_margin_dots=0):
+        """Solid blocks at both paper edges, rows x 8 dots tall (ESC * bit images)"""
+        delay = self.pacing['write_delay']
+        # 8-dot single density: one byte per column, so a solid column is 0xFF
+        row_bytes = bytes([0xFF]) * block_width_px
         right_pos = 384 - right_margin_dots - block_width_px
         if right_pos < 0:
             right_pos = 0
+        yield self._line_spacing_command(8), delay
         for _ in range(rows):
-            self.set_absolute_position(left_margin_dots)
-            self.bit_image_row(row_bytes, mode=0)
-            self.set_absolute_position(right_pos)
-            self.bit_image_row(row_bytes, mode=0)
-            self.write(b'\n')
+            yield (
+                self._position_command(left_margin_dots) + self._bit_image_command(row_bytes)
+                + self._position_command(right_pos) + self._bit_image_command(row_bytes) + b'\n'
+            ), delay
+        yield self.LINE_SPACING_DEFAULT, delay
+
+    def rotated_text_commands(self, lines, rows=None, width=384):
+        """Print lines as portrait text, characters rotated 90 degrees (ESC V).
+
+        lines: (text, size) pairs, size being an ESC ! value; the first line
+        is rightmost so the slip reads top to bottom once turned. Each printed
+        row holds one character of every line, so rows (default: the longest
+        line) sets the slip length. Lines are centered across width dots.
+        In rotated mode double height widens a column and double width
+        lengthens the row pitch.
+        """
+        delay = self.pacing['write_delay']
+        columns = []  # (x, text, size) left to right
+        x = width
+        for text, size in lines:
+            x -= self.FONT_A_HEIGHT * (2 if size & 0x10 else 1)
+            columns.append((x, text, size))
+        columns.reverse()
+        # Columns are packed against the right edge; move them left to center
+        shift = x // 2 if x > 0 else 0
+        pitch = self.FONT_A_WIDTH
+        for _, _, size in columns:
+            if size & 0x20:
+                pitch = self.FONT_A_WIDTH * 2
+        if rows is None:
+            rows = max(len(text) for _, text, _ in columns) if columns else 0
+
+        yield self.ROTATE_90_ON + self._line_spacing_command(pitch), delay
+        current_size = None
+        for row in range(rows):
+            out = b''
+            i = 0
+            while i < len(columns):
+                # Adjacent columns of one size print as a run after a single ESC $
+                col_x, _, size = columns[i]
+                run = ''
+                while i < len(columns) and columns[i][2] == size:
+                    text = columns[i][1]
+                    run += text[row] if row < len(text) else ' '
+                    i += 1
+                run = run.rstrip()
+                if not run:
+                    continue
+                out += self._position_command(col_x - shift)
+                if size != current_size:
+                    out += self.ESC + b'!' + bytes([size])
+                    current_size = size
+                out += run.encode('ascii')
+            yield out + b'\n', delay
+        yield self.ROTATE_90_OFF + self.FONT_SIZE_NORMAL + self.LINE_SPACING_DEFAULT, delay
     
     def print_text(self, text):
         """Print text line"""
@@ -168,133 +775,567 @@ class ThermalPrinter:
     
     def test_print(self):
         """Print test pattern"""
-        self.print_separator('=', 32)
-        self.print_line("THERMAL PRINTER TEST", "center")
-        self.print_separator('=', 32)
-        self.feed(1)
+        with self.batch():
+            self.print_separator('=', 32)
+            self.print_line("THERMAL PRINTER TEST", "center")
+            self.print_separator('=', 32)
+            self.feed(1)
         
-        self.print_bold("ESP32-S3 Thermal Printer")
-        self.print_text("GOOJPRT QR203 Compatible")
-        self.feed(1)
+            self.print_bold("ESP32-S3 Thermal Printer")
+            self.print_text("GOOJPRT QR203 Compatible")
+            self.feed(1)
         
-        self.print_text("Font Size Tests:")
-        self.print_text("Normal text")
-        self.print_double_height("Double Height")
-        self.print_double_width("Double Width")
-        self.print_large("Double Both")
-        self.print_underline("Underlined Text")
-        self.feed(1)
+            self.print_text("Font Size Tests:")
+            self.print_text("Normal text")
+            self.print_double_height("Double Height")
+            self.print_double_width("Double Width")
+            self.print_large("Double Both")
+            self.print_underline("Underlined Text")
+            self.feed(1)
         
-        self.print_text("Alignment Tests:")
-        self.print_line("Left aligned", "left")
-        self.print_line("Center aligned", "center")
-        self.print_line("Right aligned", "right")
-        self.feed(1)
+            self.print_text("Alignment Tests:")
+            self.print_line("Left aligned", "left")
+            self.print_line("Center aligned", "center")
+            self.print_line("Right aligned", "right")
+            self.feed(1)
         
-        self.print_separator('-', 32)
-        self.print_text("Characters: ABCDEFGHIJKLMNOPQRSTUVWXYZ")
-        self.print_text("          abcdefghijklmnopqrstuvwxyz")
-        self.print_text("          0123456789 !@#$%^&*()")
-        self.print_separator('-', 32)
-        self.feed(3)
+            self.print_separator('-', 32)
+            self.print_text("Characters: ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+            self.print_text("          abcdefghijklmnopqrstuvwxyz")
+            self.print_text("          0123456789 !@#$%^&*()")
+            self.print_separator('-', 32)
+            self.feed(3)
     
     def print_receipt(self, items, total, title="RECEIPT"):
         """Print simple receipt"""
-        self.print_separator('=', 32)
-        self.print_large(title)
-        self.print_separator('=', 32)
-        self.feed(1)
+        with self.batch():
+            self.print_separator('=', 32)
+            self.print_large(title)
+            self.print_separator('=', 32)
+            self.feed(1)
         
-        for item in items:
-            name = item.get('name', 'Unknown')
-            price = item.get('price', 0.00)
-            qty = item.get('qty', 1)
-            line_total = price * qty
+            for item in items:
+                name = item.get('name', 'Unknown')
+                price = item.get('price', 0.00)
+                qty = item.get('qty', 1)
+                line_total = price * qty
             
-            # Format: Item name (right aligned price)
-            item_text = f"{name}"
-            price_text = f"${line_total:.2f}"
+                # Format: Item name (right aligned price)
+                item_text = f"{name}"
+                price_text = f"${line_total:.2f}"
             
-            # Simple formatting - print name then price on next line
-            self.print_text(item_text)
-            self.print_line(price_text, "right")
+                # Simple formatting - print name then price on next line
+                self.print_text(item_text)
+                self.print_line(price_text, "right")
         
-        self.print_separator('-', 32)
-        self.print_bold(f"TOTAL: ${total:.2f}")
-        self.print_separator('=', 32)
-        self.feed(3)
+            self.print_separator('-', 32)
+            self.print_bold(f"TOTAL: ${total:.2f}")
+            self.print_separator('=', 32)
+            self.feed(3)
     
+    def feed_dots(self, dots):
+        """Feed paper by a number of dots without printing (ESC J)"""
+        self.send(self._feed_dots_commands(dots))
+
+    def _feed_dots_commands(self, dots):
+        while dots > 0:
+            n = dots if dots < 255 else 255
+            yield self.FEED_N_DOTS + bytes([n]), self.pacing['write_delay']
+            dots -= n
+
     def clear_buffer(self):
         """Clear printer buffer (if supported)"""
         self.write(self.ESC + b'@')
         time.sleep(0.1)
     
-    def print_bitmap(self, bitmap_data, width, height, mode='normal'):
+    def print_bitmap(self, bitmap_data, width, height, mode='normal', skip_blank=False, trim=False):
         """
         Print a bitmap image
-        bitmap_data: list of bytes representing the image (1 bit per pixel)
+        bitmap_data: list of bytes representing the image (1 bit per pixel),
+                     or a stream with readinto() yielding the same row-major data
+                     (e.g. slip_codec.PackBitsStream for compressed slips),
+                     read one band at a time into a single reused buffer
         width: image width in pixels (must be multiple of 8)
         height: image height in pixels
         mode: 'normal', 'double_height', 'double_width', or 'double_both'
+        skip_blank: replace runs of all-white rows with ESC J paper feeds and
+                    rasterize only the rows that carry ink
+        trim: send only the inked byte columns of each band, positioned with
+              a GS L left margin (GS v 0 ignores ESC $ on most printers)
+
+        Byte counts for the print are left in self.last_bitmap_stats.
+        """
+        start_bytes = self.bytes_written
+        stats = {}
+        self.send(self.bitmap_commands(bitmap_data, width, height, mode, skip_blank, trim, stats))
+        stats['bytes'] = self.bytes_written - start_bytes
+        self.last_bitmap_stats = stats
+
+    def bitmap_commands(self, bitmap_data, width, height, mode='normal', skip_blank=False, trim=False, stats=None):
+        """Command generator for print_bitmap; fills stats (if given) as it goes.
+
+        Band data, chunk slices and the raster header are views of buffers
+        reused for every band, so each (data, delay) pair must be written
+        before the next is taken.
         """
         # Validate dimensions
         if width % 8 != 0:
             raise ValueError("Width must be multiple of 8")
-        
+
+        if stats is None:
+            stats = {}
+
+        write_delay = self.pacing['write_delay']
+
         # Set print mode
         if mode == 'double_height':
-            self.write(self.ESC + b'!' + bytes([16]))
+            yield self.ESC + b'!' + bytes([16]), write_delay
         elif mode == 'double_width':
-            self.write(self.ESC + b'!' + bytes([32]))
+            yield self.ESC + b'!' + bytes([32]), write_delay
         elif mode == 'double_both':
-            self.write(self.ESC + b'!' + bytes([48]))
+            yield self.ESC + b'!' + bytes([48]), write_delay
         else:
-            self.write(self.ESC + b'!' + bytes([0]))
+            yield self.ESC + b'!' + bytes([0]), write_delay
 
         # Print using ESC/POS raster bit image command: GS v 0
         # This matches a standard row-major 1bpp bitmap layout.
         bytes_per_line = width // 8
 
-        if isinstance(bitmap_data, list):
-            bitmap_data = bytes(bitmap_data)
+        # Many printers have practical limits on the height of a single raster command.
+        # Send the image in bands to avoid truncation.
+        band_height = self.pacing['band_height']
+        chunk_size = self.pacing['chunk_size']
 
-        expected_len = bytes_per_line * height
-        if len(bitmap_data) != expected_len:
-            raise ValueError("Bitmap data size does not match width/height")
+        # Every band goes through one reused buffer: streams are read into it
+        # and in-memory bitmaps copied, so the full image never has to be held
+        # in RAM and full bands can share one prebuilt list of chunk views.
+        streaming = hasattr(bitmap_data, 'readinto')
+        band_buf = bytearray(band_height * bytes_per_line)
+        band_mv = memoryview(band_buf)
+        if not streaming:
+            if isinstance(bitmap_data, list):
+                bitmap_data = bytes(bitmap_data)
 
-        xL = bytes_per_line & 0xFF
-        xH = (bytes_per_line >> 8) & 0xFF
+            expected_len = bytes_per_line * height
+            if len(bitmap_data) != expected_len:
+                raise ValueError("Bitmap data size does not match width/height")
+            bitmap_data = memoryview(bitmap_data)
 
-        # Many printers have practical limits on the height of a single raster command.
-        # Send the image in bands to avoid truncation.
-        band_height = 24
-        chunk_size = 64
+        stats['rows'] = height
+        stats['blank_rows'] = 0
+        stats['raster_commands'] = 0
+        stats['feed_commands'] = 0
+        stats['raster_bytes'] = 0
+        stats['trimmed_bytes'] = 0
+        stats['segments'] = []
+        pending_feed = 0
+        self.pace_scale = 1.0
+        band_steps = None
+        steps_scale = None
 
         for y0 in range(0, height, band_height):
+            if self.status_mode != 'none':
+                yield from self._status_gate_commands()
+
             band_h = band_height
             if y0 + band_h > height:
                 band_h = height - y0
 
-            yL = band_h & 0xFF
-            yH = (band_h >> 8) & 0xFF
-            header = self.GS + b'v0' + bytes([0, xL, xH, yL, yH])
-            self.write(header)
+            band_len = band_h * bytes_per_line
+            band = band_mv
+            if band_len != len(band_buf):
+                band = band_mv[:band_len]
+            if streaming:
+                if bitmap_data.readinto(band) != band_len:
+                    raise ValueError("Bitmap stream ended before width/height")
+            else:
+                start = y0 * bytes_per_line
+                band[:] = bitmap_data[start:start + band_len]
 
-            start = y0 * bytes_per_line
-            end = start + (band_h * bytes_per_line)
-            band = bitmap_data[start:end]
+            if not skip_blank and not trim and band_h == band_height:
+                # Rebuilt only when the status gate changes pace_scale
+                if steps_scale != self.pace_scale:
+                    band_steps = self._band_steps(band_mv, bytes_per_line, band_height, chunk_size)
+                    steps_scale = self.pace_scale
+                self._set_raster_header(bytes_per_line, band_height)
+                for step in band_steps:
+                    yield step
+                stats['raster_commands'] += 1
+                stats['raster_bytes'] += band_len
+                continue
 
-            # Stream data in small chunks with pacing to avoid UART/printer buffer overruns
-            for i in range(0, len(band), chunk_size):
-                self.uart.write(band[i:i + chunk_size])
-                time.sleep(0.03)
+            if not skip_blank:
+                yield from self._raster_rows_commands(band, bytes_per_line, band_h, y0, band_height, chunk_size, stats, trim)
+                continue
 
-            self.write(b'\n')
-            time.sleep(0.20)
+            # Split the band into runs of blank and inked rows. Blank rows are
+            # accumulated (across bands) and sent as a single ESC J feed just
+            # before the next inked run.
+            row = 0
+            while row < band_h:
+                end = row
+                while end < band_h and self._row_is_blank(band, end, bytes_per_line):
+                    end += 1
+                pending_feed += end - row
+                stats['blank_rows'] += end - row
+                row = end
+                if row >= band_h:
+                    break
+
+                while end < band_h and not self._row_is_blank(band, end, bytes_per_line):
+                    end += 1
+                if pending_feed:
+                    stats['feed_commands'] += (pending_feed + 254) // 255
+                    yield from self._feed_dots_commands(pending_feed)
+                    pending_feed = 0
+                rows = band[row * bytes_per_line:end * bytes_per_line]
+                yield from self._raster_rows_commands(rows, bytes_per_line, end - row, y0 + row, band_height, chunk_size, stats, trim)
+                row = end
+
+        if pending_feed:
+            stats['feed_commands'] += (pending_feed + 254) // 255
+            yield from self._feed_dots_commands(pending_feed)
+
+        if trim and self._raster_margin:
+            yield from self._left_margin_commands(0)
 
         # Reset to normal mode
-        self.write(self.ESC + b'!' + bytes([0]))
-    
+        yield self.ESC + b'!' + bytes([0]), write_delay
+
+        # Bytes the plain full-raster path would have sent, for comparison
+        bands = (height + band_height - 1) // band_height
+        stats['full_raster_bytes'] = 6 + bands * 9 + height * bytes_per_line
+
+    def _row_is_blank(self, band, row, bytes_per_line):
+        start = row * bytes_per_line
+        for i in range(start, start + bytes_per_line):
+            if band[i]:
+                return False
+        return True
+
+    def _ink_span(self, rows, bytes_per_line, row_count):
+        """Return (first, last) inked byte column across rows, or None if blank"""
+        left = bytes_per_line
+        right = -1
+        for r in range(row_count):
+            base = r * bytes_per_line
+            i = 0
+            while i < left and not rows[base + i]:
+                i += 1
+            if i < left:
+                left = i
+            i = bytes_per_line - 1
+            while i > right and not rows[base + i]:
+                i -= 1
+            if i > right:
+                right = i
+        if right < 0:
+            return None
+        return left, right
+
+    def _set_raster_header(self, span, row_count):
+        """Fill the shared GS v 0 header for span bytes x row_count rows"""
+        header = self._raster_header
+        header[4] = span & 0xFF
+        header[5] = (span >> 8) & 0xFF
+        header[6] = row_count & 0xFF
+        header[7] = (row_count >> 8) & 0xFF
+
+    def _band_steps(self, band, bytes_per_line, band_height, chunk_size):
+        """The header, chunk and line feed steps of one full band held in band"""
+        write_delay = self.pacing['write_delay']
+        chunk_delay = self.pacing['chunk_delay'] * self.pace_scale
+        steps = [(self._raster_header, write_delay)]
+        for i in range(0, band_height * bytes_per_line, chunk_size):
+            steps.append((band[i:i + chunk_size], chunk_delay))
+        steps.append((b'\n', write_delay + self.pacing['band_delay'] * self.pace_scale))
+        return steps
+
+    def _raster_rows_commands(self, rows, bytes_per_line, row_count, y, band_height, chunk_size, stats, trim=False):
+        """Send row_count rows of 1bpp data as one GS v 0 raster command"""
+        left = 0
+        span = bytes_per_line
+        if trim:
+            ink = self._ink_span(rows, bytes_per_line, row_count)
+            if ink is None:
+                # Nothing to burn: a paper feed moves the same distance
+                stats['feed_commands'] += (row_count + 254) // 255
+                stats['blank_rows'] += row_count
+                yield from self._feed_dots_commands(row_count)
+                return
+            left = ink[0]
+            span = ink[1] - ink[0] + 1
+            if left * 8 != self._raster_margin:
+                yield from self._left_margin_commands(left * 8)
+
+        self._set_raster_header(span, row_count)
+        yield self._raster_header, self.pacing['write_delay']
+
+        # Stream data in small chunks with pacing to avoid UART/printer buffer overruns
+        length = row_count * span
+        chunk_delay = self.pacing['chunk_delay'] * self.pace_scale
+        if span == bytes_per_line:
+            for i in range(0, length, chunk_size):
+                yield rows[i:i + chunk_size], chunk_delay
+        else:
+            pending = 0
+            for r in range(row_count):
+                start = r * bytes_per_line + left
+                pending += span
+                if pending >= chunk_size or r == row_count - 1:
+                    yield rows[start:start + span], chunk_delay
+                    pending = 0
+                else:
+                    yield rows[start:start + span], 0
+
+        # Give the head time to burn the rows; band_delay is per full band
+        yield b'\n', self.pacing['write_delay'] + self.pacing['band_delay'] * self.pace_scale * row_count / band_height
+
+        saved = row_count * bytes_per_line - length
+        stats['raster_commands'] += 1
+        stats['raster_bytes'] += length
+        if trim:
+            stats['trimmed_bytes'] += saved
+            stats['segments'].append((y, row_count, left, span, saved))
+
+    def _load_nv_record(self):
+        """Load the name -> {key, hash, size} record of slips stored in the printer"""
+        try:
+            with open(self.nv_record_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_nv_record(self):
+        with open(self.nv_record_path, 'w') as f:
+            json.dump(self.nv_record, f)
+
+    def _next_nv_key(self):
+        used = set(entry['key'] for entry in self.nv_record.values())
+        for i in range(94 * 94):
+            key = chr(33 + i // 94) + chr(33 + i % 94)
+            if key not in used:
+                return key
+        raise RuntimeError("No free NV graphics key codes")
+
+    def _bitmap_data_commands(self, bitmap_data, length):
+        """Paced chunks of length bytes of bitmap data (bytes or readinto() stream)"""
+        chunk_size = self.pacing['chunk_size']
+        chunk_delay = self.pacing['chunk_delay']
+        if hasattr(bitmap_data, 'readinto'):
+            buf = bytearray(chunk_size)
+            sent = 0
+            while sent < length:
+                n = bitmap_data.readinto(buf)
+                if not n:
+                    raise ValueError("Bitmap stream ended before width/height")
+                yield (buf if n == chunk_size else buf[:n]), chunk_delay
+                sent += n
+        else:
+            if isinstance(bitmap_data, list):
+                bitmap_data = bytes(bitmap_data)
+            data = memoryview(bitmap_data)
+            for i in range(0, length, chunk_size):
+                yield data[i:i + chunk_size], chunk_delay
+
+    def plan_count(self, path):
+        """Number of slips in a print plan file.
+
+        The file is checked and its index kept on the first call for a path,
+        so prints only read their own steps; later calls cost no file I/O.
+        Raises ValueError when the header is wrong or the index points past
+        the end of the file (a truncated upload).
+        """
+        info = self._plans.get(path)
+        if info is not None:
+            return info[0]
+        with open(path, 'rb') as f:
+            count, max_step = self._read_plan_header(f)
+            index = f.read(count * self.PLAN_INDEX_ENTRY_SIZE)
+            if len(index) != count * self.PLAN_INDEX_ENTRY_SIZE:
+                raise ValueError("Print plan index is truncated")
+            size = f.seek(0, 2)
+        for i in range(count):
+            offset, length = struct.unpack_from(self.PLAN_INDEX_ENTRY, index, i * self.PLAN_INDEX_ENTRY_SIZE)
+            if offset + length > size:
+                raise ValueError("Print plan is truncated")
+        self._plans[path] = (count, max_step, index)
+        return count
+
+    def _read_plan_header(self, f):
+        """Check a plan file's header; returns (count, largest step)"""
+        header = f.read(self.PLAN_HEADER_SIZE)
+        if len(header) != self.PLAN_HEADER_SIZE:
+            raise ValueError("Print plan header is truncated")
+        magic, version, count, max_step = struct.unpack(self.PLAN_HEADER, header)
+        if magic != self.PLAN_MAGIC or version != self.PLAN_VERSION:
+            raise ValueError("Not a version %d print plan" % self.PLAN_VERSION)
+        return count, max_step
+
+    def stream_plan(self, path, index=0):
+        """Print slip index of a print plan file as it was compiled.
+
+        The plan already holds every byte (init, raster bands, feeds) and
+        delay of the print, so nothing is computed here. Flow control is
+        still honoured and, with THERMAL_PRINTER_STATUS set, the status gate
+        runs once before the first byte (paper out / cover open raise); no
+        status queries or pace_scale are applied while the plan streams.
+        """
+        start_bytes = self.bytes_written
+        self.send(self.plan_commands(path, index))
+        self.last_bitmap_stats = None
+        return self.bytes_written - start_bytes
+
+    def plan_commands(self, path, index=0):
+        """Command generator for stream_plan.
+
+        Every step is read into one buffer kept across prints, so each
+        (data, delay) pair must be written before the next is taken.
+        """
+        if self.status_mode != 'none':
+            yield from self._status_gate_commands()
+        count = self.plan_count(path)
+        if not 0 <= index < count:
+            raise ValueError("Print plan index out of range")
+        _, max_step, table = self._plans[path]
+        offset, length = struct.unpack_from(self.PLAN_INDEX_ENTRY, table, index * self.PLAN_INDEX_ENTRY_SIZE)
+        buf = self._plan_buf
+        if buf is None or len(buf) < max_step:
+            buf = bytearray(max(max_step, self.PLAN_STEP_SIZE))
+            self._plan_buf = buf
+        mv = memoryview(buf)
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+
+            step = mv[:self.PLAN_STEP_SIZE]
+            view = mv
+            view_len = len(buf)
+            while length > 0:
+                if f.readinto(step) != self.PLAN_STEP_SIZE:
+                    raise ValueError("Print plan ended early")
+                n = buf[0] | buf[1] << 8
+                delay_us = buf[2] | buf[3] << 8 | buf[4] << 16 | buf[5] << 24
+                # Chunks are mostly one size: reuse the slice instead of
+                # making a new memoryview per step
+                if n != view_len:
+                    view = mv[:n]
+                    view_len = n
+                if f.readinto(view) != n:
+                    raise ValueError("Print plan ended early")
+                length -= self.PLAN_STEP_SIZE + n
+                yield view, (delay_us / 1000000 if delay_us else 0)
+
+    def bitmap_digest(self, bitmap_data, width, height):
+        """Short content hash of a bitmap (bytes or readinto() stream)"""
+        length = (width // 8) * height
+        h = hashlib.sha256()
+        if hasattr(bitmap_data, 'readinto'):
+            buf = bytearray(256)
+            remaining = length
+            while remaining > 0:
+                n = bitmap_data.readinto(buf)
+                if not n:
+                    break
+                h.update(buf if n == len(buf) else buf[:n])
+                remaining -= n
+        else:
+            if isinstance(bitmap_data, list):
+                bitmap_data = bytes(bitmap_data)
+            h.update(bitmap_data)
+        return binascii.hexlify(h.digest()).decode()[:16]
+
+    def nv_define_graphics(self, key, bitmap_data, width, height):
+        """Store a 1bpp raster image in printer NV memory under a 2-char key (GS ( L fn 67)"""
+        if width % 8 != 0:
+            raise ValueError("Width must be multiple of 8")
+        length = (width // 8) * height
+        params = bytes([
+            48, 67, 48, ord(key[0]), ord(key[1]), 1,
+            width & 0xFF, (width >> 8) & 0xFF,
+            height & 0xFF, (height >> 8) & 0xFF,
+            49,
+        ])
+        n = len(params) + length
+        if n <= 0xFFFF:
+            header = self.NV_GRAPHICS + bytes([n & 0xFF, (n >> 8) & 0xFF])
+        else:
+            header = self.NV_GRAPHICS_LARGE + bytes([n & 0xFF, (n >> 8) & 0xFF, (n >> 16) & 0xFF, (n >> 24) & 0xFF])
+        self.write(header + params)
+        self.send(self._bitmap_data_commands(bitmap_data, length))
+        # The printer is busy writing flash after a define
+        time.sleep(1.0)
+
+    def nv_print_graphics(self, key):
+        """Print an NV graphic previously stored under key (GS ( L fn 69)"""
+        self.write(self.nv_print_command(key))
+
+    def nv_print_command(self, key):
+        return self.NV_GRAPHICS + bytes([6, 0, 48, 69, ord(key[0]), ord(key[1]), 1, 1])
+
+    def nv_delete_graphics(self, key):
+        """Delete the NV graphic stored under key (GS ( L fn 66)"""
+        self.write(self.NV_GRAPHICS + bytes([4, 0, 48, 66, ord(key[0]), ord(key[1])]))
+
+    def upload_nv_slips(self, slips):
+        """
+        Store a slip set in printer NV memory, skipping slips already stored
+        with the same content hash.
+        slips: iterable of (name, open_bitmap, width, height); open_bitmap() returns
+               the bitmap bytes or a readinto() stream and is called once to hash
+               and, if needed, once more to upload.
+        Returns the number of slips uploaded. NV memory has limited write cycles,
+        so run this from the REPL when the slip set changes, not at every boot.
+        """
+        if not self.nv_graphics:
+            print("NV graphics disabled in config")
+            return 0
+
+        capacity = getattr(config, "THERMAL_PRINTER_NV_CAPACITY", 262144)
+        used = 0
+        for entry in self.nv_record.values():
+            used += entry['size']
+
+        uploaded = 0
+        for name, open_bitmap, width, height in slips:
+            digest = self.bitmap_digest(open_bitmap(), width, height)
+            entry = self.nv_record.get(name)
+            if entry and entry['hash'] == digest:
+                continue
+
+            size = (width // 8) * height
+            prev_size = entry['size'] if entry else 0
+            if used - prev_size + size > capacity:
+                print("NV memory full - remaining slips print as raster")
+                break
+
+            key = entry['key'] if entry else self._next_nv_key()
+            print("Storing slip", name, "as NV graphic", key)
+            self.nv_define_graphics(key, open_bitmap(), width, height)
+            self.nv_record[name] = {'key': key, 'hash': digest, 'size': size}
+            used += size - prev_size
+            uploaded += 1
+            self._save_nv_record()
+
+        return uploaded
+
+    def nv_slip_key(self, name):
+        """NV key code holding slip name, or None if it isn't stored"""
+        if not self.nv_graphics:
+            return None
+        entry = self.nv_record.get(name)
+        if entry is None:
+            return None
+        return entry['key']
+
+    def print_nv_slip(self, name):
+        """Print a slip stored with upload_nv_slips. Returns False if it isn't stored."""
+        key = self.nv_slip_key(name)
+        if key is None:
+            return False
+        self.nv_print_graphics(key)
+        return True
+
     def print_simple_image(self, image_type='heart'):
         """Print a simple predefined image"""
         if image_type == 'heart':
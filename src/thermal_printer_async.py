@@ -0,0 +1,157 @@
+"""
+Asynchronous Thermal Printer Driver
+Non-blocking front end for ThermalPrinter on uasyncio
+"""
+
+import sys
+import time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from thermal_printer import ThermalPrinter
+
+try:
+    _ticks_ms = time.ticks_ms
+except AttributeError:  # CPython
+    def _ticks_ms():
+        return int(time.monotonic() * 1000)
+
+
+class _UARTWriter:
+    """StreamWriter stand-in for CPython, whose asyncio streams can't wrap a UART"""
+
+    def __init__(self, uart):
+        self.uart = uart
+        self.out_buf = b''
+
+    def write(self, data):
+        self.out_buf += data
+
+    async def drain(self):
+        if self.out_buf:
+            self.uart.write(self.out_buf)
+            self.out_buf = b''
+        await asyncio.sleep(0)
+
+
+def open_writer(uart):
+    """StreamWriter over a UART (or any object with write())"""
+    if sys.implementation.name == 'micropython':
+        return asyncio.StreamWriter(uart, {})
+    return _UARTWriter(uart)
+
+
+class AsyncThermalPrinter:
+    """Async thermal printer driver
+
+    Uses the same command generators as ThermalPrinter, so the bytes on the
+    wire are identical. Data goes through a StreamWriter with drain(), and the
+    pacing delays become asyncio.sleep() so other tasks (lid switch, LED)
+    keep running during a print.
+    """
+
+    def __init__(self, printer=None):
+        if printer is None:
+            printer = ThermalPrinter()
+        self.printer = printer
+        self.writer = open_writer(printer.uart)
+        self.first_write_ms = None  # ticks_ms of the next write; reset to None to time one
+
+    @property
+    def last_bitmap_stats(self):
+        return self.printer.last_bitmap_stats
+
+    async def send(self, commands):
+        """Send (data, delay_s) pairs from a ThermalPrinter command generator"""
+        printer = self.printer
+        try:
+            for data, delay in commands:
+                if not printer.ready():
+                    await self.wait_ready()
+                if self.first_write_ms is None:
+                    self.first_write_ms = _ticks_ms()
+                self.writer.write(data)
+                await self.writer.drain()
+                printer.bytes_written += len(data)
+                if delay:
+                    await asyncio.sleep(delay)
+        except Exception:
+            await self.recover()
+            raise
+
+    async def recover(self):
+        """Reset margin and print mode after a failed send; see ThermalPrinter.recover"""
+        try:
+            for data, _ in self.printer.recover_commands():
+                self.writer.write(data)
+                self.printer.bytes_written += len(data)
+            await self.writer.drain()
+        except Exception as e:
+            print(f"Could not reset printer after error: {e}")
+
+    async def wait_ready(self):
+        """Yield to other tasks until the printer's flow control says ready"""
+        printer = self.printer
+        for _ in range(printer.ready_timeout_ms):
+            await asyncio.sleep(0.001)
+            if printer.ready():
+                return
+        raise RuntimeError("Printer not ready (flow control timeout)")
+
+    async def write(self, data):
+        """Write data to printer"""
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        await self.send(((data, self.printer.pacing['write_delay']),))
+
+    async def print_text(self, text):
+        """Print text line"""
+        await self.write(text + '\n')
+
+    async def print_line(self, text="", align="left"):
+        """Print text with alignment"""
+        if align == "center":
+            await self.write(ThermalPrinter.JUSTIFY_CENTER)
+        elif align == "right":
+            await self.write(ThermalPrinter.JUSTIFY_RIGHT)
+        else:
+            await self.write(ThermalPrinter.JUSTIFY_LEFT)
+
+        await self.print_text(text)
+        await self.write(ThermalPrinter.JUSTIFY_LEFT)
+
+    async def feed(self, lines=1):
+        """Feed paper lines"""
+        await self.write(ThermalPrinter.FEED_N_LINES + bytes([lines & 0xFF]))
+
+    async def feed_dots(self, dots):
+        """Feed paper by a number of dots without printing (ESC J)"""
+        await self.send(self.printer._feed_dots_commands(dots))
+
+    async def print_bitmap(self, bitmap_data, width, height, mode='normal', skip_blank=False, trim=False):
+        """Print a bitmap image; see ThermalPrinter.print_bitmap"""
+        printer = self.printer
+        start_bytes = printer.bytes_written
+        stats = {}
+        await self.send(printer.bitmap_commands(bitmap_data, width, height, mode, skip_blank, trim, stats))
+        stats['bytes'] = printer.bytes_written - start_bytes
+        printer.last_bitmap_stats = stats
+
+    async def stream_plan(self, path, index=0):
+        """Print slip index of a print plan file; see ThermalPrinter.stream_plan"""
+        printer = self.printer
+        start_bytes = printer.bytes_written
+        await self.send(printer.plan_commands(path, index))
+        printer.last_bitmap_stats = None
+        return printer.bytes_written - start_bytes
+
+    async def print_nv_slip(self, name):
+        """Print a slip stored in NV memory. Returns False if it isn't stored."""
+        key = self.printer.nv_slip_key(name)
+        if key is None:
+            return False
+        await self.write(self.printer.nv_print_command(key))
+        return True
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Print-path benchmark
+
+Runs the real src/ print paths against the ESC/POS emulator with a UART that
+timestamps every write, and writes the results as JSON so runs from different
+commits can be compared:
+
+    python3 tools/benchmark_print.py --out bench.json
+    python3 tools/benchmark_print.py --out new.json --compare bench.json
+
+Per case it reports bytes sent, uart.write calls, time requested in
+time.sleep (skipped, not waited), modeled wire time at each baud rate,
+host CPU time and peak allocated memory (tracemalloc).
+
+print_fortune runs twice per seed: as the lid-open path does without
+prefetch, and after fortune_cookie.prefetch_slip() (outside the timing), so
+first_write_s compares lid-to-first-byte latency. --cold-imports compiles
+slip modules from source on every import, as the ESP32 does, instead of
+reading CPython's cached bytecode.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_slip_pack import find_slip_modules  # noqa: E402
+from escpos_emulator import SRC_PATH, Emulator, FakeUART  # noqa: E402
+
+BAUD_RATES = (9600, 115200)
+COMPARE_KEYS = ('bytes', 'writes', 'sleep_s', 'peak_bytes')
+
+RECEIPT_ITEMS = [
+    {'name': 'Coffee', 'price': 3.50, 'qty': 2},
+    {'name': 'Fortune cookie', 'price': 0.75, 'qty': 4},
+    {'name': 'Green tea', 'price': 2.25, 'qty': 1},
+]
+
+
+class TimestampUART(FakeUART):
+    """FakeUART that logs (timestamp, length) for every write.
+
+    While tracemalloc runs, memory kept by the log and the emulator (paper
+    rows, glyphs) is excluded so peak_bytes reflects the driver only.
+    """
+
+    def __init__(self, printer, *args, **kwargs):
+        super().__init__(printer, *args, **kwargs)
+        self.log = []
+        self.peak = 0
+        self._emulator_bytes = 0
+
+    def reset_peak(self):
+        self.peak = 0
+        self._emulator_bytes = 0
+
+    def driver_peak(self):
+        return max(self.peak, tracemalloc.get_traced_memory()[1] - self._emulator_bytes)
+
+    def write(self, data):
+        if not tracemalloc.is_tracing():
+            self.log.append((time.perf_counter(), len(data)))
+            return super().write(data)
+        self.peak = self.driver_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        self.log.append((time.perf_counter(), len(data)))
+        n = super().write(data)
+        self._emulator_bytes += tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.reset_peak()
+        return n
+
+
+class Bench:
+    def __init__(self):
+        self.emulator = Emulator(uart_class=TimestampUART).install()
+        from thermal_printer import ThermalPrinter
+
+        self.printer = ThermalPrinter()
+        self.results = []
+
+    def run(self, kind, name, fn):
+        uart = self.emulator.uart
+        log_start = len(uart.log)
+        sleep_start = self.emulator.sleep_s
+        paper_start = len(self.emulator.printer.rows)
+
+        tracemalloc.start()
+        uart.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        fn()
+        cpu_s = time.perf_counter() - t0
+        peak = uart.driver_peak() - base
+        tracemalloc.stop()
+        self.emulator.printer.finish()
+
+        writes = uart.log[log_start:]
+        sent = sum(n for _, n in writes)
+        sleep_s = self.emulator.sleep_s - sleep_start
+        result = {
+            'kind': kind,
+            'name': name,
+            'bytes': sent,
+            'writes': len(writes),
+            'sleep_s': round(sleep_s, 3),
+            'wire_s': {str(b): round(sent * 10.0 / b, 3) for b in BAUD_RATES},
+            'cpu_s': round(cpu_s, 4),
+            'first_write_s': round(writes[0][0] - t0, 4) if writes else None,
+            'peak_bytes': peak,
+            'paper_rows': len(self.emulator.printer.rows) - paper_start,
+        }
+        self.results.append(result)
+        return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_PATH, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(results):
+    summary = {}
+    for r in results:
+        s = summary.setdefault(
+            r['kind'], {'count': 0, 'bytes': 0, 'writes': 0, 'sleep_s': 0.0, 'peak_bytes': 0, 'first_write_s': 0.0}
+        )
+        s['count'] += 1
+        s['first_write_s'] += r['first_write_s'] or 0.0
+        s['bytes'] += r['bytes']
+        s['writes'] += r['writes']
+        s['sleep_s'] += r['sleep_s']
+        s['peak_bytes'] = max(s['peak_bytes'], r['peak_bytes'])
+    for s in summary.values():
+        s['avg_bytes'] = round(s['bytes'] / s['count'])
+        s['avg_writes'] = round(s['writes'] / s['count'], 1)
+        s['avg_sleep_s'] = round(s['sleep_s'] / s['count'], 3)
+        s['sleep_s'] = round(s['sleep_s'], 3)
+        s['avg_first_write_s'] = round(s.pop('first_write_s') / s['count'], 4)
+    return summary
+
+
+def compare(old, new):
+    """Print per-case deltas between two result files"""
+    old_cases = {(r['kind'], r['name']): r for r in old['cases']}
+    print(f"Compared with {old.get('commit') or 'previous run'}:")
+    for r in new['cases']:
+        prev = old_cases.get((r['kind'], r['name']))
+        if prev is None:
+            continue
+        deltas = []
+        for key in COMPARE_KEYS:
+            if prev[key] != r[key]:
+                deltas.append(f"{key} {prev[key]} -> {r[key]}")
+        if deltas:
+            print(f"  {r['kind']} {r['name']}: " + ", ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the thermal printer print paths")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file (default: bench_results.json)")
+    parser.add_argument("--compare", help="Earlier results file to diff against")
+    parser.add_argument("--fortunes", type=int, default=5, help="print_fortune runs (seeds 0..N-1)")
+    parser.add_argument("--slips", type=int, default=0, help="Limit print_bitmap to the first N slips (0 = all)")
+    parser.add_argument("--cold-imports", action="store_true", help="Compile slip modules on every import, as on the ESP32")
+    args = parser.parse_args()
+
+    if args.cold_imports:
+        sys.pycache_prefix = tempfile.mkdtemp(prefix="benchmark_pycache_")
+        sys.dont_write_bytecode = True
+
+    bench = Bench()
+    printer = bench.printer
+
+    import random
+
+    import config
+    import fortune_cookie
+    import slip_codec
+
+    modules = [p.stem for p in find_slip_modules(SRC_PATH)]
+    config.FORTUNE_SLIP_MODULES = modules
+    raster_options = fortune_cookie._raster_options()
+
+    choose_slip = fortune_cookie._choose_slip
+    chosen = []
+
+    def _recording_choose_slip(*args):
+        slip = choose_slip(*args)
+        chosen.append(slip[0])
+        return slip
+
+    fortune_cookie._choose_slip = _recording_choose_slip
+    for seed in range(args.fortunes):
+        random.seed(seed)
+        fortune_cookie.slip_cache.clear()
+        result = bench.run('print_fortune', f"seed {seed}", lambda: fortune_cookie.print_fortune(printer))
+        result['slip'] = chosen[-1]
+    for seed in range(args.fortunes):
+        random.seed(seed)
+        fortune_cookie.slip_cache.clear()
+        fortune_cookie.prefetch_slip(printer)
+        result = bench.run('print_fortune_prefetched', f"seed {seed}", lambda: fortune_cookie.print_fortune(printer))
+        result['slip'] = chosen[-1]
+    fortune_cookie._choose_slip = choose_slip
+
+    for module_name in modules[:args.slips or None]:
+        slip = fortune_cookie._load_slip_module(module_name)
+        bench.run(
+            'print_bitmap', module_name,
+            lambda: printer.print_bitmap(
+                slip_codec.slip_bitmap(slip), slip.WIDTH, slip.HEIGHT, 'normal', **raster_options
+            ),
+        )
+        del slip
+
+    bench.run('test_print', 'test_print', printer.test_print)
+    bench.run('print_receipt', 'print_receipt', lambda: printer.print_receipt(RECEIPT_ITEMS, 11.75))
+    bench.emulator.uninstall()
+
+    output = {
+        'commit': _git_commit(),
+        'config': {
+            'pacing': printer.pacing,
+            'flow_control': printer.flow_control,
+            'skip_blank': raster_options['skip_blank'],
+            'trim': raster_options['trim'],
+        },
+        'summary': _summary(bench.results),
+        'cases': bench.results,
+    }
+    Path(args.out).write_text(json.dumps(output, indent=2))
+
+    for kind, s in output['summary'].items():
+        print(
+            f"{kind:24s} n={s['count']:3d} avg {s['avg_bytes']:6d} bytes, "
+            f"{s['avg_writes']:7.1f} writes, {s['avg_sleep_s']:7.3f} s sleep, "
+            f"first write {s['avg_first_write_s'] * 1000:6.1f} ms, peak {s['peak_bytes']} bytes"
+        )
+    print(f"Wrote {args.out}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Precompile src/ with mpy-cross
+
+Compiles every module in src/ (drivers, fortune_cookie and the slip modules)
+to .mpy bytecode in build/, so the ESP32 loads bytecode instead of parsing
+and compiling source on the first print of each slip:
+
+    pip install mpy-cross
+    python3 tools/build_mpy.py
+    python3 tools/build_mpy.py --heap        # also find each file's compile heap
+
+boot.py and main.py stay .py (MicroPython only runs those by name); they and
+any data files (slip packs, fonts, slip index) are copied so build/ can be
+uploaded as is.
+
+Each slip .mpy is checked to define WIDTH, HEIGHT and BITMAP, with BITMAP's
+bytes stored as a constant. The report compares sizes and the mpy-cross
+compile time, which is the compile the device no longer does. --heap bisects
+the smallest mpy-cross heap that still compiles each source, a stand-in for
+the heap that compile needs on the device.
+
+mpy-cross must emit the .mpy version the firmware accepts (v6 for
+MicroPython 1.19 and later).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_slip_index import INDEX_NAME  # noqa: E402
+from build_slip_pack import load_slip_module, slip_module_sort_key  # noqa: E402
+
+KEEP_SOURCE = ("boot.py", "main.py")
+DATA_SUFFIXES = (".bin", ".json")
+SLIP_PREFIX = "fortune_slip_bitmap"
+SLIP_NAMES = ("WIDTH", "HEIGHT", "BITMAP")
+
+MPY_MAGIC = ord("M")
+MPY_VERSION = 6
+# Constant object kinds in the .mpy constant table (py/persistentcode.h)
+MPY_OBJ_STR = 5
+MPY_OBJ_BYTES = 6
+MPY_OBJ_TUPLE = 10
+
+HEAP_MIN = 8 * 1024
+HEAP_MAX = 4 * 1024 * 1024
+
+
+def find_mpy_cross():
+    """Path of the mpy-cross binary (the mpy-cross pip package or PATH)."""
+    try:
+        import mpy_cross
+    except ImportError:
+        return shutil.which("mpy-cross")
+    path = Path(mpy_cross.__file__).parent / "mpy-cross"
+    return str(path) if path.exists() else shutil.which("mpy-cross")
+
+
+def compile_mpy(mpy_cross, source, out, heap=None, extra_args=()):
+    """Compile source to out. Returns (ok, seconds, stderr)."""
+    args = [mpy_cross, "-o", str(out), "-s", source.name]
+    if heap is not None:
+        args += ["-X", f"heapsize={heap}"]
+    args += list(extra_args)
+    args.append(str(source))
+    t0 = time.perf_counter()
+    proc = subprocess.run(args, capture_output=True, text=True)
+    return proc.returncode == 0, time.perf_counter() - t0, proc.stderr.strip()
+
+
+def compile_heap(mpy_cross, source, scratch):
+    """Smallest mpy-cross heap (to 1 KB) that compiles source, or None."""
+    lo, hi = HEAP_MIN, HEAP_MAX
+    if not compile_mpy(mpy_cross, source, scratch, hi)[0]:
+        return None
+    while hi - lo > 1024:
+        mid = (lo + hi) // 2
+        if compile_mpy(mpy_cross, source, scratch, mid)[0]:
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def _read_uint(data, i):
+    """MicroPython's variable-length uint: 7 bits per byte, MSB first."""
+    value = 0
+    while True:
+        b = data[i]
+        i += 1
+        value = (value << 7) | (b & 0x7F)
+        if not b & 0x80:
+            return value, i
+
+
+def _read_obj(data, i, objs):
+    kind = data[i]
+    i += 1
+    if kind == MPY_OBJ_TUPLE:
+        count, i = _read_uint(data, i)
+        for _ in range(count):
+            i = _read_obj(data, i, objs)
+        return i
+    if kind < MPY_OBJ_STR:
+        # None, False, True, Ellipsis: no payload
+        return i
+    length, i = _read_uint(data, i)
+    objs.append((kind, bytes(data[i:i + length])))
+    i += length
+    if kind in (MPY_OBJ_STR, MPY_OBJ_BYTES):
+        i += 1  # null terminator
+    return i
+
+
+def read_mpy_constants(data):
+    """Return (qstr names, [(kind, payload)]) from an .mpy file's tables."""
+    if len(data) < 4 or data[0] != MPY_MAGIC or data[1] != MPY_VERSION:
+        raise ValueError("Not a v6 .mpy file")
+    if data[2] >> 2:
+        raise ValueError("Native .mpy files are not inspected")
+    i = 4
+    n_qstr, i = _read_uint(data, i)
+    n_obj, i = _read_uint(data, i)
+    qstrs = []
+    for _ in range(n_qstr):
+        length, i = _read_uint(data, i)
+        if length & 1:
+            continue  # static qstr, stored as an index into the firmware's table
+        length >>= 1
+        qstrs.append(bytes(data[i:i + length]).decode())
+        i += length + 1
+    objs = []
+    for _ in range(n_obj):
+        i = _read_obj(data, i, objs)
+    return qstrs, objs
+
+
+def verify_slip_mpy(mpy_path, source_path):
+    """Check a slip .mpy against its source; raises ValueError on a mismatch.
+
+    Returns True when BITMAP is stored as one bytes constant, False when the
+    source spells it bytes([...]): that .mpy still builds a list of ints on
+    import (recode_slip_modules.py rewrites the source).
+    """
+    qstrs, objs = read_mpy_constants(mpy_path.read_bytes())
+    missing = [name for name in SLIP_NAMES if name not in qstrs]
+    if missing:
+        raise ValueError(f"{mpy_path.name} does not define {', '.join(missing)}")
+    # The decoded bitmap must match WIDTH x HEIGHT
+    w, h, data = load_slip_module(source_path)
+    if len(data) != (w // 8) * h:
+        raise ValueError(f"{source_path.name} BITMAP does not match {w}x{h}")
+    source = source_path.read_text()
+    if "BITMAP = bytes([" in source:
+        return False
+    namespace = {}
+    exec(compile(source, str(source_path), "exec"), namespace)
+    if (MPY_OBJ_BYTES, bytes(namespace["BITMAP"])) not in objs:
+        raise ValueError(f"{mpy_path.name} has no BITMAP constant matching {source_path.name}")
+    return True
+
+
+def _is_slip(path):
+    return path.stem == SLIP_PREFIX or path.stem.startswith(SLIP_PREFIX + "_")
+
+
+def update_index_sizes(out):
+    """Give the copied slip index the .mpy file sizes: the device checks the
+    last indexed slip's size at boot and rescans when it differs."""
+    path = out / INDEX_NAME
+    if not path.exists():
+        return
+    index = json.loads(path.read_text())
+    for row in index.get("slips", []):
+        mpy = out / (row[0] + ".mpy")
+        if mpy.exists():
+            row[1] = mpy.stat().st_size
+    path.write_text(json.dumps(index, separators=(",", ":")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile src/ to .mpy bytecode with mpy-cross")
+    parser.add_argument("--src", default="src", help="Source directory (default: src)")
+    parser.add_argument("--out", default="build", help="Output directory (default: build)")
+    parser.add_argument("--heap", action="store_true", help="Bisect the compile heap of every source (slower)")
+    parser.add_argument("--march", help="Native emitter architecture, e.g. xtensawin (default: bytecode only)")
+    args = parser.parse_args()
+
+    mpy_cross = find_mpy_cross()
+    if mpy_cross is None:
+        print("mpy-cross not found: pip install mpy-cross")
+        sys.exit(1)
+    extra_args = [f"-march={args.march}"] if args.march else []
+
+    src = Path(args.src)
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+
+    sources = sorted(src.glob("*.py"), key=lambda p: slip_module_sort_key(p, SLIP_PREFIX))
+    if not sources:
+        print(f"No .py files found in {src}")
+        sys.exit(1)
+
+    for path in sorted(src.iterdir()):
+        if path.name in KEEP_SOURCE or path.suffix in DATA_SUFFIXES:
+            shutil.copy2(path, out / path.name)
+
+    totals = {"slips": [0, 0, 0.0], "code": [0, 0, 0.0]}
+    heaps = {"slips": [], "code": []}
+    failed = []
+    list_slips = 0
+    for path in sources:
+        if path.name in KEEP_SOURCE:
+            continue
+        target = out / (path.stem + ".mpy")
+        ok, elapsed, err = compile_mpy(mpy_cross, path, target, extra_args=extra_args)
+        if not ok:
+            failed.append(f"{path.name}: {err}")
+            continue
+        group = "slips" if _is_slip(path) else "code"
+        if group == "slips" and not args.march:
+            try:
+                if not verify_slip_mpy(target, path):
+                    list_slips += 1
+            except ValueError as e:
+                failed.append(str(e))
+                continue
+        total = totals[group]
+        total[0] += path.stat().st_size
+        total[1] += target.stat().st_size
+        total[2] += elapsed
+        if args.heap:
+            heap = compile_heap(mpy_cross, path, out / ".heap_probe.mpy")
+            if heap is not None:
+                heaps[group].append(heap)
+
+    probe = out / ".heap_probe.mpy"
+    if probe.exists():
+        os.remove(probe)
+    update_index_sizes(out)
+
+    for group, (py_bytes, mpy_bytes, seconds) in totals.items():
+        if not py_bytes:
+            continue
+        print(
+            f"{group:5s}: {py_bytes} bytes .py -> {mpy_bytes} bytes .mpy ({mpy_bytes / py_bytes:.1%}), "
+            f"{seconds * 1000:.0f} ms of compile skipped (host mpy-cross)"
+        )
+        if heaps[group]:
+            print(
+                f"       compile heap avg {sum(heaps[group]) // len(heaps[group])} bytes, "
+                f"max {max(heaps[group])} bytes (not needed to load the .mpy)"
+            )
+    if list_slips:
+        print(
+            f"Note: {list_slips} slip modules spell BITMAP as bytes([...]), which still builds a list "
+            "on import; run tools/recode_slip_modules.py first"
+        )
+    if failed:
+        print("Failed:")
+        for line in failed:
+            print("  " + line)
+        sys.exit(1)
+    print(f"Wrote {out}/ (upload with: mpremote connect auto fs cp {out}/* :)")
+
+
+if __name__ == "__main__":
+    main()
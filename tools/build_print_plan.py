@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Compile fortune slips to print plans
+
+Runs the real driver (src/thermal_printer.py) for every slip against a
+recording UART and stores the exact ESC/POS stream it sends, init, raster
+bands, feeds and the trailing feed(6), together with its delays, in one file:
+
+    python3 tools/build_print_plan.py
+    python3 tools/build_print_plan.py --pack src/fortune_slips.bin --profile printer_profile.json
+
+On the ESP32, ThermalPrinter.stream_plan(path, index) reads each step into
+one reused buffer and writes it to the UART, so a print does no band
+slicing, header building or decoding. print_fortune uses the plan file
+once config.FORTUNE_PRINT_PLAN names it (plans are off by default).
+
+Layout (little-endian):
+    header  : magic b"FPLN", version u8, count u16, largest step u16
+    index   : count x (offset u32, length u32), offsets from start of file
+    records : steps of (length u16, delay u32 microseconds, length bytes);
+              the delay follows the step's bytes
+
+Plans bake in the pacing, skip-blank and trim settings of src/config.py (or
+--pacing / --profile), so rebuild them when those change. They are compiled
+with THERMAL_PRINTER_STATUS = 'none': no status queries, and pace_scale
+stays 1.0. Slips with a lucky-number region are left out, since their
+numbers change with every print.
+"""
+
+import argparse
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_slip_pack import find_slip_modules, load_slip_module_with_region  # noqa: E402
+from escpos_emulator import Emulator  # noqa: E402
+
+PLAN_MAGIC = b"FPLN"
+PLAN_VERSION = 1
+PLAN_HEADER = "<4sBHH"
+PLAN_INDEX_ENTRY = "<II"
+PLAN_STEP = "<HI"
+
+# The device's step buffer; zero-delay writes are merged up to this size
+DEFAULT_MAX_STEP = 512
+MAX_STEP_LIMIT = 0xFFFF
+TRAILING_FEED = 6
+
+
+class PlanRecorder:
+    """Stands in for the UART and time.sleep while the driver prints a slip"""
+
+    def __init__(self):
+        self.steps = []
+
+    def write(self, data):
+        self.steps.append([bytes(data), 0.0])
+        return len(data)
+
+    def sleep(self, seconds):
+        if self.steps:
+            self.steps[-1][1] += seconds
+
+    def any(self):
+        return 0
+
+    def read(self, n=None):
+        return None
+
+
+def encode_plan(steps, max_step):
+    """Pack (bytes, delay_s) steps into a plan record.
+
+    Writes with no delay after them are merged into the next, up to
+    max_step bytes, so the device makes fewer UART writes.
+    """
+    record = bytearray()
+    pending = bytearray()
+    count = 0
+
+    def flush(delay_us):
+        nonlocal count
+        record.extend(struct.pack(PLAN_STEP, len(pending), delay_us))
+        record.extend(pending)
+        pending.clear()
+        count += 1
+
+    for data, delay in steps:
+        delay_us = int(round(delay * 1000000))
+        data = memoryview(data)
+        while len(data):
+            if len(pending) == max_step:
+                flush(0)
+            take = min(max_step - len(pending), len(data))
+            pending.extend(data[:take])
+            data = data[take:]
+        if delay_us:
+            flush(delay_us)
+    if pending:
+        flush(0)
+    return bytes(record), count
+
+
+def decode_plan(record):
+    """Inverse of encode_plan: list of (bytes, delay_s) steps."""
+    steps = []
+    size = struct.calcsize(PLAN_STEP)
+    i = 0
+    while i < len(record):
+        length, delay_us = struct.unpack_from(PLAN_STEP, record, i)
+        i += size
+        steps.append((record[i:i + length], delay_us / 1000000))
+        i += length
+    if i != len(record):
+        raise ValueError("Plan record ends inside a step")
+    return steps
+
+
+def write_plan_file(out_path, records, max_step):
+    header_size = struct.calcsize(PLAN_HEADER)
+    entry_size = struct.calcsize(PLAN_INDEX_ENTRY)
+    offset = header_size + len(records) * entry_size
+    with open(out_path, "wb") as f:
+        f.write(struct.pack(PLAN_HEADER, PLAN_MAGIC, PLAN_VERSION, len(records), max_step))
+        for record in records:
+            f.write(struct.pack(PLAN_INDEX_ENTRY, offset, len(record)))
+            offset += len(record)
+        for record in records:
+            f.write(record)
+    return offset
+
+
+def record_slip(printer, recorder, bitmap, width, height, raster_options):
+    """The (bytes, delay_s) steps the driver sends for one slip."""
+    recorder.steps = []
+    printer.init_printer()
+    printer.print_bitmap(bitmap, width, height, "normal", **raster_options)
+    printer.feed(TRAILING_FEED)
+    return recorder.steps
+
+
+def _module_slips(src):
+    for path in find_slip_modules(src):
+        w, h, data, region = load_slip_module_with_region(path)
+        yield path.stem, w, h, lambda data=data: data, region
+
+
+def _pack_slips(fortune_cookie, path):
+    pack = fortune_cookie.SlipPack(str(path))
+    try:
+        for i in range(pack.count):
+            region = pack.lucky_region(i)
+            yield pack.slip_name(i), pack.width, pack.height, lambda i=i: pack.open_slip(i), region
+    finally:
+        pack.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile fortune slips to ESC/POS print plans")
+    parser.add_argument("--src", default="src", help="Directory holding fortune_slip_bitmap*.py (default: src)")
+    parser.add_argument("--pack", help="Compile the slips of this slip pack instead of the .py modules")
+    parser.add_argument("--out", default="src/fortune_plans.bin", help="Output plan file (default: src/fortune_plans.bin)")
+    parser.add_argument("--pacing", help="Pacing profile name from config (default: as the device picks it)")
+    parser.add_argument("--profile", help="Pacing saved by ThermalPrinter.calibrate() (printer_profile.json)")
+    parser.add_argument(
+        "--max-step",
+        type=int,
+        default=DEFAULT_MAX_STEP,
+        help=f"Largest single UART write, the device's buffer size (default: {DEFAULT_MAX_STEP})",
+    )
+    args = parser.parse_args()
+
+    if not 16 <= args.max_step <= MAX_STEP_LIMIT:
+        print(f"--max-step must be between 16 and {MAX_STEP_LIMIT}")
+        sys.exit(1)
+
+    Emulator().install()
+    import config
+    import fortune_cookie
+    from thermal_printer import ThermalPrinter
+
+    config.THERMAL_PRINTER_STATUS = "none"
+    config.UART_BAUD_PROBE = False
+    if args.pacing:
+        config.THERMAL_PRINTER_PACING = args.pacing
+    if args.profile:
+        config.THERMAL_PRINTER_PROFILE_FILE = args.profile
+    printer = ThermalPrinter()
+    recorder = PlanRecorder()
+    printer.uart = recorder
+    time.sleep = recorder.sleep
+    raster_options = fortune_cookie._raster_options()
+
+    slips = _pack_slips(fortune_cookie, args.pack) if args.pack else _module_slips(args.src)
+    records = []
+    skipped = 0
+    writes = steps_total = sent = 0
+    sleep_s = 0.0
+    for name, w, h, open_bitmap, region in slips:
+        if region is not None:
+            skipped += 1
+            continue
+        steps = record_slip(printer, recorder, open_bitmap(), w, h, raster_options)
+        record, count = encode_plan(steps, args.max_step)
+        data = b"".join(s[0] for s in steps)
+        decoded = decode_plan(record)
+        if b"".join(s[0] for s in decoded) != data:
+            print(f"Error: plan for {name} does not replay the driver's bytes")
+            sys.exit(1)
+        records.append(record)
+        writes += len(steps)
+        steps_total += count
+        sent += len(data)
+        sleep_s += sum(s[1] for s in steps)
+
+    if not records:
+        print("No slips to compile" + (f" ({skipped} have a lucky-number region)" if skipped else ""))
+        sys.exit(1)
+
+    size = write_plan_file(args.out, records, args.max_step)
+    n = len(records)
+    print(f"Wrote {args.out}: {n} plans, {size} bytes")
+    print(f"  pacing {printer.pacing}, {raster_options}")
+    print(
+        f"  per slip: {sent // n} bytes, {steps_total / n:.0f} UART writes "
+        f"(driver makes {writes / n:.0f}), {sleep_s / n:.2f} s of delays"
+    )
+    if skipped:
+        print(f"  skipped {skipped} slips with a lucky-number region")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Compile a TTF into a slip bitmap font
+
+Renders printable ASCII at a set of pixel sizes with Pillow (1-bit, exactly
+as render_fortune_slip.py draws text) and writes a compact font file for
+src/slip_renderer.py, which lays out and rasterizes slips on the ESP32.
+
+Layout (little-endian):
+    header    : magic b"FFNT", version u8, size count u8, first char u8,
+                ASCII glyph count u8, extra glyph count u16
+    extras    : extra count x code point u16 (glyphs after the ASCII run)
+    directory : count x (size u16, line height u16, glyph table offset u32)
+    table     : glyph count x (advance u8, x0 i8, y0 i8, w u8, h u8, data offset u32)
+    data      : glyph bitmaps, column by column, ceil(h/8) bytes per column,
+                MSB = top row, 1 = ink
+
+Glyphs are stored by column because slips are printed rotated 90 degrees:
+one printed row is one column of the unrotated text.
+"""
+
+import argparse
+import struct
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_MAGIC = b"FFNT"
+FONT_VERSION = 1
+FONT_HEADER = "<4sBBBBH"
+FONT_EXTRA_ENTRY = "<H"
+FONT_SIZE_ENTRY = "<HHI"
+FONT_GLYPH_ENTRY = "<BbbBBI"
+
+FIRST_CHAR = 32
+LAST_CHAR = 126
+# Typographic punctuation used in fortunes, compiled in besides ASCII
+EXTRA_CHARS = "\u2018\u2019\u201c\u201d\u2013\u2014\u2026"
+
+# render_fortune_slip.py draws the lucky numbers at this fraction of the main size
+LUCKY_SCALE = 0.6
+LUCKY_MIN_SIZE = 12
+
+
+def lucky_size(size):
+    return max(LUCKY_MIN_SIZE, int(size * LUCKY_SCALE))
+
+
+def render_glyph(font, ch):
+    """Return (advance, x0, y0, w, h, column-major bytes) for one character."""
+    advance = int(round(font.getlength(ch)))
+    x0, y0, x1, y1 = font.getbbox(ch)
+    w = max(0, x1 - x0)
+    h = max(0, y1 - y0)
+    if w == 0 or h == 0:
+        return advance, 0, 0, 0, 0, b""
+
+    img = Image.new("1", (w, h), 1)
+    ImageDraw.Draw(img).text((-x0, -y0), ch, font=font, fill=0)
+    px = img.load()
+
+    col_bytes = (h + 7) // 8
+    data = bytearray(w * col_bytes)
+    for x in range(w):
+        for y in range(h):
+            if px[x, y] == 0:
+                data[x * col_bytes + (y >> 3)] |= 0x80 >> (y & 7)
+    return advance, x0, y0, w, h, bytes(data)
+
+
+def build_font(font_path, sizes, extra_chars=EXTRA_CHARS, first_char=FIRST_CHAR, last_char=LAST_CHAR):
+    """Compile sizes (iterable of pixel sizes) into font file bytes.
+
+    first_char..last_char is the contiguous glyph run; extra_chars follow it.
+    """
+    sizes = sorted(set(sizes))
+    extra_chars = [ch for ch in dict.fromkeys(extra_chars) if not first_char <= ord(ch) <= last_char]
+    chars = [chr(c) for c in range(first_char, last_char + 1)] + extra_chars
+    ascii_count = last_char - first_char + 1
+    header_size = struct.calcsize(FONT_HEADER) + struct.calcsize(FONT_EXTRA_ENTRY) * len(extra_chars)
+    dir_size = struct.calcsize(FONT_SIZE_ENTRY) * len(sizes)
+    table_size = struct.calcsize(FONT_GLYPH_ENTRY) * len(chars)
+
+    directory = bytearray()
+    tables = bytearray()
+    data = bytearray()
+    data_start = header_size + dir_size + table_size * len(sizes)
+
+    for i, size in enumerate(sizes):
+        font = ImageFont.truetype(str(font_path), size)
+        line_height = font.getbbox("Ag")[3]
+        directory += struct.pack(FONT_SIZE_ENTRY, size, line_height, header_size + dir_size + i * table_size)
+        for ch in chars:
+            advance, x0, y0, w, h, bitmap = render_glyph(font, ch)
+            tables += struct.pack(FONT_GLYPH_ENTRY, advance, x0, y0, w, h, data_start + len(data))
+            data += bitmap
+
+    header = struct.pack(FONT_HEADER, FONT_MAGIC, FONT_VERSION, len(sizes), first_char, ascii_count, len(extra_chars))
+    for ch in extra_chars:
+        header += struct.pack(FONT_EXTRA_ENTRY, ord(ch))
+    return header + directory + tables + data
+
+
+def parse_sizes(spec):
+    """'24-80:4' -> 24, 28, ... 80; '24,32,40' -> those sizes."""
+    sizes = []
+    for part in spec.split(","):
+        step = 1
+        if ":" in part:
+            part, step = part.split(":")
+            step = int(step)
+        if "-" in part:
+            lo, hi = part.split("-")
+            sizes.extend(range(int(lo), int(hi) + 1, step))
+        else:
+            sizes.append(int(part))
+    return sizes
+
+
+# Widest lucky numbers line get_fortune can produce
+CHECK_LUCKY = "\n\nLucky numbers: 88, 88, 88, 88, 88, 88"
+
+
+def check_font(font_path):
+    """Lay out every fortune in src/fortune_cookie.py with the font as the
+    device does. Returns (fortunes checked, [(fortune, bottom y)] of those
+    whose slip has ink past its edges)."""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from escpos_emulator import Emulator
+
+    Emulator().install()
+    import fortune_cookie
+    import slip_renderer
+
+    failed = []
+    with slip_renderer.BitmapFont(str(font_path)) as font:
+        for fortune in fortune_cookie.FORTUNES:
+            items = slip_renderer.layout_slip(font, fortune + CHECK_LUCKY)
+            for x, y, w, h, _ in items:
+                if x < 0 or y < 0 or x + w > slip_renderer.SLIP_TEXT_WIDTH or y + h > slip_renderer.SLIP_TEXT_HEIGHT:
+                    failed.append((fortune, y + h))
+                    break
+    return len(fortune_cookie.FORTUNES), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a TTF into a slip bitmap font for the ESP32")
+    parser.add_argument("--font", required=True, help="Path to a .ttf font file")
+    parser.add_argument("--sizes", default="24-80:4", help="Main text sizes, e.g. 24-80:4 or 24,32,48 (default: 24-80:4)")
+    parser.add_argument("--chars", default="", help="Extra non-ASCII characters to include")
+    parser.add_argument("--out", default="src/slip_font.bin", help="Output font path (default: src/slip_font.bin)")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Then lay out every fortune with the font and exit 1 if any slip overflows",
+    )
+    args = parser.parse_args()
+
+    main_sizes = parse_sizes(args.sizes)
+    if not main_sizes:
+        print("No sizes given")
+        sys.exit(1)
+    # The lucky-number sizes each main size needs are compiled in as well
+    sizes = set(main_sizes) | {lucky_size(s) for s in main_sizes}
+
+    data = build_font(args.font, sizes, EXTRA_CHARS + args.chars)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_bytes(data)
+    print(f"Wrote {out}: {len(sizes)} sizes ({min(sizes)}-{max(sizes)} px), {len(data)} bytes")
+
+    if args.check:
+        count, failed = check_font(out)
+        for fortune, bottom in failed:
+            print(f"Error: {fortune!r} runs to y={bottom}")
+        print(f"Layout check: {count - len(failed)}/{count} fortunes fit the slip")
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
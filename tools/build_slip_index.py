@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Build the fortune slip index
+
+Lists every src/fortune_slip_bitmap*.py module in print-pool order with its
+file size, content hash and dimensions, so the ESP32 reads its slip pool and
+slip hashes from one small file at boot instead of importing the slips:
+
+    python3 tools/build_slip_index.py
+    mpremote connect auto fs cp src/slip_index.json :slip_index.json
+
+Layout (JSON):
+    {"version": 1, "fields": ["name", "size", "hash", "width", "height"],
+     "slips": [[name, size, hash, width, height], ...]}
+
+hash is the first 16 hex digits of the SHA-256 of the decoded bitmap, the
+same digest ThermalPrinter.bitmap_digest records for NV slips, so
+fortune_cookie.upload_slips skips unchanged slips without importing them.
+generate_fortune_slips.py and recode_slip_modules.py rewrite the index too,
+and build_mpy.py records the .mpy sizes in its copy. At boot the device
+trusts the index, checking only the last slip's size and that no slip follows
+it; it rescans when that fails or an indexed slip fails to import. Rebuild
+the index after changing slips mid-pool.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_slip_pack import find_slip_modules, load_slip_module  # noqa: E402
+
+INDEX_NAME = "slip_index.json"
+INDEX_VERSION = 1
+INDEX_FIELDS = ["name", "size", "hash", "width", "height"]
+DIGEST_CHARS = 16
+
+
+def bitmap_digest(data):
+    """Digest of a decoded bitmap, as ThermalPrinter.bitmap_digest computes it."""
+    return hashlib.sha256(data).hexdigest()[:DIGEST_CHARS]
+
+
+def write_slip_index(src_dir, out_path=None):
+    """Index the slip modules in src_dir. Returns (path, number of slips)."""
+    out_path = Path(out_path) if out_path else Path(src_dir) / INDEX_NAME
+    rows = []
+    for path in find_slip_modules(src_dir):
+        w, h, data = load_slip_module(path)
+        rows.append([path.stem, path.stat().st_size, bitmap_digest(data), w, h])
+    index = {"version": INDEX_VERSION, "fields": INDEX_FIELDS, "slips": rows}
+    out_path.write_text(json.dumps(index, separators=(",", ":")))
+    return out_path, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index fortune_slip_bitmap*.py modules for the device")
+    parser.add_argument("--src", default="src", help="Directory holding fortune_slip_bitmap*.py (default: src)")
+    parser.add_argument("--out", help=f"Index path (default: <src>/{INDEX_NAME})")
+    args = parser.parse_args()
+
+    path, count = write_slip_index(args.src, args.out)
+    if not count:
+        print(f"Warning: no fortune_slip_bitmap*.py modules found in {args.src}")
+    print(f"Wrote {path}: {count} slips, {path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Build a fortune slip pack
+
+Packs pre-rendered 1bpp slips into a single binary file that the ESP32 can
+seek into and stream band by band (see fortune_cookie.SlipPack).
+
+Layout (little-endian):
+    header  : magic b"FSLP", version u8, encoding u8, count u16, width u16, height u16
+    index   : count x (offset u32, length u32), offsets from start of file
+              version 2 adds a lucky-number region per slip:
+              (offset u32, length u32, x u16, y u16, w u16, h u16), w = 0 for none
+    shared  : encoding 1: template, one row-major 1bpp bitmap shared by all slips
+              encoding 2: row dictionary, count u16 + count x row (width / 8 bytes)
+    records : encoding 0: raw row-major 1bpp slip bitmaps
+              encoding 1: spans (skip u16, length u8, length bytes) that replace
+              template bytes; skip counts from the end of the previous span
+              encoding 2: height x token u16 (dictionary index, or 0xFFFF for a
+              literal row), then the literal rows in order
+"""
+
+import argparse
+import re
+import struct
+import sys
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import slip_codec  # noqa: E402
+
+PACK_MAGIC = b"FSLP"
+PACK_VERSION = 1
+PACK_VERSION_REGIONS = 2
+PACK_HEADER = "<4sBBHHH"
+PACK_INDEX_ENTRY = "<II"
+PACK_INDEX_ENTRY_REGION = "<IIHHHH"
+
+ENCODING_RAW = 0
+ENCODING_DELTA = 1
+ENCODING_ROWDICT = 2
+ENCODINGS = {"raw": ENCODING_RAW, "delta": ENCODING_DELTA, "rowdict": ENCODING_ROWDICT}
+
+DELTA_SPAN = "<HB"
+DELTA_SPAN_MAX = 255
+# Unchanged runs shorter than a span header are cheaper to copy than to skip
+DELTA_MERGE_GAP = struct.calcsize(DELTA_SPAN)
+
+
+def build_template(slips):
+    """Most common value of every byte position across slips."""
+    return bytes(Counter(column).most_common(1)[0][0] for column in zip(*slips))
+
+
+def encode_delta(data, template):
+    """Encode data as spans of bytes that differ from template."""
+    spans = []
+    for i, (a, b) in enumerate(zip(data, template)):
+        if a == b:
+            continue
+        if spans and i - spans[-1][1] <= DELTA_MERGE_GAP and i - spans[-1][0] < DELTA_SPAN_MAX:
+            spans[-1][1] = i + 1
+        else:
+            spans.append([i, i + 1])
+
+    out = bytearray()
+    prev_end = 0
+    for start, end in spans:
+        skip = start - prev_end
+        while skip > 0xFFFF:
+            # Never happens for slip-sized bitmaps, but keep the format total
+            out += struct.pack(DELTA_SPAN, 0xFFFF, 0)
+            skip -= 0xFFFF
+        out += struct.pack(DELTA_SPAN, skip, end - start)
+        out += data[start:end]
+        prev_end = end
+    return bytes(out)
+
+
+def decode_delta(record, template):
+    """Rebuild a slip from its delta record (host-side check of encode_delta)."""
+    out = bytearray(template)
+    header = struct.calcsize(DELTA_SPAN)
+    pos = 0
+    i = 0
+    while i < len(record):
+        skip, length = struct.unpack_from(DELTA_SPAN, record, i)
+        i += header
+        pos += skip
+        out[pos:pos + length] = record[i:i + length]
+        pos += length
+        i += length
+    return bytes(out)
+
+
+ROW_TOKEN = "<H"
+ROW_LITERAL = 0xFFFF
+
+
+def build_row_dictionary(slips, bytes_per_line):
+    """Rows that occur more than once across all slips, most frequent first.
+
+    A row used twice costs one dictionary entry instead of two literal
+    copies; tokens are the same size either way.
+    """
+    counts = Counter()
+    for data in slips:
+        for i in range(0, len(data), bytes_per_line):
+            counts[bytes(data[i:i + bytes_per_line])] += 1
+    rows = [row for row, n in counts.most_common() if n > 1]
+    return rows[:ROW_LITERAL]
+
+
+def encode_rows(data, bytes_per_line, row_index):
+    """Encode data as one token per row plus the rows not in row_index.
+
+    Returns (record, dictionary hits).
+    """
+    tokens = bytearray()
+    literals = bytearray()
+    hits = 0
+    for i in range(0, len(data), bytes_per_line):
+        row = bytes(data[i:i + bytes_per_line])
+        index = row_index.get(row)
+        if index is None:
+            tokens += struct.pack(ROW_TOKEN, ROW_LITERAL)
+            literals += row
+        else:
+            tokens += struct.pack(ROW_TOKEN, index)
+            hits += 1
+    return bytes(tokens + literals), hits
+
+
+def decode_rows(record, rows, bytes_per_line, height):
+    """Rebuild a slip from its row record (host-side check of encode_rows)."""
+    out = bytearray()
+    literal = struct.calcsize(ROW_TOKEN) * height
+    for r in range(height):
+        (token,) = struct.unpack_from(ROW_TOKEN, record, r * struct.calcsize(ROW_TOKEN))
+        if token == ROW_LITERAL:
+            out += record[literal:literal + bytes_per_line]
+            literal += bytes_per_line
+        else:
+            out += rows[token]
+    return bytes(out)
+
+
+def write_slip_pack(out_path, slips, width, height, regions=None, encoding=ENCODING_RAW, stats=None):
+    """Write slips (a list of bytes-like bitmaps) to out_path. Returns file size.
+
+    regions: optional per-slip lucky-number regions (x, y, w, h) or None;
+    when any is set the pack is written as version 2.
+    encoding: ENCODING_RAW, ENCODING_DELTA (shared template + per-slip spans)
+    or ENCODING_ROWDICT (shared row dictionary + per-slip row tokens).
+    stats: optional dict, filled with dictionary_rows / row_hits / rows for
+    ENCODING_ROWDICT.
+    """
+    expected_len = (width // 8) * height
+    for i, data in enumerate(slips):
+        if len(data) != expected_len:
+            raise ValueError(f"Slip {i} is {len(data)} bytes, expected {expected_len}")
+
+    if regions is not None and not any(regions):
+        regions = None
+    version = PACK_VERSION if regions is None else PACK_VERSION_REGIONS
+    header_size = struct.calcsize(PACK_HEADER)
+    entry_size = struct.calcsize(PACK_INDEX_ENTRY if regions is None else PACK_INDEX_ENTRY_REGION)
+
+    bytes_per_line = width // 8
+    shared = b""
+    records = slips
+    if encoding == ENCODING_DELTA:
+        shared = build_template(slips)
+        records = [encode_delta(data, shared) for data in slips]
+        for i, (data, record) in enumerate(zip(slips, records)):
+            if decode_delta(record, shared) != data:
+                raise RuntimeError(f"Slip {i} delta does not round-trip")
+    elif encoding == ENCODING_ROWDICT:
+        rows = build_row_dictionary(slips, bytes_per_line)
+        row_index = {row: i for i, row in enumerate(rows)}
+        shared = struct.pack(ROW_TOKEN, len(rows)) + b"".join(rows)
+        records = []
+        hits = 0
+        for i, data in enumerate(slips):
+            record, slip_hits = encode_rows(data, bytes_per_line, row_index)
+            if decode_rows(record, rows, bytes_per_line, height) != data:
+                raise RuntimeError(f"Slip {i} rows do not round-trip")
+            records.append(record)
+            hits += slip_hits
+        if stats is not None:
+            stats["dictionary_rows"] = len(rows)
+            stats["row_hits"] = hits
+            stats["rows"] = height * len(slips)
+    elif encoding != ENCODING_RAW:
+        raise ValueError(f"Unknown slip pack encoding {encoding}")
+
+    out = bytearray(struct.pack(PACK_HEADER, PACK_MAGIC, version, encoding, len(slips), width, height))
+    offset = header_size + entry_size * len(slips) + len(shared)
+    for i, data in enumerate(records):
+        if regions is None:
+            out += struct.pack(PACK_INDEX_ENTRY, offset, len(data))
+        else:
+            out += struct.pack(PACK_INDEX_ENTRY_REGION, offset, len(data), *(regions[i] or (0, 0, 0, 0)))
+        offset += len(data)
+    out += shared
+    for data in records:
+        out += data
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_bytes(bytes(out))
+    return len(out)
+
+
+def report_pack_size(size, slips, source_bytes, stats=None, source_label="Source modules"):
+    """Print a pack's size against the raw slips and the .py modules it replaces.
+
+    source_label says which modules source_bytes measured.
+    """
+    raw_bytes = sum(len(data) for data in slips)
+    if stats and stats.get("rows"):
+        print(
+            f"Row dictionary: {stats['dictionary_rows']} rows, "
+            f"{stats['row_hits']}/{stats['rows']} rows hit ({stats['row_hits'] / stats['rows']:.1%})"
+        )
+    print(f"Raw slips: {raw_bytes} bytes ({size / raw_bytes:.1%} of raw, {raw_bytes / size:.1f}x compression)")
+    print(f"{source_label}: {source_bytes} bytes ({size / source_bytes:.1%} of source, {source_bytes / size:.1f}x)")
+
+
+def slip_module_sort_key(path, prefix="fortune_slip_bitmap"):
+    stem = Path(path).stem
+    if stem == prefix:
+        return (0, 0)
+    suffix = stem[len(prefix) + 1:]
+    try:
+        return (1, int(suffix))
+    except ValueError:
+        return (2, suffix)
+
+
+def load_slip_module(path):
+    """Load WIDTH/HEIGHT/BITMAP from a generated slip module without importing it."""
+    return load_slip_module_with_region(path)[:3]
+
+
+def load_slip_module_with_region(path):
+    """Like load_slip_module, plus LUCKY_REGION (or None)."""
+    namespace = {}
+    exec(compile(Path(path).read_text(), str(path), "exec"), namespace)
+    slip = SimpleNamespace(**namespace)
+    return slip.WIDTH, slip.HEIGHT, slip_codec.decode(slip), getattr(slip, "LUCKY_REGION", None)
+
+
+def find_slip_modules(src_dir, prefix="fortune_slip_bitmap"):
+    pattern = re.compile(re.escape(prefix) + r"(_\w+)?\.py$")
+    paths = [p for p in Path(src_dir).iterdir() if pattern.match(p.name)]
+    paths.sort(key=lambda p: slip_module_sort_key(p, prefix))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack fortune_slip_bitmap*.py modules into a slip pack")
+    parser.add_argument("--src", default="src", help="Directory holding fortune_slip_bitmap*.py (default: src)")
+    parser.add_argument("--out", default="src/fortune_slips.bin", help="Output pack path (default: src/fortune_slips.bin)")
+    parser.add_argument(
+        "--encoding",
+        choices=sorted(ENCODINGS),
+        default="delta",
+        help="raw slips, a shared template plus per-slip deltas, or a shared row dictionary (default: delta)",
+    )
+    args = parser.parse_args()
+
+    paths = find_slip_modules(args.src)
+    if not paths:
+        print(f"No fortune_slip_bitmap*.py modules found in {args.src}")
+        sys.exit(1)
+
+    slips = []
+    regions = []
+    width = height = None
+    source_bytes = 0
+    for path in paths:
+        w, h, data, region = load_slip_module_with_region(path)
+        if width is None:
+            width, height = w, h
+        elif (w, h) != (width, height):
+            print(f"Error: {path.name} is {w}x{h}, expected {width}x{height}")
+            sys.exit(1)
+        slips.append(data)
+        regions.append(region)
+        source_bytes += path.stat().st_size
+
+    stats = {}
+    size = write_slip_pack(args.out, slips, width, height, regions, ENCODINGS[args.encoding], stats)
+    print(f"Wrote {args.out}: {len(slips)} slips, {width}x{height}, {args.encoding}, {size} bytes")
+    report_pack_size(size, slips, source_bytes, stats, f"Modules in {args.src} as deployed")
+
+
+if __name__ == "__main__":
+    main()
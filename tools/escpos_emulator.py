@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+"""
+ESC/POS Virtual Printer Emulator
+
+Consumes the exact byte stream ThermalPrinter produces, renders the resulting
+paper to a PNG and reports bytes, command counts and a wire/print time model.
+It can stand in for machine.UART so src/ modules run unmodified under CPython:
+
+    python3 tools/escpos_emulator.py --fortune --out paper.png
+    python3 tools/escpos_emulator.py --test-print --baud 115200
+    python3 tools/escpos_emulator.py --input capture.bin --out paper.png
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+SRC_PATH = Path(__file__).parent.parent / "src"
+
+PAPER_DOTS = 384  # 58mm printers: 48 bytes per raster row
+DOTS_PER_MM = 8  # 203 dpi
+FONT_A = (12, 24)  # character cell in dots
+DEFAULT_LINE_SPACING = 30
+
+
+class VirtualPrinter:
+    """ESC/POS interpreter that builds a 1bpp paper image"""
+
+    def __init__(self, paper_dots=PAPER_DOTS):
+        self.paper_dots = paper_dots
+        self.row_bytes = paper_dots // 8
+        self.rows = []  # printed paper, one bytearray per dot row
+        self.bytes_in = 0
+        self.raster_bytes = 0
+        self.commands = {}
+        self.replies = bytearray()  # bytes the printer sends back (status)
+        self.nv_graphics = {}  # key -> (width, height, data)
+        self.baudrate_setting = None
+        self._buf = bytearray()
+        self._glyphs = {}
+        self.reset()
+
+    def reset(self):
+        self.bold = False
+        self.underline = False
+        self.width_mul = 1
+        self.height_mul = 1
+        self.align = 0
+        self.rotate = False
+        self.line_spacing = DEFAULT_LINE_SPACING
+        self.left_margin = 0
+        self._line = []  # (x, glyph rows, width) pending on the current line
+        self._x = 0
+        self._after_raster = False
+
+    # -- input ----------------------------------------------------------------
+
+    def feed(self, data):
+        self.bytes_in += len(data)
+        self._buf += data
+        i = 0
+        buf = self._buf
+        while i < len(buf):
+            used = self._parse(buf, i)
+            if used is None:
+                break  # incomplete command: wait for more bytes
+            i += used
+        del self._buf[:i]
+
+    def _count(self, name):
+        self.commands[name] = self.commands.get(name, 0) + 1
+
+    def _parse(self, b, i):
+        c = b[i]
+        n = len(b) - i
+
+        if c == 0x0A:
+            self._count('LF')
+            self._print_line(empty_feeds=not self._after_raster)
+            return 1
+        if c == 0x1B:
+            if n < 2:
+                return None
+            op = b[i + 1]
+            if op == 0x40:
+                self._count('ESC @')
+                self.reset()
+                return 2
+            if op in (0x32,):
+                self._count('ESC 2')
+                self.line_spacing = DEFAULT_LINE_SPACING
+                return 2
+            if n < 3:
+                return None
+            arg = b[i + 2]
+            if op == 0x21:
+                self._count('ESC !')
+                self.bold = bool(arg & 0x08)
+                self.height_mul = 2 if arg & 0x10 else 1
+                self.width_mul = 2 if arg & 0x20 else 1
+                self.underline = bool(arg & 0x80)
+                return 3
+            if op == 0x61:
+                self._count('ESC a')
+                self.align = arg % 48 if arg >= 48 else arg
+                return 3
+            if op == 0x45:
+                self._count('ESC E')
+                self.bold = bool(arg & 1)
+                return 3
+            if op == 0x2D:
+                self._count('ESC -')
+                self.underline = bool(arg % 48 if arg >= 48 else arg)
+                return 3
+            if op == 0x33:
+                self._count('ESC 3')
+                self.line_spacing = arg
+                return 3
+            if op == 0x56:
+                self._count('ESC V')
+                self.rotate = bool(arg % 48 if arg >= 48 else arg)
+                return 3
+            if op == 0x64:
+                self._count('ESC d')
+                self._print_line(empty_feeds=True)
+                self._feed((arg - 1) * self.line_spacing if arg else 0)
+                return 3
+            if op == 0x4A:
+                self._count('ESC J')
+                self._print_line(empty_feeds=False)
+                self._feed(arg)
+                return 3
+            if op == 0x24:
+                if n < 4:
+                    return None
+                self._count('ESC $')
+                self._x = b[i + 2] | (b[i + 3] << 8)
+                return 4
+            if op == 0x2A:
+                if n < 5:
+                    return None
+                mode = b[i + 2]
+                cols = b[i + 3] | (b[i + 4] << 8)
+                depth = 3 if mode in (32, 33) else 1
+                total = 5 + cols * depth
+                if n < total:
+                    return None
+                self._count('ESC *')
+                self._bit_image(b[i + 5:i + total], cols, depth, mode)
+                return total
+            self._count('ESC ?')
+            return 2
+        if c == 0x1D:
+            if n < 2:
+                return None
+            op = b[i + 1]
+            if op == 0x76:  # GS v 0 m xL xH yL yH
+                if n < 8:
+                    return None
+                xb = b[i + 4] | (b[i + 5] << 8)
+                yd = b[i + 6] | (b[i + 7] << 8)
+                total = 8 + xb * yd
+                if n < total:
+                    return None
+                self._count('GS v 0')
+                self._raster(b[i + 8:i + total], xb, yd)
+                return total
+            if op == 0x4C:
+                if n < 4:
+                    return None
+                self._count('GS L')
+                self.left_margin = b[i + 2] | (b[i + 3] << 8)
+                return 4
+            if op == 0x61:
+                if n < 3:
+                    return None
+                self._count('GS a')
+                return 3
+            if op == 0x21:
+                if n < 3:
+                    return None
+                self._count('GS !')
+                self.width_mul = (b[i + 2] >> 4) + 1
+                self.height_mul = (b[i + 2] & 0x0F) + 1
+                return 3
+            if op in (0x28, 0x38):  # GS ( x / GS 8 L
+                size_len = 2 if op == 0x28 else 4
+                if n < 3 + size_len:
+                    return None
+                fn_class = b[i + 2]
+                size = 0
+                for k in range(size_len):
+                    size |= b[i + 3 + k] << (8 * k)
+                total = 3 + size_len + size
+                if n < total:
+                    return None
+                body = bytes(b[i + 3 + size_len:i + total])
+                self._extended(fn_class, body, op)
+                return total
+            self._count('GS ?')
+            return 2
+        if c == 0x10:
+            if n < 3:
+                return None
+            if b[i + 1] == 0x04:
+                self._count('DLE EOT')
+                self.replies.append(0x12)  # online, no errors, paper present
+                return 3
+            self._count('DLE ?')
+            return 2
+        if 0x20 <= c < 0x7F:
+            self._count('text')
+            self._text(chr(c))
+            return 1
+        self._count('unknown')
+        return 1
+
+    def _extended(self, fn_class, body, op):
+        if fn_class == 0x4C and len(body) >= 2 and body[0] == 48:  # GS ( L / GS 8 L graphics
+            fn = body[1]
+            if fn == 67 and len(body) >= 11:
+                self._count('GS ( L define')
+                key = bytes(body[3:5])
+                width = body[6] | (body[7] << 8)
+                height = body[8] | (body[9] << 8)
+                self.nv_graphics[key] = (width, height, bytes(body[11:]))
+                return
+            if fn == 69 and len(body) >= 4:
+                self._count('GS ( L print')
+                stored = self.nv_graphics.get(bytes(body[2:4]))
+                if stored:
+                    width, height, data = stored
+                    self._raster(data, (width + 7) // 8, height)
+                return
+            if fn == 66:
+                self._count('GS ( L delete')
+                self.nv_graphics.pop(bytes(body[2:4]), None)
+                return
+            self._count('GS ( L')
+            return
+        if fn_class == 0x45:  # GS ( E user setup
+            self._count('GS ( E')
+            if body and body[0] == 11 and len(body) > 2:
+                self.baudrate_setting = int(body[2:].decode())
+            return
+        self._count('GS ( ?' if op == 0x28 else 'GS 8 ?')
+
+    # -- paper ----------------------------------------------------------------
+
+    def _feed(self, dots):
+        for _ in range(dots):
+            self.rows.append(bytearray(self.row_bytes))
+
+    def _blit(self, rows, src, x, width):
+        """OR 1bpp src rows (each width dots, MSB first) into rows at dot x"""
+        for r, line in enumerate(src):
+            for px in range(width):
+                if line[px >> 3] & (0x80 >> (px & 7)):
+                    dx = x + px
+                    if 0 <= dx < self.paper_dots:
+                        rows[r][dx >> 3] |= 0x80 >> (dx & 7)
+
+    def _raster(self, data, xb, yd):
+        self._print_line(empty_feeds=False)
+        self.raster_bytes += len(data)
+        x = self.left_margin
+        for r in range(yd):
+            row = bytearray(self.row_bytes)
+            src = data[r * xb:(r + 1) * xb]
+            if x % 8 == 0:
+                start = x // 8
+                span = min(xb, self.row_bytes - start)
+                if span > 0:
+                    row[start:start + span] = src[:span]
+            else:
+                self._blit([row], [src], x, xb * 8)
+            self.rows.append(row)
+        self._after_raster = True
+
+    def _bit_image(self, data, cols, depth, mode):
+        height = 8 * depth
+        scale_x = 2 if mode in (1, 33) else 1
+        src = [bytearray((cols * scale_x + 7) // 8) for _ in range(height)]
+        for col in range(cols):
+            for k in range(depth):
+                byte = data[col * depth + k]
+                for bit in range(8):
+                    if byte & (0x80 >> bit):
+                        y = k * 8 + bit
+                        for sx in range(scale_x):
+                            px = col * scale_x + sx
+                            src[y][px >> 3] |= 0x80 >> (px & 7)
+        self._line.append((self._x, src, cols * scale_x))
+        self._x += cols * scale_x
+        self._after_raster = False
+
+    def _glyph(self, ch):
+        w, h = FONT_A
+        w *= self.width_mul
+        h *= self.height_mul
+        key = (ch, w, h, self.bold, self.underline, self.rotate)
+        glyph = self._glyphs.get(key)
+        if glyph is not None:
+            return glyph
+
+        try:
+            from PIL import Image, ImageDraw, ImageFont
+        except ImportError:
+            Image = None
+
+        rows = [bytearray((w + 7) // 8) for _ in range(h)]
+        if Image is not None and ch != ' ':
+            # Draw into a Font A sized cell, then scale like the printer does
+            cw, chh = FONT_A
+            scale = 4
+            img = Image.new('L', (cw * scale, chh * scale), 0)
+            draw = ImageDraw.Draw(img)
+            try:
+                font = ImageFont.load_default(size=chh * scale * 3 // 4)
+            except TypeError:
+                font = ImageFont.load_default()
+            x0 = max(0, (cw * scale - draw.textlength(ch, font=font)) / 2)
+            draw.text((x0, scale), ch, font=font, fill=255)
+            if self.bold:
+                draw.text((x0 + scale, scale), ch, font=font, fill=255)
+            img = img.resize((w, h)).point(lambda v: 255 if v >= 96 else 0).convert('1')
+            px = img.load()
+            for y in range(h):
+                for x in range(w):
+                    if px[x, y]:
+                        rows[y][x >> 3] |= 0x80 >> (x & 7)
+        elif ch != ' ':
+            # No Pillow: draw the character cell outline
+            for x in range(1, w - 1):
+                rows[2][x >> 3] |= 0x80 >> (x & 7)
+                rows[h - 3][x >> 3] |= 0x80 >> (x & 7)
+            for y in range(2, h - 2):
+                rows[y][0] |= 0x40
+                rows[y][(w - 2) >> 3] |= 0x80 >> ((w - 2) & 7)
+        if self.underline:
+            for x in range(w):
+                rows[h - 1][x >> 3] |= 0x80 >> (x & 7)
+
+        if self.rotate:
+            # 90 degrees clockwise: the cell becomes h wide and w tall
+            rot = [bytearray((h + 7) // 8) for _ in range(w)]
+            for y in range(h):
+                for x in range(w):
+                    if rows[y][x >> 3] & (0x80 >> (x & 7)):
+                        nx, ny = h - 1 - y, x
+                        rot[ny][nx >> 3] |= 0x80 >> (nx & 7)
+            glyph = (rot, h)
+        else:
+            glyph = (rows, w)
+        self._glyphs[key] = glyph
+        return glyph
+
+    def _text(self, ch):
+        rows, width = self._glyph(ch)
+        self._line.append((self._x, rows, width))
+        self._x += width
+        self._after_raster = False
+
+    def _print_line(self, empty_feeds):
+        """Print the pending line; an empty line feeds line spacing if empty_feeds"""
+        line = self._line
+        if not line:
+            if empty_feeds:
+                self._feed(self.line_spacing)
+            self._x = 0
+            return
+
+        used = max(x + w for x, _, w in line)
+        offset = self.left_margin
+        if self.align == 1:
+            offset += max(0, (self.paper_dots - self.left_margin - used) // 2)
+        elif self.align == 2:
+            offset = max(0, self.paper_dots - used)
+        height = max(len(rows) for _, rows, _ in line)
+        out = [bytearray(self.row_bytes) for _ in range(height)]
+        for x, rows, w in line:
+            self._blit(out[height - len(rows):], rows, offset + x, w)
+        self.rows.extend(out)
+        if self.line_spacing > height:
+            self._feed(self.line_spacing - height)
+
+        self._line = []
+        self._x = 0
+
+    # -- output ---------------------------------------------------------------
+
+    def finish(self):
+        if self._line:
+            self._print_line(empty_feeds=False)
+
+    def save_png(self, path):
+        from PIL import Image
+
+        self.finish()
+        height = max(1, len(self.rows))
+        img = Image.frombytes('1', (self.paper_dots, height), bytes(b''.join(bytes(r) for r in self.rows)).ljust(self.row_bytes * height, b'\0'))
+        # 1 bits are ink: invert so ink is black
+        img = img.point(lambda v: 0 if v else 255).convert('1')
+        img.save(path)
+        return path
+
+    def report(self, baudrate=9600, head_mm_s=50.0, host_sleep_s=0.0):
+        """Bytes, command counts and a simple time model.
+
+        wire_s: time on the UART (10 bits per byte).
+        mech_s: time to move the printed paper length at head_mm_s.
+        est_s: the slower of the two plus any host-side sleeps.
+        """
+        self.finish()
+        wire_s = self.bytes_in * 10.0 / baudrate
+        paper_mm = len(self.rows) / DOTS_PER_MM
+        mech_s = paper_mm / head_mm_s
+        return {
+            'bytes': self.bytes_in,
+            'raster_bytes': self.raster_bytes,
+            'commands': dict(sorted(self.commands.items())),
+            'paper_mm': round(paper_mm, 1),
+            'baudrate': baudrate,
+            'wire_s': round(wire_s, 3),
+            'mech_s': round(mech_s, 3),
+            'host_sleep_s': round(host_sleep_s, 3),
+            'est_s': round(max(wire_s, mech_s) + host_sleep_s, 3),
+        }
+
+
+class FakeUART:
+    """machine.UART stand-in that feeds a VirtualPrinter and returns its replies"""
+
+    RTS = 1
+    CTS = 2
+
+    def __init__(self, printer, *args, **kwargs):
+        self.printer = printer
+        self.baudrate = kwargs.get('baudrate', 9600)
+        self.writes = 0
+
+    def init(self, *args, **kwargs):
+        if 'baudrate' in kwargs:
+            self.baudrate = kwargs['baudrate']
+
+    def write(self, data):
+        self.writes += 1
+        self.printer.feed(bytes(data))
+        return len(data)
+
+    def any(self):
+        return len(self.printer.replies)
+
+    def read(self, n=None):
+        replies = self.printer.replies
+        if not replies:
+            return None
+        if n is None:
+            n = len(replies)
+        data = bytes(replies[:n])
+        del replies[:n]
+        return data
+
+    def readinto(self, buf):
+        data = self.read(len(buf))
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def deinit(self):
+        pass
+
+
+class _FakePin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+
+    def __init__(self, *args, **kwargs):
+        self._value = 0
+
+    def value(self, *args):
+        if args:
+            self._value = args[0]
+        return self._value
+
+
+class Emulator:
+    """Installs a fake `machine` module wired to one VirtualPrinter.
+
+    Pacing sleeps are skipped by default (fast=True) but their total is
+    recorded so the report can still include host-side delay.
+    """
+
+    def __init__(self, fast=True, uart_class=FakeUART):
+        self.printer = VirtualPrinter()
+        self.uart_class = uart_class
+        self.uart = None
+        self.fast = fast
+        self.sleep_s = 0.0
+        self._real_sleep = time.sleep
+
+    def _sleep(self, seconds):
+        self.sleep_s += seconds
+        if not self.fast:
+            self._real_sleep(seconds)
+
+    def install(self, workdir=None):
+        emulator = self
+
+        class UART(self.uart_class):
+            def __init__(self, *args, **kwargs):
+                super().__init__(emulator.printer, *args, **kwargs)
+                emulator.uart = self
+
+        machine = types.ModuleType('machine')
+        machine.UART = UART
+        machine.Pin = _FakePin
+        machine.freq = lambda *args: None
+        sys.modules['machine'] = machine
+
+        # MicroPython time helpers used by the firmware
+        if not hasattr(time, 'ticks_ms'):
+            time.ticks_ms = lambda: int(time.monotonic() * 1000)
+            time.ticks_us = lambda: int(time.monotonic() * 1000000)
+            time.ticks_diff = lambda a, b: a - b
+            time.ticks_add = lambda a, b: a + b
+            time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        time.sleep = self._sleep
+
+        if str(SRC_PATH) not in sys.path:
+            sys.path.insert(0, str(SRC_PATH))
+
+        # Keep files the driver persists (baud rate, NV record, profile) out of src/
+        import config
+        workdir = workdir or tempfile.mkdtemp(prefix="escpos_emulator_")
+        config.UART_BAUD_FILE = os.path.join(workdir, "printer_baud.txt")
+        config.THERMAL_PRINTER_NV_RECORD = os.path.join(workdir, "nv_slips.json")
+        config.THERMAL_PRINTER_PROFILE_FILE = os.path.join(workdir, "printer_profile.json")
+        for name in ("FORTUNE_SLIP_PACK", "FORTUNE_PRINT_PLAN", "FORTUNE_SLIP_INDEX"):
+            path = getattr(config, name, None)
+            if path and not os.path.isabs(path) and (SRC_PATH / path).exists():
+                setattr(config, name, str(SRC_PATH / path))
+        return self
+
+    def uninstall(self):
+        time.sleep = self._real_sleep
+        sys.modules.pop('machine', None)
+
+    def report(self, baudrate=9600, head_mm_s=50.0):
+        return self.printer.report(baudrate, head_mm_s, 0.0 if self.fast else self.sleep_s)
+
+
+def check_text_slips(emulator, printer):
+    """Print every fortune as a text-mode slip; exit 1 on an error or a non-ASCII byte."""
+    import fortune_cookie
+    failed = 0
+    for fortune in fortune_cookie.FORTUNES:
+        before = emulator.printer.commands.get('unknown', 0)
+        try:
+            printer.send(fortune_cookie.text_slip_commands(printer, fortune))
+        except Exception as e:
+            print(f"Error: {fortune!r}: {e!r}")
+            failed += 1
+            continue
+        if emulator.printer.commands.get('unknown', 0) != before:
+            print(f"Error: {fortune!r} sent bytes the printer font does not have")
+            failed += 1
+    print(f"Text mode: {len(fortune_cookie.FORTUNES) - failed}/{len(fortune_cookie.FORTUNES)} fortunes OK")
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate an ESC/POS printer on the host")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fortune", action="store_true", help="Run fortune_cookie.print_fortune")
+    source.add_argument("--test-print", action="store_true", help="Run ThermalPrinter.test_print")
+    source.add_argument("--input", help="Parse a captured byte stream from this file")
+    source.add_argument("--check-text", action="store_true", help="Print every fortune in text mode and check the bytes")
+    parser.add_argument("--out", help="Write the printed paper to this PNG")
+    parser.add_argument("--baud", type=int, default=9600, help="Baud rate for the wire-time model")
+    parser.add_argument("--head-speed", type=float, default=50.0, help="Print head speed in mm/s")
+    parser.add_argument("--seed", type=int, help="Random seed for the slip choice")
+    args = parser.parse_args()
+
+    emulator = Emulator()
+    if args.input:
+        emulator.printer.feed(Path(args.input).read_bytes())
+    else:
+        emulator.install()
+        if args.seed is not None:
+            import random
+            random.seed(args.seed)
+        from thermal_printer import ThermalPrinter
+        printer = ThermalPrinter()
+        if args.fortune:
+            import fortune_cookie
+            fortune_cookie.print_fortune(printer)
+        elif args.check_text:
+            check_text_slips(emulator, printer)
+        else:
+            printer.test_print()
+        emulator.uninstall()
+
+    report = emulator.printer.report(args.baud, args.head_speed, emulator.sleep_s)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if args.out:
+        print(f"Wrote {emulator.printer.save_png(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -117,6 +117,11 @@ FORTUNES = [
 ]
 
 from render_fortune_slip import main as render_slip
+from render_fortune_slip import LITERAL_BYTES, LITERAL_LIST, bitmap_module_source, build_lucky_atlas, render_slip_with_region
+from build_slip_pack import ENCODINGS, report_pack_size, write_slip_pack
+from build_slip_index import write_slip_index
+
+LUCKY_ATLAS_NAME = "lucky_digits.bin"
 
 
 def get_fortune_with_lucky_numbers(fortune_text):
@@ -125,11 +130,21 @@ def get_fortune_with_lucky_numbers(fortune_text):
     return f"{fortune_text}\n\nLucky numbers: {', '.join(map(str, lucky_numbers))}"
 
 
-def generate_all_fortunes(font_path, output_dir="src"):
+def write_lucky_atlas(font_path, output_dir):
+    """Write the digit atlas the device uses to fill in lucky numbers."""
+    atlas_path = Path(output_dir) / LUCKY_ATLAS_NAME
+    atlas_path.write_bytes(build_lucky_atlas(font_path))
+    print(f"Wrote {atlas_path}")
+    return atlas_path
+
+
+def generate_all_fortunes(font_path, output_dir="src", lucky_overlay=False):
     """Generate bitmap files for all fortunes with lucky numbers."""
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
     
+    failed = []
+
     # Generate fortune slips
     for i, fortune in enumerate(FORTUNES):
         fortune_with_numbers = get_fortune_with_lucky_numbers(fortune)
@@ -156,15 +171,69 @@ def generate_all_fortunes(font_path, output_dir="src"):
             "--margin", "0.04",
             "--out", str(outfile)
         ]
+        if lucky_overlay:
+            sys.argv.append("--lucky_overlay")
         
         try:
             render_slip()
             print(f"Generated: {outfile}")
+        except SystemExit:
+            # render_slip already printed why (e.g. no room for the lucky numbers)
+            failed.append(outfile)
         except Exception as e:
             print(f"Error generating {outfile}: {e}")
+            failed.append(outfile)
     
-    print(f"\nGenerated {len(FORTUNES)} fortune slip bitmaps")
-    print("Update config.FORTUNE_SLIP_MODULES to include the new files")
+    if lucky_overlay:
+        write_lucky_atlas(font_path, output_path)
+
+    print(f"\nGenerated {len(FORTUNES) - len(failed)} fortune slip bitmaps")
+    index_path, count = write_slip_index(output_path)
+    print(f"Wrote {index_path} ({count} slips); upload it with the modules")
+    if failed:
+        print(f"Error: {len(failed)} slips failed: {', '.join(p.name for p in failed)}")
+        sys.exit(1)
+
+
+def generate_slip_pack(font_path, pack_path, lucky_overlay=False, encoding="delta"):
+    """Render all fortunes with lucky numbers straight into a slip pack."""
+    slips = []
+    regions = []
+    width = height = None
+    # What the same slips cost as fortune_slip_bitmap_NNN.py modules: the
+    # bytes([...]) spelling the modules in src/ use, and b'' literals
+    list_bytes = literal_bytes = 0
+
+    for fortune in FORTUNES:
+        fortune_with_numbers = get_fortune_with_lucky_numbers(fortune)
+        w, h, data, region = render_slip_with_region(
+            fortune_with_numbers,
+            font_path,
+            width=650,
+            height=364,
+            rotate=90,
+            auto_size=True,
+            size_min=24,
+            size_max=80,
+            margin=0.04,
+            lucky_overlay=lucky_overlay,
+        )
+        if width is None:
+            width, height = w, h
+        slips.append(data)
+        regions.append(region)
+        list_bytes += len(bitmap_module_source(w, h, data, region, literal=LITERAL_LIST))
+        literal_bytes += len(bitmap_module_source(w, h, data, region, literal=LITERAL_BYTES))
+
+    stats = {}
+    size = write_slip_pack(pack_path, slips, width, height, regions, ENCODINGS[encoding], stats)
+    print(f"Wrote {pack_path}: {len(slips)} slips, {width}x{height}, {encoding}, {size} bytes")
+    report_pack_size(size, slips, list_bytes, stats, "bytes([...]) modules (as in src/)")
+    print(f"b'' literal modules: {literal_bytes} bytes ({size / literal_bytes:.1%} of source, {literal_bytes / size:.1f}x)")
+    print(f"Upload with: mpremote connect auto fs cp {pack_path} :{Path(pack_path).name}")
+    if lucky_overlay:
+        atlas_path = write_lucky_atlas(font_path, Path(pack_path).parent)
+        print(f"Upload with: mpremote connect auto fs cp {atlas_path} :{LUCKY_ATLAS_NAME}")
 
 
 def main():
@@ -172,6 +241,18 @@ def main():
     parser.add_argument("--font", required=True, help="Path to .ttf font file")
     parser.add_argument("--output", default="src", help="Output directory (default: src)")
     parser.add_argument("--count", type=int, help="Generate only this many fortunes (for testing)")
+    parser.add_argument("--pack", help="Write a single slip pack to this path instead of .py modules")
+    parser.add_argument(
+        "--lucky-overlay",
+        action="store_true",
+        help="Leave the lucky numbers blank for the device to draw fresh ones (also writes lucky_digits.bin)",
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=sorted(ENCODINGS),
+        default="delta",
+        help="Pack encoding: raw, template plus deltas, or row dictionary (default: delta)",
+    )
     
     args = parser.parse_args()
     
@@ -180,7 +261,10 @@ def main():
         global FORTUNES
         FORTUNES = FORTUNES[:args.count]
     
-    generate_all_fortunes(args.font, args.output)
+    if args.pack:
+        generate_slip_pack(args.font, args.pack, args.lucky_overlay, args.encoding)
+    else:
+        generate_all_fortunes(args.font, args.output, args.lucky_overlay)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Raster loop allocation benchmark
+
+Prints a test pattern through print_bitmap into a UART that discards the
+bytes, once one band tall and once a full slip tall, and reports what the
+extra bands cost. Runs on the host and on the board:
+
+    python3 tools/measure_raster_alloc.py
+    mpremote run tools/measure_raster_alloc.py    # with src/ uploaded
+
+On MicroPython the GC is off during each print, so gc.mem_alloc() grows by
+every byte allocated and "alloc" is the total. Under CPython "alloc" is the
+tracemalloc peak above the starting heap, which stays flat only if nothing
+band-sized is copied or kept. "new buffers" counts data objects written to
+the UART that were not written before, so 0 per band means every band reuses
+the same views. Pacing delays are zeroed and status queries are off.
+"""
+
+import gc
+import sys
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+
+if MICROPYTHON:
+    tracemalloc = None
+else:
+    import tracemalloc
+    from pathlib import Path
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    from escpos_emulator import Emulator
+
+    Emulator().install()
+
+import config  # noqa: E402
+
+config.THERMAL_PRINTER_STATUS = 'none'
+config.UART_BAUD_PROBE = False
+
+from thermal_printer import ThermalPrinter, _PatternStream  # noqa: E402
+
+WIDTH = 360
+HEIGHT = 648
+
+
+class NullUART:
+    """Discards writes; with keep set, holds every written object alive"""
+
+    def __init__(self):
+        self.keep = None
+
+    def write(self, data):
+        if self.keep is not None:
+            self.keep.append(data)
+        return len(data)
+
+    def any(self):
+        return 0
+
+    def read(self, n=None):
+        return None
+
+
+def _pattern(height):
+    data = bytearray(WIDTH // 8 * height)
+    _PatternStream(WIDTH // 8, height).readinto(data)
+    return bytes(data)
+
+
+def _print(printer, streaming, height, options):
+    if streaming:
+        source = _PatternStream(WIDTH // 8, height)
+    else:
+        source = _pattern(height)
+    gc.collect()
+    if tracemalloc:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        printer.print_bitmap(source, WIDTH, height, 'normal', *options)
+        used = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    else:
+        gc.disable()
+        base = gc.mem_alloc()
+        printer.print_bitmap(source, WIDTH, height, 'normal', *options)
+        used = gc.mem_alloc() - base
+        gc.enable()
+    return used
+
+
+def _buffers(printer, streaming, height, options):
+    printer.uart.keep = []
+    _print(printer, streaming, height, options)
+    count = len(set(id(data) for data in printer.uart.keep))
+    printer.uart.keep = None
+    return count
+
+
+def main():
+    printer = ThermalPrinter(uart=NullUART())
+    pacing = dict(printer.pacing)
+    for key in ('write_delay', 'chunk_delay', 'band_delay'):
+        pacing[key] = 0
+    printer.pacing = pacing
+    band = pacing['band_height']
+    bands = HEIGHT // band
+
+    print(f"{WIDTH}x{band * bands} pattern, band {band} rows, chunk {pacing['chunk_size']} bytes")
+    cases = (
+        ('stream', True, (False, False)),
+        ('bytes', False, (False, False)),
+        ('skip+trim', True, (True, True)),
+    )
+    for name, streaming, options in cases:
+        one = _print(printer, streaming, band, options)
+        full = _print(printer, streaming, band * bands, options)
+        new = _buffers(printer, streaming, band * bands, options) - _buffers(printer, streaming, band, options)
+        print(
+            f"  {name:12s}: alloc 1 band {one} B, {bands} bands {full} B, "
+            f"{(full - one) / (bands - 1):.1f} B per band; "
+            f"{new / (bands - 1):.1f} new buffers per band"
+        )
+
+
+main()
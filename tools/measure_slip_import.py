@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Slip module import cost
+
+Regenerates every src/fortune_slip_bitmap*.py in memory in both BITMAP
+spellings, bytes([...]) lists and b'' literals (short escapes), and measures what
+importing each one costs:
+
+    python3 tools/measure_slip_import.py
+    python3 tools/measure_slip_import.py --encoding raw --out import.json
+
+import_ms is compile + exec time (a .py import with no cached bytecode, as
+on the ESP32); peak_bytes is the tracemalloc peak over the same steps. These
+are CPython figures: the list form's parse tree and list of ints stand in
+for the heap MicroPython's compiler needs, so compare the two formats rather
+than reading them as ESP32 numbers.
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_slip_pack import find_slip_modules, load_slip_module_with_region  # noqa: E402
+from render_fortune_slip import (  # noqa: E402
+    ENCODING_PACKBITS,
+    ENCODING_RAW,
+    LITERAL_BYTES,
+    LITERAL_LIST,
+    bitmap_module_source,
+)
+
+LITERALS = (LITERAL_LIST, LITERAL_BYTES)
+
+
+def _import(source, name):
+    namespace = {}
+    exec(compile(source, name, "exec"), namespace)
+    return namespace
+
+
+def measure(source, name):
+    """Return (import seconds, peak traced bytes, module namespace) for source."""
+    gc.collect()
+    t0 = time.perf_counter()
+    _import(source, name)
+    elapsed = time.perf_counter() - t0
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    namespace = _import(source, name)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return elapsed, peak, namespace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure slip module import time and peak heap per BITMAP format")
+    parser.add_argument("--src", default="src", help="Directory holding fortune_slip_bitmap*.py (default: src)")
+    parser.add_argument("--encoding", choices=[ENCODING_PACKBITS, ENCODING_RAW], default=ENCODING_PACKBITS)
+    parser.add_argument("--out", help="Also write per-module results as JSON")
+    args = parser.parse_args()
+
+    paths = find_slip_modules(args.src)
+    if not paths:
+        print(f"No fortune_slip_bitmap*.py modules found in {args.src}")
+        sys.exit(1)
+
+    cases = []
+    for path in paths:
+        w, h, data, region = load_slip_module_with_region(path)
+        case = {"name": path.stem}
+        bitmaps = []
+        for literal in LITERALS:
+            source = bitmap_module_source(w, h, data, region, args.encoding, literal)
+            elapsed, peak, namespace = measure(source, path.name)
+            bitmaps.append(namespace["BITMAP"])
+            case[literal] = {
+                "source_bytes": len(source),
+                "import_ms": round(elapsed * 1000, 3),
+                "peak_bytes": peak,
+            }
+        if bitmaps[0] != bitmaps[1]:
+            print(f"Error: {path.name} BITMAP differs between formats")
+            sys.exit(1)
+        case["bitmap_bytes"] = len(bitmaps[0])
+        cases.append(case)
+
+    print(f"{len(cases)} modules, {args.encoding} BITMAP")
+    for literal in LITERALS:
+        rows = [c[literal] for c in cases]
+        avg = lambda key: sum(r[key] for r in rows) / len(rows)  # noqa: E731
+        print(
+            f"  {literal:5s}: source avg {avg('source_bytes'):8.0f} bytes, "
+            f"import avg {avg('import_ms'):7.2f} ms (max {max(r['import_ms'] for r in rows):7.2f}), "
+            f"peak avg {avg('peak_bytes'):9.0f} bytes (max {max(r['peak_bytes'] for r in rows)})"
+        )
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"encoding": args.encoding, "cases": cases}, indent=2))
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
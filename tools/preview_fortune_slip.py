@@ -17,27 +17,34 @@ def preview_fortune_slip():
     """Load and display the fortune slip bitmap"""
     try:
         import fortune_slip_bitmap
+        import slip_codec
+        import slip_renderer
         
         width = fortune_slip_bitmap.WIDTH
         height = fortune_slip_bitmap.HEIGHT
-        bitmap_data = fortune_slip_bitmap.BITMAP
+        encoding = getattr(fortune_slip_bitmap, "ENCODING", slip_codec.ENCODING_RAW)
         
         print(f"Fortune Slip Dimensions: {width}x{height} pixels")
-        print(f"Bitmap data size: {len(bitmap_data)} bytes")
+        print(f"Bitmap data size: {len(fortune_slip_bitmap.BITMAP)} bytes ({encoding})")
         print(f"Expected size: {(width * height) // 8} bytes")
         
+        # Read rows through the same decoder the ESP32 uses (slip_codec),
+        # so compressed modules preview exactly as they print
+        bitmap_data = slip_codec.slip_bitmap(fortune_slip_bitmap)
+        if not hasattr(bitmap_data, 'readinto'):
+            bitmap_data = slip_renderer.BufferStream(bitmap_data)
+        
         # Create image from bitmap data
         img = Image.new('1', (width, height), 1)  # 1-bit image, white background
         pixels = img.load()
         
-        # Convert bitmap bytes to pixels
-        byte_idx = 0
+        # Convert bitmap bytes to pixels, one reused row buffer at a time
+        row = bytearray(width // 8)
         for y in range(height):
+            if bitmap_data.readinto(row) != len(row):
+                break
             for x in range(0, width, 8):
-                if byte_idx >= len(bitmap_data):
-                    break
-                byte_val = bitmap_data[byte_idx]
-                byte_idx += 1
+                byte_val = row[x // 8]
                 
                 # Extract 8 pixels from this byte
                 for bit in range(8):
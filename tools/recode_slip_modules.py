@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Re-encode fortune slip modules
+
+Rewrites src/fortune_slip_bitmap*.py with a different BITMAP encoding
+(render_fortune_slip.py --encoding) without re-rendering them, e.g. to
+compress the slips already in the tree:
+
+    python3 tools/recode_slip_modules.py --encoding packbits
+
+Every module is decoded again after writing and checked against the original.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_slip_index import write_slip_index  # noqa: E402
+from build_slip_pack import find_slip_modules, load_slip_module_with_region  # noqa: E402
+from render_fortune_slip import ENCODING_PACKBITS, ENCODING_RAW, write_bitmap_module  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encode fortune_slip_bitmap*.py modules in place")
+    parser.add_argument("--src", default="src", help="Directory holding fortune_slip_bitmap*.py (default: src)")
+    parser.add_argument("--encoding", choices=[ENCODING_PACKBITS, ENCODING_RAW], default=ENCODING_PACKBITS)
+    args = parser.parse_args()
+
+    paths = find_slip_modules(args.src)
+    if not paths:
+        print(f"No fortune_slip_bitmap*.py modules found in {args.src}")
+        sys.exit(1)
+
+    before = after = 0
+    for path in paths:
+        before += path.stat().st_size
+        w, h, data, region = load_slip_module_with_region(path)
+        write_bitmap_module(path, w, h, data, region, args.encoding)
+        if load_slip_module_with_region(path) != (w, h, data, region):
+            print(f"Error: {path.name} does not decode back to the original bitmap")
+            sys.exit(1)
+        after += path.stat().st_size
+
+    print(f"Re-encoded {len(paths)} modules as {args.encoding}: {before} -> {after} bytes ({after / before:.1%})")
+    index_path, _ = write_slip_index(args.src)
+    print(f"Updated {index_path}")
+
+
+if __name__ == "__main__":
+    main()
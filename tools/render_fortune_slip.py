@@ -1,8 +1,26 @@
 import argparse
+import sys
 from pathlib import Path
 
 from PIL import Image, ImageDraw, ImageFont
 
+# Lucky-number overlay: the numbers line is left blank and drawn on the
+# device from a digit atlas of this size (see build_lucky_atlas)
+LUCKY_OVERLAY_SIZE = 28
+LUCKY_PLACEHOLDER = "\n\nLucky numbers: 00, 00, 00, 00, 00, 00"
+ATLAS_FIRST_CHAR = 32  # space ... '9' covers the digits and ", "
+ATLAS_LAST_CHAR = 57
+
+# BITMAP encodings understood by src/slip_codec.py
+ENCODING_RAW = "raw"
+ENCODING_PACKBITS = "packbits"
+
+# How BITMAP is spelled in the module. "bytes" (b'' literals, see bytes_literal) is a single
+# constant; "list" (bytes([...])) makes MicroPython build a list of ints at
+# import time and is kept only for comparison (tools/measure_slip_import.py)
+LITERAL_BYTES = "bytes"
+LITERAL_LIST = "list"
+
 
 def wrap_text(draw, text, font, max_width_px):
     # Split by newlines first, then wrap each line
@@ -121,49 +139,66 @@ def image_to_1bit_rows(img_1bit):
     return out
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--text", required=True)
-    ap.add_argument("--font", required=True, help="Path to a .ttf font file")
-    ap.add_argument("--size", type=int, default=28)
-    ap.add_argument("--auto_size", action="store_true", help="Auto-scale font to better fill width")
-    ap.add_argument("--size_min", type=int, default=18)
-    ap.add_argument("--size_max", type=int, default=72)
-    ap.add_argument("--width", type=int, default=384, help="Printer width in pixels (58mm is typically 384)")
-    ap.add_argument("--height", type=int, default=120, help="Slip height in pixels before rotation")
-    ap.add_argument("--auto_height", action="store_true", help="Auto-calculate height based on rendered text")
-    ap.add_argument("--margin", type=float, default=0.06, help="Horizontal margin as fraction of width")
-    ap.add_argument("--rotate", type=int, default=90, choices=[0, 90, 180, 270])
-    ap.add_argument("--out", default="src/fortune_slip_bitmap.py")
-    args = ap.parse_args()
+def render_slip(text, font_path, **kwargs):
+    """Render a slip and return (WIDTH, HEIGHT, 1bpp row-major bytes)."""
+    w, h, data, _ = render_slip_with_region(text, font_path, **kwargs)
+    return w, h, data
+
+
+def render_slip_with_region(
+    text,
+    font_path,
+    size=28,
+    auto_size=False,
+    size_min=18,
+    size_max=72,
+    width=384,
+    height=120,
+    auto_height=False,
+    margin=0.06,
+    rotate=90,
+    lucky_overlay=False,
+    lucky_size=LUCKY_OVERLAY_SIZE,
+):
+    """Render a slip and return (WIDTH, HEIGHT, data, lucky_region).
+
+    With lucky_overlay, any lucky numbers in text are dropped: the slip gets
+    a "Lucky numbers:" label at lucky_size and a blank line below it, and
+    lucky_region is that line as (x, y, w, h) in the unrotated layout; the
+    fortune is shrunk (down to size_min with auto_size) until both lines fit,
+    and ValueError is raised if they cannot. Otherwise lucky_region is None.
+    """
+    if lucky_overlay:
+        if rotate != 90:
+            raise ValueError("Lucky number overlay needs --rotate 90")
+        text = text.split("\n\nLucky numbers:")[0] + LUCKY_PLACEHOLDER
 
-    width = args.width
     if width % 8 != 0:
         width = width - (width % 8)
 
-    margin_x = int(width * args.margin)
+    margin_x = int(width * margin)
     max_text_width = width - 2 * margin_x
 
-    if args.auto_size:
+    if auto_size:
         font, lines = layout_text_for_width(
-            args.text,
-            args.font,
-            args.size_min,
-            args.size_max,
+            text,
+            font_path,
+            size_min,
+            size_max,
             max_text_width,
         )
         # Use the chosen auto-sized font's size for rendering
-        chosen_size = getattr(font, "size", args.size_max)
+        chosen_size = getattr(font, "size", size_max)
 
         img_tmp = Image.new("1", (width, 32), 1)
         draw_tmp = ImageDraw.Draw(img_tmp)
         fortune_lines, lucky_lines, fortune_font, lucky_font, line_h_fortune, line_h_lucky, spacing, total_h = render_text_with_different_sizes(
             draw_tmp,
-            args.text,
-            args.font,
+            text,
+            font_path,
             chosen_size,
             max_text_width,
-            args.height,
+            height,
         )
     else:
         # Use the new function to handle different font sizes
@@ -171,23 +206,50 @@ def main():
         draw_tmp = ImageDraw.Draw(img_tmp)
         fortune_lines, lucky_lines, fortune_font, lucky_font, line_h_fortune, line_h_lucky, spacing, total_h = render_text_with_different_sizes(
             draw_tmp,
-            args.text,
-            args.font,
-            args.size,
+            text,
+            font_path,
+            size,
             max_text_width,
-            args.height
+            height
         )
         font = fortune_font
 
+    if lucky_overlay:
+        lucky_font = ImageFont.truetype(font_path, lucky_size)
+        line_h_lucky = draw_tmp.textbbox((0, 0), "Ag", font=lucky_font)[3]
+        lucky_lines = ["Lucky numbers:", None]  # None is the reserved line
+        lucky_h = len(lucky_lines) * (line_h_lucky + 2)
+        # The label and the reserved line must fit on the slip too: shrink
+        # the fortune text until the reserved line ends inside the printed
+        # column (the unrotated height, cropped to whole bytes)
+        fortune_size = fortune_font.size
+        floor = size_min if auto_size else fortune_size
+        while True:
+            total_h = len(fortune_lines) * (line_h_fortune + 2) + spacing + lucky_h
+            if auto_height or _overlay_bottom(height, total_h) <= height - height % 8:
+                break
+            if fortune_size <= floor:
+                raise ValueError(
+                    f"Text too long for a {height}px slip with the lucky numbers line "
+                    f"(needs {total_h}px at size {fortune_size})"
+                )
+            fortune_size -= 1
+            fortune_lines, _, fortune_font, _, line_h_fortune, _, spacing, _ = render_text_with_different_sizes(
+                draw_tmp,
+                text,
+                font_path,
+                fortune_size,
+                max_text_width,
+                height,
+            )
+
     block_w = 18
     block_h = 10
     pad_y = max(12, int(line_h_fortune * 0.6))
 
-    if args.auto_height:
+    if auto_height:
         base_h = total_h + (pad_y * 2) + (block_h * 2)
         height = max(base_h, 60)
-    else:
-        height = args.height
 
     img = Image.new("1", (width, height), 1)
     draw = ImageDraw.Draw(img)
@@ -206,7 +268,12 @@ def main():
     y += spacing
     
     # Draw lucky numbers with smaller font
+    region = None
     for line in lucky_lines:
+        if line is None:
+            region = (margin_x, y, max_text_width, line_h_lucky)
+            y += line_h_lucky + 2
+            continue
         bbox = draw.textbbox((0, 0), line, font=lucky_font)
         tw = bbox[2]
         x = (width - tw) // 2
@@ -218,30 +285,166 @@ def main():
     draw.rectangle([0, height - block_h - 1, block_w, height - 1], fill=0)
     draw.rectangle([width - block_w - 1, height - block_h - 1, width - 1, height - 1], fill=0)
 
-    if args.rotate:
-        img = img.rotate(args.rotate, expand=True, fillcolor=1)
+    if rotate:
+        img = img.rotate(rotate, expand=True, fillcolor=1)
 
     w, h = img.size
     w = w - (w % 8)
     if w != img.size[0]:
         img = img.crop((0, 0, w, h))
 
-    data = image_to_1bit_rows(img)
+    # Rotated 90, unrotated y is the printed column: text that overflows the
+    # slip leaves the reserved line outside it
+    if region is not None and region[1] + region[3] > w:
+        raise ValueError(f"Lucky numbers line does not fit on the slip (y={region[1]})")
+
+    return w, h, image_to_1bit_rows(img), region
+
+
+def _overlay_bottom(height, total_h):
+    """Where the reserved lucky numbers line ends, with the block centred."""
+    return max(0, (height - total_h) // 2) + total_h - 2
 
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
 
+def build_lucky_atlas(font_path, size=LUCKY_OVERLAY_SIZE):
+    """Digit atlas for the overlay, in the slip font format (src/slip_renderer.py)."""
+    from build_slip_font import build_font
+
+    return build_font(font_path, [size], extra_chars="", first_char=ATLAS_FIRST_CHAR, last_char=ATLAS_LAST_CHAR)
+
+
+def packbits_encode(data):
+    """PackBits: n < 128 copies n + 1 literal bytes, n > 128 repeats the next
+    byte 257 - n times (decoded on the ESP32 by slip_codec.PackBitsStream)."""
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        run = 1
+        while i + run < n and run < 128 and data[i + run] == data[i]:
+            run += 1
+        if run >= 2:
+            out.append(257 - run)
+            out.append(data[i])
+            i += run
+            continue
+        # Literal up to the next pair of equal bytes
+        j = i + 1
+        while j < n and j - i < 128 and not (j + 1 < n and data[j] == data[j + 1]):
+            j += 1
+        out.append(j - i - 1)
+        out += data[i:j]
+        i = j
+    return bytes(out)
+
+
+def bitmap_module_source(w, h, data, lucky_region=None, encoding=ENCODING_RAW, literal=LITERAL_BYTES):
+    """Python source of a slip module (WIDTH, HEIGHT, LUCKY_REGION, BITMAP).
+
+    With encoding "packbits", BITMAP holds packbits_encode(data) and the
+    module adds ENCODING and RAW_SIZE (the uncompressed length).
+    """
     py = []
     py.append(f"WIDTH = {w}\n")
     py.append(f"HEIGHT = {h}\n")
-    py.append("BITMAP = bytes([\n")
-    for i in range(0, len(data), 16):
-        chunk = data[i : i + 16]
-        py.append("    " + ", ".join(str(b) for b in chunk) + ",\n")
-    py.append("])\n")
-
-    out_path.write_text("".join(py))
-    print(f"Wrote {out_path} (WIDTH={w}, HEIGHT={h}, bytes={len(data)})")
+    if lucky_region is not None:
+        py.append(f"LUCKY_REGION = {tuple(lucky_region)}\n")
+    if encoding == ENCODING_PACKBITS:
+        py.append(f"ENCODING = {encoding!r}\n")
+        py.append(f"RAW_SIZE = {len(data)}\n")
+        data = packbits_encode(data)
+    elif encoding != ENCODING_RAW:
+        raise ValueError(f"Unknown slip encoding {encoding}")
+    if literal == LITERAL_LIST:
+        py.append("BITMAP = bytes([\n")
+        for i in range(0, len(data), 16):
+            chunk = data[i : i + 16]
+            py.append("    " + ", ".join(str(b) for b in chunk) + ",\n")
+        py.append("])\n")
+        return "".join(py)
+
+    # Adjacent literals are joined by the compiler into one bytes constant
+    py.append("BITMAP = (\n")
+    for i in range(0, len(data), 32):
+        py.append(f"    {bytes_literal(data[i : i + 32])}\n")
+    py.append(")\n")
+    return "".join(py)
+
+
+def bytes_literal(data):
+    """Shortest-escape b'' literal for data.
+
+    Printable ASCII is written as is and other bytes as octal escapes with as
+    few digits as the next character allows ('\0' for a blank byte), so a
+    mostly white slip takes about 2 characters per byte instead of the 4 of
+    repr()'s '\x00' (or the 3 of "0, " in a bytes([...]) list).
+    """
+    out = ["b'"]
+    n = len(data)
+    for i in range(n):
+        b = data[i]
+        if 32 <= b < 127 and b not in (0x27, 0x5C):  # not ' or backslash
+            out.append(chr(b))
+            continue
+        digits = "%o" % b
+        # An octal escape takes up to 3 digits: pad if an octal digit follows
+        if i + 1 < n and 0x30 <= data[i + 1] <= 0x37 and len(digits) < 3:
+            digits = "%03o" % b
+        out.append("\\" + digits)
+    out.append("'")
+    return "".join(out)
+
+
+def write_bitmap_module(out_path, w, h, data, lucky_region=None, encoding=ENCODING_RAW):
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(bitmap_module_source(w, h, data, lucky_region, encoding))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--text", required=True)
+    ap.add_argument("--font", required=True, help="Path to a .ttf font file")
+    ap.add_argument("--size", type=int, default=28)
+    ap.add_argument("--auto_size", action="store_true", help="Auto-scale font to better fill width")
+    ap.add_argument("--size_min", type=int, default=18)
+    ap.add_argument("--size_max", type=int, default=72)
+    ap.add_argument("--width", type=int, default=384, help="Printer width in pixels (58mm is typically 384)")
+    ap.add_argument("--height", type=int, default=120, help="Slip height in pixels before rotation")
+    ap.add_argument("--auto_height", action="store_true", help="Auto-calculate height based on rendered text")
+    ap.add_argument("--margin", type=float, default=0.06, help="Horizontal margin as fraction of width")
+    ap.add_argument("--rotate", type=int, default=90, choices=[0, 90, 180, 270])
+    ap.add_argument("--lucky_overlay", action="store_true", help="Reserve the lucky numbers line for the device to fill in")
+    ap.add_argument(
+        "--encoding",
+        choices=[ENCODING_PACKBITS, ENCODING_RAW],
+        default=ENCODING_PACKBITS,
+        help="BITMAP storage: packbits (compressed, default) or raw",
+    )
+    ap.add_argument("--out", default="src/fortune_slip_bitmap.py")
+    args = ap.parse_args()
+
+    try:
+        w, h, data, region = render_slip_with_region(
+            args.text,
+            args.font,
+            size=args.size,
+            auto_size=args.auto_size,
+            size_min=args.size_min,
+            size_max=args.size_max,
+            width=args.width,
+            height=args.height,
+            auto_height=args.auto_height,
+            margin=args.margin,
+            rotate=args.rotate,
+            lucky_overlay=args.lucky_overlay,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    write_bitmap_module(args.out, w, h, data, region, args.encoding)
+    print(f"Wrote {args.out} (WIDTH={w}, HEIGHT={h}, bytes={len(data)}, {args.encoding})")
 
 
 if __name__ == "__main__":